@@ -0,0 +1,137 @@
+"""
+Materialised aggregates for YourCarbonFootprint application.
+Maintains emission totals by scope, category, month x scope, facility and
+business unit, updated incrementally as rows are added or removed so that
+dashboards read O(groups) results instead of rescanning every row.
+"""
+
+import pandas as pd
+
+# Aggregate name -> grouping columns
+DIMENSIONS = {
+    "scope": ["scope"],
+    "category": ["category"],
+    "month_scope": ["month", "scope"],
+    "facility": ["facility"],
+    "business_unit": ["business_unit"]
+}
+
+
+def _prepare(df):
+    """Return the columns needed for aggregation with numeric emissions."""
+    prepared = pd.DataFrame({
+        "emissions_kgCO2e": pd.to_numeric(df["emissions_kgCO2e"], errors="coerce").fillna(0).astype(float),
+        "date": pd.to_datetime(df["date"], errors="coerce")
+    })
+    for column in ["scope", "category", "facility", "business_unit"]:
+        prepared[column] = df[column] if column in df.columns else None
+    prepared["month"] = prepared["date"].dt.strftime("%Y-%m")
+    return prepared
+
+
+class EmissionsAggregates:
+    def __init__(self):
+        """Initialize empty aggregates."""
+        self.total_emissions = 0.0
+        self.entry_count = 0
+        # Each aggregate maps a group key tuple to [sum_kgCO2e, row_count]
+        self._groups = {name: {} for name in DIMENSIONS}
+        self._date_counts = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build aggregates from a full emissions DataFrame.
+
+        Args:
+            df (pandas.DataFrame): Emissions data
+
+        Returns:
+            EmissionsAggregates: Aggregates over df
+        """
+        aggregates = cls()
+        aggregates.add(df)
+        return aggregates
+
+    def _apply(self, df, sign):
+        if df is None or len(df) == 0:
+            return
+        prepared = _prepare(df)
+        self.total_emissions += sign * float(prepared["emissions_kgCO2e"].sum())
+        self.entry_count += sign * len(prepared)
+
+        for name, keys in DIMENSIONS.items():
+            grouped = prepared.groupby(keys, observed=True)["emissions_kgCO2e"].agg(["sum", "count"])
+            # Replace rather than mutate so concurrent readers see a consistent dict
+            groups = dict(self._groups[name])
+            for key, row in grouped.iterrows():
+                key = key if isinstance(key, tuple) else (key,)
+                current = groups.get(key, [0.0, 0])
+                updated = [current[0] + sign * float(row["sum"]), current[1] + sign * int(row["count"])]
+                if updated[1] <= 0:
+                    groups.pop(key, None)
+                else:
+                    groups[key] = updated
+            self._groups[name] = groups
+
+        date_counts = dict(self._date_counts)
+        for date, count in prepared["date"].dropna().value_counts().items():
+            updated = date_counts.get(date, 0) + sign * int(count)
+            if updated <= 0:
+                date_counts.pop(date, None)
+            else:
+                date_counts[date] = updated
+        self._date_counts = date_counts
+
+    def add(self, df):
+        """Fold newly added rows into the aggregates."""
+        self._apply(df, 1)
+
+    def remove(self, df):
+        """Subtract deleted rows from the aggregates."""
+        self._apply(df, -1)
+
+    @property
+    def latest_date(self):
+        """Most recent entry date, or None if no row has a valid date."""
+        return max(self._date_counts) if self._date_counts else None
+
+    @property
+    def scopes_covered(self):
+        """Number of distinct scopes with at least one entry."""
+        return len(self._groups["scope"])
+
+    def totals(self, name):
+        """
+        Get the emission totals for one aggregate.
+
+        Args:
+            name (str): Aggregate name, one of DIMENSIONS
+
+        Returns:
+            pandas.DataFrame: Grouping columns plus emissions_kgCO2e, in
+            the same shape as groupby(...).sum().reset_index()
+        """
+        keys = DIMENSIONS[name]
+        groups = self._groups[name]
+        records = [list(key) + [value[0]] for key, value in groups.items()]
+        totals = pd.DataFrame(records, columns=keys + ["emissions_kgCO2e"])
+        return totals.sort_values(keys).reset_index(drop=True)
+
+    def summary(self):
+        """
+        Get emissions summary statistics.
+
+        Returns:
+            dict: Total, scope and category breakdowns and a monthly
+            time series keyed by month then scope
+        """
+        time_series = {}
+        for (month, scope), value in sorted(self._groups["month_scope"].items()):
+            time_series.setdefault(month, {})[scope] = value[0]
+        return {
+            "total_emissions": self.total_emissions,
+            "scope_breakdown": {key[0]: value[0] for key, value in self._groups["scope"].items()},
+            "category_breakdown": {key[0]: value[0] for key, value in self._groups["category"].items()},
+            "time_series": time_series
+        }
@@ -1,101 +1,113 @@
 """
 AI Agents for YourCarbonFootprint application.
 Uses CrewAI to create agents for various tasks.
+
+Every task gets its own Agent, so crews can run concurrently. The run_*_crew
+methods return the crew's output text, or a Future of it with wait=False,
+since responses are cached as text.
 """
 
 import os
 from dotenv import load_dotenv
 from crewai import Agent, Task, Crew, LLM
 
+from crew_runner import get_crew_executor, prompt_key
+
 # Load environment variables
 load_dotenv()
 
-# Get Groq API key
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
-os.environ["GROQ_API_KEY"] = groq_api_key
+LLM_MODEL = "groq/llama-3.3-70b-versatile"
 
 # Initialize LLM
 def get_llm():
     """Initialize and return the Groq LLM."""
+    # Checked here rather than at import, so importing this module stays cheap
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
+    os.environ["GROQ_API_KEY"] = groq_api_key
     return LLM(
-    model="groq/llama-3.3-70b-versatile",
+    model=LLM_MODEL,
     temperature=0.7
 )
 
+# Agent profiles; a fresh Agent is built from one for every task, so crews
+# running at the same time never share an Agent
+AGENT_PROFILES = {
+    "data_entry_assistant": dict(
+        role="Data Entry Assistant",
+        goal="Help users classify emissions, map to scopes, and validate data entries",
+        backstory="You are an expert in carbon accounting who helps users correctly categorize "
+                  "their emissions data and ensure it's properly mapped to the right scope. "
+                  "You understand the nuances of Scope 1, 2, and 3 emissions and can guide "
+                  "users to make accurate entries."
+    ),
+    "report_generator": dict(
+        role="Report Summary Generator",
+        goal="Convert emission data into human-readable summaries",
+        backstory="You are a skilled analyst who can take raw emissions data and transform it "
+                  "into clear, concise summaries that highlight key trends, areas of concern, "
+                  "and opportunities for improvement. You make complex data accessible to "
+                  "non-technical stakeholders."
+    ),
+    "offset_advisor": dict(
+        role="Carbon Offset Advisor",
+        goal="Suggest verified offset options based on user profile and location",
+        backstory="You are a sustainability expert who understands the carbon offset market "
+                  "and can recommend high-quality, verified offset projects that align with "
+                  "the user's industry, values, and location. You help users navigate the "
+                  "complex world of carbon credits and offsets."
+    ),
+    "regulation_radar": dict(
+        role="Regulation Radar",
+        goal="Notify users of upcoming compliance requirements",
+        backstory="You are a regulatory expert who tracks carbon-related regulations across "
+                  "different regions, with a focus on EU CBAM, Japan GX League, and Indonesia "
+                  "ETS/ETP. You help users understand what compliance requirements apply to "
+                  "them and how to prepare for upcoming changes."
+    ),
+    "emission_optimizer": dict(
+        role="Emission Optimizer",
+        goal="Use historical data to suggest reductions and savings",
+        backstory="You are a carbon reduction specialist who analyzes emissions data to "
+                  "identify patterns and opportunities for reduction. You provide practical, "
+                  "actionable recommendations that can help organizations reduce their "
+                  "carbon footprint while also saving costs."
+    )
+}
+
 # Create AI agents
 class CarbonFootprintAgents:
-    def __init__(self):
-        """Initialize the CarbonFootprintAgents class."""
-        self.llm = get_llm()
-        self._create_agents()
-    
-    def _create_agents(self):
-        """Create all the agents."""
-        # Data Entry Assistant
-        self.data_entry_assistant = Agent(
-            llm=self.llm,
-            role="Data Entry Assistant",
-            goal="Help users classify emissions, map to scopes, and validate data entries",
-            backstory="You are an expert in carbon accounting who helps users correctly categorize "
-                     "their emissions data and ensure it's properly mapped to the right scope. "
-                     "You understand the nuances of Scope 1, 2, and 3 emissions and can guide "
-                     "users to make accurate entries.",
-            allow_delegation=False,
-            verbose=False
-        )
+    def __init__(self, llm=None, executor=None):
+        """
+        Initialize the CarbonFootprintAgents class.
         
-        # Report Summary Generator
-        self.report_generator = Agent(
-            llm=self.llm,
-            role="Report Summary Generator",
-            goal="Convert emission data into human-readable summaries",
-            backstory="You are a skilled analyst who can take raw emissions data and transform it "
-                     "into clear, concise summaries that highlight key trends, areas of concern, "
-                     "and opportunities for improvement. You make complex data accessible to "
-                     "non-technical stakeholders.",
-            allow_delegation=False,
-            verbose=False
-        )
+        Args:
+            llm (optional): LLM for all agents, defaults to the Groq LLM
+            executor (CrewExecutor, optional): Runs crews with caching and
+                deduplication, defaults to the shared process-wide executor
+        """
+        self.llm = llm or get_llm()
+        self.executor = executor or get_crew_executor()
+    
+    def _agent(self, name):
+        """
+        Build a new agent for a single task.
         
-        # Carbon Offset Advisor
-        self.offset_advisor = Agent(
-            llm=self.llm,
-            role="Carbon Offset Advisor",
-            goal="Suggest verified offset options based on user profile and location",
-            backstory="You are a sustainability expert who understands the carbon offset market "
-                     "and can recommend high-quality, verified offset projects that align with "
-                     "the user's industry, values, and location. You help users navigate the "
-                     "complex world of carbon credits and offsets.",
-            allow_delegation=False,
-            verbose=False
-        )
+        Agents keep per-run state, so each crew gets its own instead of
+        sharing one across crews running concurrently.
         
-        # Regulation Radar
-        self.regulation_radar = Agent(
-            llm=self.llm,
-            role="Regulation Radar",
-            goal="Notify users of upcoming compliance requirements",
-            backstory="You are a regulatory expert who tracks carbon-related regulations across "
-                     "different regions, with a focus on EU CBAM, Japan GX League, and Indonesia "
-                     "ETS/ETP. You help users understand what compliance requirements apply to "
-                     "them and how to prepare for upcoming changes.",
-            allow_delegation=False,
-            verbose=False
-        )
+        Args:
+            name (str): Key in AGENT_PROFILES
         
-        # Emission Optimizer
-        self.emission_optimizer = Agent(
+        Returns:
+            Agent: Agent with the profile's role, goal and backstory
+        """
+        return Agent(
             llm=self.llm,
-            role="Emission Optimizer",
-            goal="Use historical data to suggest reductions and savings",
-            backstory="You are a carbon reduction specialist who analyzes emissions data to "
-                     "identify patterns and opportunities for reduction. You provide practical, "
-                     "actionable recommendations that can help organizations reduce their "
-                     "carbon footprint while also saving costs.",
             allow_delegation=False,
-            verbose=False
+            verbose=False,
+            **AGENT_PROFILES[name]
         )
     
     def create_data_entry_task(self, data_description):
@@ -111,15 +123,15 @@ class CarbonFootprintAgents:
             ),
             expected_output="A detailed classification of the emissions data with scope, "
                            "category, and recommended emission factor.",
-            agent=self.data_entry_assistant
+            agent=self._agent("data_entry_assistant")
         )
     
     def create_report_summary_task(self, emissions_data):
-        """Create a task for the Report Summary Generator."""
+        """Create a task for the Report Summary Generator (emissions_data: digest text)."""
         return Task(
             description=(
-                f"Generate a comprehensive summary of the following emissions data: "
-                f"{emissions_data}\n"
+                f"Generate a comprehensive summary of the emissions data described by "
+                f"the following digest:\n{emissions_data}\n"
                 f"1. Highlight key trends and patterns\n"
                 f"2. Identify the largest sources of emissions\n"
                 f"3. Compare performance across different time periods if data is available\n"
@@ -127,7 +139,7 @@ class CarbonFootprintAgents:
             ),
             expected_output="A clear, concise summary of the emissions data with key insights "
                            "and recommendations.",
-            agent=self.report_generator
+            agent=self._agent("report_generator")
         )
     
     def create_offset_advice_task(self, emissions_total, location, industry):
@@ -145,7 +157,7 @@ class CarbonFootprintAgents:
             ),
             expected_output="A list of recommended carbon offset options with costs, benefits, "
                            "and limitations for each.",
-            agent=self.offset_advisor
+            agent=self._agent("offset_advisor")
         )
     
     def create_regulation_check_task(self, location, industry, export_markets):
@@ -163,15 +175,15 @@ class CarbonFootprintAgents:
             ),
             expected_output="A comprehensive overview of current and upcoming regulatory "
                            "requirements with recommendations for compliance preparation.",
-            agent=self.regulation_radar
+            agent=self._agent("regulation_radar")
         )
     
     def create_optimization_task(self, emissions_data):
-        """Create a task for the Emission Optimizer."""
+        """Create a task for the Emission Optimizer (emissions_data: digest text)."""
         return Task(
             description=(
-                f"Analyze the following emissions data and identify opportunities for reduction: "
-                f"{emissions_data}\n"
+                f"Analyze the emissions data described by the following digest and "
+                f"identify opportunities for reduction:\n{emissions_data}\n"
                 f"1. Identify the top 3-5 sources of emissions that could be reduced\n"
                 f"2. Suggest practical measures to reduce emissions in each area\n"
                 f"3. Estimate potential emission reductions and cost savings where possible\n"
@@ -179,55 +191,80 @@ class CarbonFootprintAgents:
             ),
             expected_output="A prioritized list of emission reduction opportunities with "
                            "estimated impacts and implementation guidance.",
-            agent=self.emission_optimizer
+            agent=self._agent("emission_optimizer")
         )
     
-    def run_data_entry_crew(self, data_description):
-        """Run a crew with the Data Entry Assistant."""
+    def _run_crew(self, task, wait=True):
+        """
+        Run a single-agent crew through the shared executor.
+        
+        Identical requests (same model, agent and normalised task text) are
+        answered from the response cache or share the request in flight.
+        
+        Args:
+            task (Task): Task to run, with its own agent
+            wait (bool): Block until done; if False return a Future instead
+        
+        Returns:
+            str or concurrent.futures.Future: Crew output text (the raw text of
+                the CrewOutput, which is what the response cache keeps)
+        """
+        agent = task.agent
+        model = getattr(self.llm, "model", type(self.llm).__name__)
+        key = prompt_key(model, agent.role, task.description, task.expected_output)
+        
+        def kickoff():
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                verbose=False
+            )
+            return crew.kickoff()
+        
+        future = self.executor.submit(key, kickoff)
+        return future.result() if wait else future
+    
+    def run_data_entry_crew(self, data_description, wait=True):
+        """Run a crew with the Data Entry Assistant.
+        
+        Returns the output text (not a CrewOutput), or a Future of it if wait
+        is False.
+        """
         task = self.create_data_entry_task(data_description)
-        crew = Crew(
-            agents=[self.data_entry_assistant],
-            tasks=[task],
-            verbose=False
-        )
-        return crew.kickoff()
+        return self._run_crew(task, wait)
     
-    def run_report_summary_crew(self, emissions_data):
-        """Run a crew with the Report Summary Generator."""
+    def run_report_summary_crew(self, emissions_data, wait=True):
+        """Run a crew with the Report Summary Generator.
+        
+        Returns the output text (not a CrewOutput), or a Future of it if wait
+        is False.
+        """
         task = self.create_report_summary_task(emissions_data)
-        crew = Crew(
-            agents=[self.report_generator],
-            tasks=[task],
-            verbose=False
-        )
-        return crew.kickoff()
+        return self._run_crew(task, wait)
     
-    def run_offset_advice_crew(self, emissions_total, location, industry):
-        """Run a crew with the Carbon Offset Advisor."""
+    def run_offset_advice_crew(self, emissions_total, location, industry, wait=True):
+        """Run a crew with the Carbon Offset Advisor.
+        
+        Returns the output text (not a CrewOutput), or a Future of it if wait
+        is False.
+        """
         task = self.create_offset_advice_task(emissions_total, location, industry)
-        crew = Crew(
-            agents=[self.offset_advisor],
-            tasks=[task],
-            verbose=False
-        )
-        return crew.kickoff()
+        return self._run_crew(task, wait)
     
-    def run_regulation_check_crew(self, location, industry, export_markets):
-        """Run a crew with the Regulation Radar."""
+    def run_regulation_check_crew(self, location, industry, export_markets, wait=True):
+        """Run a crew with the Regulation Radar.
+        
+        Returns the output text (not a CrewOutput), or a Future of it if wait
+        is False.
+        """
         task = self.create_regulation_check_task(location, industry, export_markets)
-        crew = Crew(
-            agents=[self.regulation_radar],
-            tasks=[task],
-            verbose=False
-        )
-        return crew.kickoff()
+        return self._run_crew(task, wait)
     
-    def run_optimization_crew(self, emissions_data):
-        """Run a crew with the Emission Optimizer."""
+    def run_optimization_crew(self, emissions_data, wait=True):
+        """Run a crew with the Emission Optimizer.
+        
+        Returns the output text (not a CrewOutput), or a Future of it if wait
+        is False.
+        """
         task = self.create_optimization_task(emissions_data)
-        crew = Crew(
-            agents=[self.emission_optimizer],
-            tasks=[task],
-            verbose=False
-        )
-        return crew.kickoff()
+        return self._run_crew(task, wait)
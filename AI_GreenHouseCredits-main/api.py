@@ -0,0 +1,514 @@
+"""
+HTTP/JSON API for YourCarbonFootprint application.
+A dependency-free ASGI application over the tenant stores, for ERP systems and
+IoT gateways that push activity data and pull totals:
+
+    GET  /health
+    POST /v1/tenants/{tenant}/emissions     ingest a JSON array or NDJSON batch
+    GET  /v1/tenants/{tenant}/emissions     stream matching records as NDJSON
+    GET  /v1/tenants/{tenant}/aggregates    totals by scope, category, ...
+    GET  /v1/tenants/{tenant}/compliance    assess with the saved company info
+    POST /v1/tenants/{tenant}/compliance    assess with company info overrides
+    POST /v1/compliance/batch               assess many (entity, period) rows
+
+Ingest requests are not written one by one: requests for a tenant that arrive
+while a write is in progress or within API_BATCH_WINDOW_SECONDS are prepared
+and appended together (group commit), so many small requests cost one log
+write. Record listings are streamed in chunks, so large result sets never sit
+in memory as one JSON document. Dates are ISO 8601; records without one are
+dated today. Store and pandas work runs in worker threads,
+keeping the event loop free to accept requests; connection keep-alive is left
+to the ASGI server.
+
+Usage:
+    python api.py [--host 0.0.0.0] [--port 8000] [--workers 1]
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+from urllib.parse import parse_qs
+
+import numpy as np
+import pandas as pd
+
+from config import API_BATCH_WINDOW_SECONDS, API_BATCH_MAX_ROWS, API_STREAM_CHUNK_ROWS, API_MAX_BODY_BYTES, API_KEEP_ALIVE_SECONDS
+from aggregates import DIMENSIONS, EmissionsAggregates
+from csv_ingest import REQUIRED_COLUMNS, ENTERPRISE_DEFAULTS, prepare_chunk
+from emissions_index import INDEXED_COLUMNS
+from tenants import get_tenant
+
+
+class APIError(Exception):
+    """An error answered with an HTTP status and a JSON message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _clean(value):
+    """Make a payload JSON-safe: NumPy scalars as Python values, NaN as null."""
+    if isinstance(value, dict):
+        return {key: _clean(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return value
+
+
+def _dumps(payload):
+    return json.dumps(_clean(payload), default=str).encode("utf-8")
+
+
+def _open_tenant(tenant_id):
+    """Open an existing tenant, 404 for unknown or invalid ids."""
+    try:
+        return get_tenant(tenant_id)
+    except ValueError as e:
+        raise APIError(404, str(e))
+
+
+def _parse_records(body, content_type):
+    """
+    Parse a request body of records.
+
+    Args:
+        body (bytes): JSON array, {"records": [...]} or NDJSON
+        content_type (str): Request content type
+
+    Returns:
+        list: Record dicts
+    """
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        payload = json.loads(body or b"[]")
+    except ValueError as e:
+        raise APIError(400, f"Invalid JSON: {e}")
+    if isinstance(payload, dict):
+        payload = payload.get("records", [payload])
+    if not isinstance(payload, list) or not all(isinstance(record, dict) for record in payload):
+        raise APIError(400, "Expected a JSON array of records")
+    return payload
+
+
+def _parse_date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value[-1])
+    except ValueError:
+        raise APIError(400, f"Invalid {name} date: {value[-1]}")
+
+
+def _filters(params):
+    """Indexed column filters from the query string (repeated or comma-separated)."""
+    filters = {}
+    for column in INDEXED_COLUMNS:
+        if column in params:
+            filters[column] = [label for value in params[column] for label in value.split(",") if label]
+    return filters
+
+
+def _validate_records(records):
+    """
+    Check one ingest request before it is queued.
+
+    Only cheap per-record checks run here; typing, dates and factors are
+    handled for the whole batch at once in _write_batch.
+    """
+    if not records:
+        raise APIError(400, "No records")
+    for position, record in enumerate(records):
+        missing = [column for column in REQUIRED_COLUMNS if record.get(column) is None]
+        if missing:
+            raise APIError(400, f"Record {position} is missing: {', '.join(missing)}")
+        for column in ("quantity", "emission_factor", "emissions_kgCO2e"):
+            value = record.get(column)
+            if value is not None and not isinstance(value, (int, float)):
+                try:
+                    record[column] = float(value)
+                except (TypeError, ValueError):
+                    raise APIError(400, f"Record {position} has an invalid {column}: {value!r}")
+    return records
+
+
+def _write_batch(tenant_id, batches):
+    """
+    Prepare and append the records of several ingest requests as one write.
+
+    Args:
+        tenant_id (str): Tenant written to
+        batches (list): One list of validated records per request
+
+    Returns:
+        list: Per-request result dicts, in the order of batches
+    """
+    tenant = get_tenant(tenant_id)
+    records = [record for batch in batches for record in batch]
+    df = pd.DataFrame.from_records(records)
+    # Records without a date are dated today; dates are ISO 8601
+    dated = np.array(["date" in record for record in records])
+    dates = pd.to_datetime(df["date"], errors="coerce", format="ISO8601") if "date" in df.columns else pd.Series(pd.NaT, index=df.index)
+    df["date"] = dates.where(dated, pd.Timestamp.now().normalize())
+    for column, default_value in ENTERPRISE_DEFAULTS.items():
+        df[column] = df[column].fillna(default_value) if column in df.columns else default_value
+    computed = np.array(["emissions_kgCO2e" not in record for record in records])
+    if computed.all():
+        df = df.drop(columns="emissions_kgCO2e", errors="ignore")
+    prepared, _ = prepare_chunk(df, True, False)
+    if computed.any():
+        # Records that did not send emissions get quantity x factor
+        emissions = prepared["emissions_kgCO2e"].to_numpy(dtype="float64", copy=True)
+        emissions[computed] = (prepared["quantity"].to_numpy(dtype="float64") * prepared["emission_factor"].to_numpy(dtype="float64"))[computed]
+        prepared["emissions_kgCO2e"] = emissions
+    version = tenant.store.append(prepared)
+
+    invalid_dates = (prepared["date"].isna().to_numpy() & dated)
+    unresolved = prepared["emission_factor"].isna().to_numpy()
+    results = []
+    start = 0
+    for batch in batches:
+        stop = start + len(batch)
+        results.append({
+            "accepted": len(batch),
+            "invalid_dates": int(invalid_dates[start:stop].sum()),
+            "unresolved_factors": int(unresolved[start:stop].sum()),
+            "version": version,
+            "batched_requests": len(batches)
+        })
+        start = stop
+    return results
+
+
+class IngestBatcher:
+    def __init__(self, tenant_id, window=API_BATCH_WINDOW_SECONDS, max_rows=API_BATCH_MAX_ROWS):
+        """
+        Group-commit ingest requests of one tenant.
+
+        Args:
+            tenant_id (str): Tenant written to
+            window (float): Seconds to wait for more requests before writing
+            max_rows (int): Rows that trigger a write without waiting
+        """
+        self.tenant_id = tenant_id
+        self.window = window
+        self.max_rows = max_rows
+        self._pending = []
+        self._rows = 0
+        self._task = None
+
+    async def submit(self, records):
+        """
+        Queue the validated records of a request and wait until they are written.
+
+        Returns:
+            dict: accepted, invalid_dates, unresolved_factors, version and
+            batched_requests (requests written together with this one)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((records, future))
+        self._rows += len(records)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        try:
+            while self._pending:
+                if self._rows < self.max_rows:
+                    await asyncio.sleep(self.window)
+                # Requests that arrived meanwhile, up to max_rows (at least one)
+                taken, rows = [], 0
+                while self._pending and (not taken or rows + len(self._pending[0][0]) <= self.max_rows):
+                    taken.append(self._pending.pop(0))
+                    rows += len(taken[-1][0])
+                self._rows -= rows
+                try:
+                    results = await asyncio.to_thread(_write_batch, self.tenant_id, [records for records, _ in taken])
+                except Exception as e:
+                    for _, future in taken:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for (_, future), result in zip(taken, results):
+                        if not future.done():
+                            future.set_result(result)
+        finally:
+            self._task = None
+
+    async def drain(self):
+        """Wait until every queued request is written."""
+        while self._task is not None:
+            await asyncio.shield(self._task)
+
+
+class EmissionsAPI:
+    def __init__(self, batch_window=API_BATCH_WINDOW_SECONDS, batch_rows=API_BATCH_MAX_ROWS, stream_rows=API_STREAM_CHUNK_ROWS, max_body=API_MAX_BODY_BYTES):
+        """
+        Initialize the ASGI application.
+
+        Args:
+            batch_window (float): Seconds ingest requests are held for batching
+            batch_rows (int): Rows written per batch at most
+            stream_rows (int): Records per streamed NDJSON chunk
+            max_body (int): Largest accepted request body in bytes
+        """
+        self.batch_window = batch_window
+        self.batch_rows = batch_rows
+        self.stream_rows = stream_rows
+        self.max_body = max_body
+        self._batchers = {}
+        self._routes = [
+            ("GET", re.compile(r"^/health$"), self.health),
+            ("POST", re.compile(r"^/v1/tenants/([^/]+)/emissions$"), self.ingest),
+            ("GET", re.compile(r"^/v1/tenants/([^/]+)/emissions$"), self.list_emissions),
+            ("GET", re.compile(r"^/v1/tenants/([^/]+)/aggregates$"), self.aggregates),
+            ("GET", re.compile(r"^/v1/tenants/([^/]+)/compliance$"), self.compliance),
+            ("POST", re.compile(r"^/v1/tenants/([^/]+)/compliance$"), self.compliance),
+            ("POST", re.compile(r"^/v1/compliance/batch$"), self.compliance_batch),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        request = _Request(scope, receive, self.max_body)
+        started = False
+
+        async def tracked_send(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            handler, args = self._route(scope["method"], scope["path"])
+            await handler(request, tracked_send, *args)
+        except Exception as e:
+            # Once a (streamed) response has started another one cannot be
+            # sent; re-raising makes the server abort the connection instead
+            if started:
+                raise
+            if isinstance(e, APIError):
+                await _send_json(send, e.status, {"error": e.message})
+            else:
+                await _send_json(send, 500, {"error": f"{type(e).__name__}: {e}"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Write what is still queued before the server exits
+                for batcher in list(self._batchers.values()):
+                    await batcher.drain()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return handler, match.groups()
+                allowed = True
+        if allowed:
+            raise APIError(405, f"Method {method} not allowed")
+        raise APIError(404, f"Not found: {path}")
+
+    def _batcher(self, tenant_id):
+        batcher = self._batchers.get(tenant_id)
+        if batcher is None:
+            batcher = IngestBatcher(tenant_id, self.batch_window, self.batch_rows)
+            self._batchers[tenant_id] = batcher
+        return batcher
+
+    async def health(self, request, send):
+        await _send_json(send, 200, {"status": "ok"})
+
+    async def ingest(self, request, send, tenant_id):
+        _open_tenant(tenant_id)
+        records = _validate_records(_parse_records(await request.body(), request.content_type))
+        result = await self._batcher(tenant_id).submit(records)
+        await _send_json(send, 200, result)
+
+    async def list_emissions(self, request, send, tenant_id):
+        tenant = _open_tenant(tenant_id)
+        params = request.params
+        start_date, end_date = _parse_date(params, "start"), _parse_date(params, "end")
+        rows = await asyncio.to_thread(tenant.dataset.query, start_date, end_date, **_filters(params))
+
+        def serialise(start):
+            chunk = rows.iloc[start:start + self.stream_rows]
+            body = chunk.to_json(orient="records", lines=True, date_format="iso")
+            return body.encode("utf-8").rstrip(b"\n") + b"\n" if len(chunk) else b""
+
+        # The first chunk is serialised before the headers go out, so most
+        # errors still get a proper error response
+        body = await asyncio.to_thread(serialise, 0)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson"), (b"x-record-count", str(len(rows)).encode())]
+        })
+        for start in range(self.stream_rows, len(rows), self.stream_rows):
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+            body = await asyncio.to_thread(serialise, start)
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+    async def aggregates(self, request, send, tenant_id):
+        tenant = _open_tenant(tenant_id)
+        params = request.params
+        group_by = (params.get("group_by") or ["scope"])[-1]
+        if group_by not in DIMENSIONS:
+            raise APIError(400, f"group_by must be one of: {', '.join(DIMENSIONS)}")
+        start_date, end_date = _parse_date(params, "start"), _parse_date(params, "end")
+        filters = _filters(params)
+
+        def compute():
+            # Unfiltered totals come straight from the materialised aggregates
+            if start_date is None and end_date is None and not filters:
+                return tenant.dataset.version, tenant.dataset.aggregates()
+            rows = tenant.dataset.query(start_date, end_date, **filters)
+            return tenant.dataset.version, EmissionsAggregates.from_frame(rows)
+
+        version, aggregates = await asyncio.to_thread(compute)
+        await _send_json(send, 200, {
+            "version": version,
+            "group_by": group_by,
+            "total_emissions_kgCO2e": aggregates.total_emissions,
+            "entry_count": aggregates.entry_count,
+            "groups": aggregates.totals(group_by).to_dict(orient="records")
+        })
+
+    async def compliance(self, request, send, tenant_id):
+        from carbon_compliance import CarbonComplianceFramework
+
+        tenant = _open_tenant(tenant_id)
+        try:
+            options = json.loads(await request.body() or b"{}") if request.method == "POST" else {}
+        except ValueError as e:
+            raise APIError(400, f"Invalid JSON: {e}")
+        if not isinstance(options, dict):
+            raise APIError(400, "Expected a JSON object")
+        overrides = options.get("company_info") or {}
+        if not isinstance(overrides, dict):
+            raise APIError(400, "company_info must be a JSON object")
+        period = options.get("assessment_period_months", (request.params.get("period_months") or [12])[-1])
+        try:
+            period = int(period)
+        except (TypeError, ValueError):
+            raise APIError(400, f"Invalid assessment period: {period}")
+
+        def assess():
+            company_info = dict(tenant.load_company_info() or {})
+            company_info.update(overrides)
+            return CarbonComplianceFramework(tenant_id).assess_compliance(company_info=company_info, assessment_period_months=period)
+
+        result = await asyncio.to_thread(assess)
+        await _send_json(send, 200, {
+            "tenant": tenant_id,
+            "status": result.status.value,
+            "score": result.score,
+            "fine_amount": result.fine_amount,
+            "credit_amount": result.credit_amount,
+            "emissions_actual_tonnes": result.emissions_actual,
+            "emissions_benchmark_tonnes": result.emissions_benchmark,
+            "performance_ratio": result.performance_ratio,
+            "recommendations": result.recommendations,
+            "next_review_date": result.next_review_date,
+            "period": result.period_description,
+            "actual_period_months": result.actual_period_months
+        })
+
+    async def compliance_batch(self, request, send):
+        from carbon_compliance import CarbonComplianceFramework
+
+        records = _parse_records(await request.body(), request.content_type)
+        params = request.params
+        entity_column = (params.get("entity_column") or ["entity"])[-1]
+        period_column = (params.get("period_column") or ["period"])[-1]
+
+        def assess():
+            return CarbonComplianceFramework().assess_compliance_batch(pd.DataFrame(records), entity_column, period_column)
+
+        try:
+            results = await asyncio.to_thread(assess)
+        except ValueError as e:
+            raise APIError(400, str(e))
+        await _send_json(send, 200, {"results": results.to_dict(orient="records")})
+
+
+class _Request:
+    """The parts of an ASGI HTTP request the handlers use."""
+
+    def __init__(self, scope, receive, max_body):
+        self.method = scope["method"]
+        self.params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        headers = dict(scope.get("headers") or [])
+        self.content_type = headers.get(b"content-type", b"application/json").decode("latin-1").lower()
+        self._receive = receive
+        self._max_body = max_body
+
+    async def body(self):
+        chunks = []
+        size = 0
+        while True:
+            message = await self._receive()
+            if message["type"] == "http.disconnect":
+                raise APIError(400, "Client disconnected")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self._max_body:
+                raise APIError(413, f"Request body larger than {self._max_body} bytes")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+
+async def _send_json(send, status, payload):
+    body = _dumps(payload)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+app = EmissionsAPI()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the emissions HTTP/JSON API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Server processes (default: 1)")
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        print("The API server needs uvicorn: pip install uvicorn", file=sys.stderr)
+        return 1
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, timeout_keep_alive=API_KEEP_ALIVE_SECONDS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,26 @@
+import startup_timing
+startup_timing.start()
+
 import streamlit as st
 import pandas as pd
 import os
-import json
-import shutil
 import time
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
 from dotenv import load_dotenv
-import base64
 from io import BytesIO
+from emissions_schema import empty_emissions_frame
+from tenants import get_tenant
+from config import CSV_PREVIEW_ROWS, DEFAULT_TENANT, TENANT_MAX_OPEN
+from csv_ingest import ingest_csv, CSVIngestError, REQUIRED_COLUMNS
+from bulk_import import bulk_import, read_archive
+from emissions_digest import build_emissions_digest
+from report_jobs import get_report_queue
+from figure_cache import get_figure_cache
+from data_view import query_page, filter_options, PAGE_SIZES, DEFAULT_PAGE_SIZE
+
+# Plotly, CrewAI, the compliance framework and the report generator are
+# imported on the pages that use them, so the Home page paints without them
+startup_timing.mark("imports")
 
 # Load environment variables
 load_dotenv()
@@ -20,60 +31,39 @@ os.makedirs('data', exist_ok=True)
 # Set page config for wide layout
 st.set_page_config(page_title="CarbonSenseAI", page_icon="🌍", layout="wide")
 
-# Initialize session state variables if they don't exist
-if 'emissions_data' not in st.session_state:
-    # Load data if exists, otherwise create empty dataframe
-    if os.path.exists('data/emissions.json'):
-        try:
-            with open('data/emissions.json', 'r') as f:
-                data = f.read().strip()
-                if data:  # Check if file is not empty
-                    try:
-                        st.session_state.emissions_data = pd.DataFrame(json.loads(data))
-                    except json.JSONDecodeError:
-                        # Create a backup of the corrupted file
-                        backup_file = f'data/emissions_backup_{int(time.time())}.json'
-                        shutil.copy('data/emissions.json', backup_file)
-                        st.warning(f"Corrupted emissions data file found. A backup has been created at {backup_file}")
-                        # Create empty dataframe
-                        st.session_state.emissions_data = pd.DataFrame(columns=[
-                            'date', 'business_unit', 'project', 'scope', 'category', 'activity', 
-                            'country', 'facility', 'responsible_person', 'quantity', 'unit', 
-                            'emission_factor', 'emissions_kgCO2e', 'data_quality', 
-                            'verification_status', 'notes'
-                        ])
-                else:
-                    # Empty file, create new DataFrame
-                    st.session_state.emissions_data = pd.DataFrame(columns=[
-                        'date', 'business_unit', 'project', 'scope', 'category', 'activity', 
-                        'country', 'facility', 'responsible_person', 'quantity', 'unit', 
-                        'emission_factor', 'emissions_kgCO2e', 'data_quality', 
-                        'verification_status', 'notes'
-                    ])
-        except Exception as e:
-            st.error(f"Error loading emissions data: {str(e)}")
-            # Create empty dataframe if loading fails
-            st.session_state.emissions_data = pd.DataFrame(columns=[
-                'date', 'business_unit', 'project', 'scope', 'category', 'activity', 
-                'country', 'facility', 'responsible_person', 'quantity', 'unit', 
-                'emission_factor', 'emissions_kgCO2e', 'data_quality', 
-                'verification_status', 'notes'
-            ])
-            # Make sure data directory exists
-            os.makedirs('data', exist_ok=True)
-    else:
-        st.session_state.emissions_data = pd.DataFrame(columns=[
-            'date', 'business_unit', 'project', 'scope', 'category', 'activity', 
-            'country', 'facility', 'responsible_person', 'quantity', 'unit', 
-            'emission_factor', 'emissions_kgCO2e', 'data_quality', 
-            'verification_status', 'notes'
-        ])
-        # Make sure data directory exists
-        os.makedirs('data', exist_ok=True)
+# Each session works on one tenant (company): ?tenant=<id> in the URL, else
+# the deployment's default tenant (CARBONSENSE_TENANT), whose store migrates
+# data/emissions.json on first run
+if 'tenant_id' not in st.session_state:
+    st.session_state.tenant_id = st.query_params.get('tenant') or DEFAULT_TENANT
+
+def current_tenant():
+    return get_tenant(st.session_state.tenant_id)
+
+def get_emissions_store():
+    return current_tenant().store
+
+try:
+    current_tenant()
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+# Every session reads a copy-on-write view of its tenant's process-wide
+# dataset, so memory stays flat as users are added and other sessions' writes
+# show up on the next rerun
+try:
+    st.session_state.emissions_data, st.session_state.emissions_base = current_tenant().dataset.snapshot()
+except Exception as e:
+    st.error(f"Error loading emissions data: {str(e)}")
+    # Create empty dataframe if loading fails
+    st.session_state.emissions_data = empty_emissions_frame()
+    st.session_state.emissions_base = st.session_state.emissions_data.copy(deep=False)
 if 'theme' not in st.session_state:
     st.session_state.theme = 'dark'
 if 'active_page' not in st.session_state:
     st.session_state.active_page = "Home"
+startup_timing.mark("session")
 
 # Translation dictionary
 translations = {
@@ -155,28 +145,21 @@ def format_date_nice(date_obj):
 
 # Function to save emissions data
 def save_emissions_data():
+    """Merge the edited session dataset into the store, keeping other sessions' writes."""
     try:
-        # Create data directory if it doesn't exist
-        os.makedirs('data', exist_ok=True)
-        
-        # Create a backup of the existing file if it exists
-        if os.path.exists('data/emissions.json'):
-            backup_path = 'data/emissions_backup.json'
-            try:
-                with open('data/emissions.json', 'r') as src, open(backup_path, 'w') as dst:
-                    dst.write(src.read())
-            except Exception:
-                # Continue even if backup fails
-                pass
-        
-        # Save data to JSON file with proper formatting
-        with open('data/emissions.json', 'w') as f:
-            if len(st.session_state.emissions_data) > 0:
-                json.dump(st.session_state.emissions_data.to_dict('records'), f, indent=2)
-            else:
-                # Write empty array if no data
-                f.write('[]')
-                
+        get_emissions_store().merge(st.session_state.emissions_data, st.session_state.emissions_base)
+        st.session_state.emissions_data, st.session_state.emissions_base = current_tenant().dataset.snapshot()
+        return True
+    except Exception as e:
+        st.error(f"Error saving data: {str(e)}")
+        return False
+
+# Function to append new rows to the store and the session data
+def append_emissions_data(new_rows):
+    """Append rows to the store log without rewriting the existing dataset."""
+    try:
+        get_emissions_store().append(new_rows)
+        st.session_state.emissions_data, st.session_state.emissions_base = current_tenant().dataset.snapshot()
         return True
     except Exception as e:
         st.error(f"Error saving data: {str(e)}")
@@ -191,7 +174,7 @@ def add_emission_entry(date, business_unit, project, scope, category, activity,
         
         # Create new entry
         new_entry = pd.DataFrame([{
-            'date': date.strftime('%Y-%m-%d'),
+            'date': pd.Timestamp(date),
             'business_unit': business_unit,
             'project': project,
             'scope': scope,
@@ -209,151 +192,217 @@ def add_emission_entry(date, business_unit, project, scope, category, activity,
             'notes': notes
         }])
         
-        # Add to existing data
-        st.session_state.emissions_data = pd.concat([st.session_state.emissions_data, new_entry], ignore_index=True)
-        
-        # Save data and return success/failure
-        return save_emissions_data()
+        # Append to the store and return success/failure
+        return append_emissions_data(new_entry)
     except Exception as e:
         st.error(f"Error adding entry: {str(e)}")
         return False
 
-def delete_emission_entry(index):
+def delete_emission_entries(record_ids):
+    """Delete entries by record id; returns the number of entries deleted."""
     try:
-        # Make a copy of the current data
-        if len(st.session_state.emissions_data) > index:
-            # Drop the row at the specified index
-            st.session_state.emissions_data = st.session_state.emissions_data.drop(index).reset_index(drop=True)
-            
-            # Save data and return success/failure
-            return save_emissions_data()
-        else:
-            st.error("Invalid index for deletion")
-            return False
+        deleted = get_emissions_store().delete(record_ids)
+        st.session_state.emissions_data, st.session_state.emissions_base = current_tenant().dataset.snapshot()
+        return deleted
     except Exception as e:
         st.error(f"Error deleting entry: {str(e)}")
-        return False
+        return 0
 
 # Function to process uploaded CSV with enhanced date handling
 def process_csv(uploaded_file, start_date=None, end_date=None):
-    """Process uploaded CSV file and add to emissions data with flexible date handling."""
+    """Stream an uploaded CSV file into the emissions store with flexible date handling."""
+    progress_bar = st.progress(0.0, text="Importing CSV...")
+
+    def report_progress(fraction, rows):
+        progress_bar.progress(fraction, text=f"Read {rows:,} rows")
+
     try:
-        # Reset file pointer to beginning
-        uploaded_file.seek(0)
-        
-        # Read CSV file with better error handling
         try:
-            df = pd.read_csv(uploaded_file)
-        except pd.errors.EmptyDataError:
-            st.error("The uploaded file appears to be empty. Please upload a valid CSV file.")
-            return False
-        except pd.errors.ParserError as e:
-            st.error(f"Error parsing CSV file: {str(e)}. Please check the file format.")
+            result = ingest_csv(uploaded_file, get_emissions_store(), progress=report_progress)
+        except CSVIngestError as e:
+            st.error(str(e))
             return False
-        except Exception as e:
-            st.error(f"Error reading CSV file: {str(e)}")
-            return False
-        
-        # Check if dataframe is empty
-        if df.empty:
-            st.error("The uploaded CSV file contains no data.")
-            return False
-            
-        required_columns = ['scope', 'category', 'activity', 'quantity', 'unit', 'emission_factor']
-        
-        # Check if all required columns exist (date/reporting_period is now optional)
-        missing_required = [col for col in required_columns if col not in df.columns]
-        if missing_required:
-            st.error(f"CSV must contain all required columns: {', '.join(missing_required)}")
-            return False
-        
-        # Handle date column - now optional (support both 'date' and 'reporting_period')
-        has_dates = 'date' in df.columns
-        has_reporting_period = 'reporting_period' in df.columns
-        
-        if has_dates:
+        finally:
+            # Nothing is committed on failure, but other sessions may have written
+            st.session_state.emissions_data, st.session_state.emissions_base = current_tenant().dataset.snapshot()
+
+        if result.has_dates:
             st.info("✅ Date column found - using specific dates from your file")
-            try:
-                # Validate existing dates
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-                
-                # Check for invalid dates
-                invalid_dates = df['date'].isnull().sum()
-                if invalid_dates > 0:
-                    st.warning(f"⚠️ Found {invalid_dates} invalid dates - these will be auto-assigned to assessment period")
-                
-                # Convert valid dates to string format
-                df['date'] = df['date'].dt.strftime('%Y-%m-%d')
-                
-            except Exception as e:
-                st.warning(f"Date processing issue: {str(e)} - will auto-assign dates")
-                has_dates = False
-        elif has_reporting_period:
+            if result.invalid_dates > 0:
+                st.warning(f"⚠️ Found {result.invalid_dates} invalid dates - these will be auto-assigned to assessment period")
+        elif result.has_reporting_period:
             st.info("📊 Reporting period found - using period-based data")
-            # Use current date for reporting period data
-            df['date'] = datetime.now().strftime('%Y-%m-%d')
             st.info("📅 Using current date for reporting period data")
-        
-        if not has_dates and not has_reporting_period:
-            # Auto-assign current date for all entries
+        else:
             st.info("📊 No date column - using current date for all entries")
-            df['date'] = datetime.now().strftime('%Y-%m-%d')
             st.info("📅 Using current date for all entries")
-        
-        # Validate data types
-        try:
-            # Convert quantity and emission_factor to float
-            df['quantity'] = df['quantity'].astype(float)
-            df['emission_factor'] = df['emission_factor'].astype(float)
-        except Exception as e:
-            st.error(f"Data validation error: {str(e)}")
-            return False
-        
-        # Calculate emissions if not provided, or use pre-calculated if available
-        if 'emissions_kgCO2e' not in df.columns:
-            df['emissions_kgCO2e'] = df['quantity'] * df['emission_factor']
+
+        if result.unresolved_factors > 0:
+            st.warning(f"⚠️ No emission factor found for {result.unresolved_factors} entries - add an emission_factor column for these activities")
+
+        if result.computed_emissions:
             st.info("✅ Calculated emissions from quantity × emission factor")
         else:
-            # Use pre-calculated emissions but validate
-            df['emissions_kgCO2e'] = pd.to_numeric(df['emissions_kgCO2e'], errors='coerce')
             st.info("✅ Using pre-calculated emissions from your file")
-        
-        # Add enterprise fields if not present
-        enterprise_fields = {
-            'business_unit': 'Corporate',
-            'project': 'Not Applicable',
-            'country': 'India',
-            'facility': '',
-            'responsible_person': '',
-            'data_quality': 'Medium',
-            'verification_status': 'Unverified',
-            'notes': ''
-        }
-        
-        # Add missing columns with default values
-        for field, default_value in enterprise_fields.items():
-            if field not in df.columns:
-                df[field] = default_value
-        
-        # Clean up reporting_period column if it exists (not needed in final data)
-        if 'reporting_period' in df.columns:
-            df = df.drop('reporting_period', axis=1)
+
+        if result.has_reporting_period:
             st.info("ℹ️ Converted reporting period to date format for storage")
-        
-        # Append to existing data
-        st.session_state.emissions_data = pd.concat([st.session_state.emissions_data, df], ignore_index=True)
-        
-        # Save data
-        if save_emissions_data():
-            st.success(f"Successfully added {len(df)} entries to your emissions database")
-            return True
-        else:
-            st.error("Failed to save data")
-            return False
+
+        st.success(f"Successfully added {result.rows_imported} entries to your emissions database")
+        return True
     except Exception as e:
         st.error(f"Error processing CSV: {str(e)}")
         return False
 
+# Show the outcome of a background AI request without blocking the page
+@st.fragment(run_every=1.0)
+def render_crew_result(state_key):
+    """Render the result of the AI request stored under state_key, polling until it finishes."""
+    future = st.session_state.get(state_key)
+    if future is None:
+        return
+    if not future.done():
+        st.info("⏳ Working on it - the answer will appear here. You can keep using the app meanwhile.")
+        return
+    try:
+        # Crew outputs are returned as text
+        st.markdown(f"<div class='stCard'>{future.result()}</div>", unsafe_allow_html=True)
+    except Exception as e:
+        st.error(f"Error: {str(e)}. Please check your API key and try again.")
+
+# Report generator shared by all sessions of a tenant; reports run on the background job queue
+@st.cache_resource(max_entries=TENANT_MAX_OPEN)
+def get_report_generator(tenant_id):
+    from data_handler import DataHandler
+    from report_generator import ReportGenerator
+    return ReportGenerator(DataHandler(tenant_id))
+
+# Show progress of a background report job and offer the file when it is ready
+@st.fragment(run_every=1.0)
+def render_report_job(state_key, label, file_name, mime):
+    """Render the report job stored under state_key, polling until it finishes."""
+    job_id = st.session_state.get(state_key)
+    if job_id is None:
+        return
+    job = get_report_queue().status(job_id)
+    if job is None:
+        return
+    if job['status'] in ('queued', 'running'):
+        st.progress(job['progress'], text=f"Generating {job['kind'].upper()}... {job['progress']:.0%}")
+    elif job['status'] == 'done':
+        content = get_report_queue().result(job_id)
+        if content is not None:
+            st.download_button(label=label, data=content, file_name=file_name, mime=mime, key=f"{state_key}_download")
+    else:
+        st.error(job['message'] or "Report generation failed")
+
+# Dashboard charts, built from the materialised aggregates and served from the figure cache
+def build_scope_pie_chart(aggregates):
+    """Pie chart of emissions by scope, or None if there is nothing to draw."""
+    import plotly.express as px
+    scope_data = aggregates.totals('scope')
+    if scope_data.empty:
+        return None
+    fig = px.pie(
+        scope_data, 
+        values='emissions_kgCO2e', 
+        names='scope',
+        title="🌍 Emissions by Scope",
+        color_discrete_sequence=['#ff6b6b', '#4ecdc4', '#ffd93d', '#6c5ce7', '#a29bfe', '#fd79a8']
+    )
+
+    fig.update_traces(
+        textposition='inside', 
+        textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>%{value:.1f} kgCO2e<br>%{percent}<extra></extra>',
+        textfont_size=14,
+        marker=dict(line=dict(color='#FFFFFF', width=3))
+    )
+
+    fig.update_layout(
+        font=dict(size=16, color='#333'),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        title_font_size=24,
+        title_font_color='#667eea',
+        title_x=0.5,
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.3,
+            xanchor="center",
+            x=0.5,
+            font=dict(size=14)
+        ),
+        height=500
+    )
+    return fig
+
+def build_category_bar_chart(aggregates):
+    """Horizontal bar chart of the top 10 categories, or None if there is nothing to draw."""
+    import plotly.express as px
+    category_data = aggregates.totals('category')
+    category_data = category_data.sort_values('emissions_kgCO2e', ascending=False).head(10)
+    if category_data.empty:
+        return None
+    fig = px.bar(
+        category_data,
+        x='emissions_kgCO2e',
+        y='category',
+        orientation='h',
+        title="📊 Top Emission Categories",
+        color='emissions_kgCO2e',
+        color_continuous_scale=['#ff6b6b', '#4ecdc4', '#ffd93d', '#6c5ce7']
+    )
+
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        title_font_size=18,
+        title_font_color='#667eea',
+        title_x=0.5,
+        showlegend=False,
+        xaxis_title="Emissions (kgCO2e)",
+        yaxis_title="Category",
+        height=400,
+        font=dict(size=12, color='#333')
+    )
+    return fig
+
+def build_time_series_chart(aggregates):
+    """Monthly emissions per scope, or None if there is no dated data."""
+    import plotly.express as px
+    time_data = aggregates.totals('month_scope')
+    if time_data.empty:
+        return None
+    fig = px.line(
+        time_data, 
+        x='month', 
+        y='emissions_kgCO2e', 
+        color='scope', 
+        markers=True,
+        title="📈 Emissions Over Time",
+        color_discrete_sequence=['#ff6b6b', '#4ecdc4', '#ffd93d'],
+        line_shape='spline'
+    )
+
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        title_font_size=18,
+        title_font_color='#667eea',
+        title_x=0.5,
+        xaxis_title="Month",
+        yaxis_title="Emissions (kgCO2e)",
+        legend_title="Scope",
+        height=400,
+        font=dict(size=12, color='#333')
+    )
+
+    fig.update_traces(line=dict(width=4), marker=dict(size=8))
+    return fig
+
 # Function to generate PDF report
 def generate_report():
     # Create a BytesIO object
@@ -1543,11 +1592,10 @@ if st.session_state.active_page == "Home":
         
         col1, col2, col3, col4 = st.columns(4)
         
-        # Calculate metrics
-        st.session_state.emissions_data['emissions_kgCO2e'] = pd.to_numeric(st.session_state.emissions_data['emissions_kgCO2e'], errors='coerce')
-        st.session_state.emissions_data['emissions_kgCO2e'].fillna(0, inplace=True)
-        total_emissions = st.session_state.emissions_data['emissions_kgCO2e'].sum()
-        total_entries = len(st.session_state.emissions_data)
+        # Calculate metrics from the materialised aggregates
+        aggregates = current_tenant().dataset.aggregates()
+        total_emissions = aggregates.total_emissions
+        total_entries = aggregates.entry_count
         
         with col1:
             st.metric("Total Emissions", f"{total_emissions:.1f} kgCO2e")
@@ -1556,18 +1604,10 @@ if st.session_state.active_page == "Home":
             st.metric("Data Points", str(total_entries))
         
         with col3:
-            scopes_covered = st.session_state.emissions_data['scope'].nunique()
-            st.metric("Scopes Covered", f"{scopes_covered}/3")
+            st.metric("Scopes Covered", f"{aggregates.scopes_covered}/3")
         
         with col4:
-            if 'date' in st.session_state.emissions_data.columns:
-                st.session_state.emissions_data['date'] = pd.to_datetime(st.session_state.emissions_data['date'], errors='coerce')
-                if not st.session_state.emissions_data['date'].isnull().all():
-                    latest_date = format_date_nice(st.session_state.emissions_data['date'].max())
-                else:
-                    latest_date = "No date data"
-            else:
-                latest_date = "No date data"
+            latest_date = format_date_nice(aggregates.latest_date) if aggregates.latest_date is not None else "No date data"
             st.metric("Latest Entry", latest_date)
         
         st.success("🎉 Great! You have emissions data. Visit the Dashboard to see detailed analytics and charts!")
@@ -1595,12 +1635,13 @@ elif st.session_state.active_page == "Dashboard":
                 st.session_state.active_page = "Data Entry"
                 st.rerun()
     else:
-        # Calculate metrics
-        st.session_state.emissions_data['emissions_kgCO2e'] = pd.to_numeric(st.session_state.emissions_data['emissions_kgCO2e'], errors='coerce')
-        st.session_state.emissions_data['emissions_kgCO2e'].fillna(0, inplace=True)
-        
-        total_emissions = st.session_state.emissions_data['emissions_kgCO2e'].sum()
-        total_entries = len(st.session_state.emissions_data)
+        # Calculate metrics from the materialised aggregates
+        version, aggregates = current_tenant().dataset.versioned_aggregates()
+        figures = get_figure_cache()
+        chart_theme = f"dashboard-{st.session_state.theme}"
+        chart_filters = {"tenant": st.session_state.tenant_id}
+        total_emissions = aggregates.total_emissions
+        total_entries = aggregates.entry_count
         
         # Clean metrics display
         col1, col2, col3, col4 = st.columns(4)
@@ -1609,20 +1650,11 @@ elif st.session_state.active_page == "Dashboard":
             st.metric("Total Emissions", f"{total_emissions:.1f} kgCO2e", help="Your total carbon footprint")
         
         with col2:
-            if 'date' in st.session_state.emissions_data.columns:
-                st.session_state.emissions_data['date'] = pd.to_datetime(st.session_state.emissions_data['date'], errors='coerce')
-                if not st.session_state.emissions_data['date'].isnull().all():
-                    latest_date = format_date_nice(st.session_state.emissions_data['date'].max())
-                else:
-                    latest_date = "No date data"
-            else:
-                latest_date = "No date data"
-            
+            latest_date = format_date_nice(aggregates.latest_date) if aggregates.latest_date is not None else "No date data"
             st.metric("Latest Entry", latest_date, help="Most recent data entry")
         
         with col3:
-            scopes_covered = st.session_state.emissions_data['scope'].nunique()
-            st.metric("Scopes Covered", f"{scopes_covered}/3", help="Emission scope coverage")
+            st.metric("Scopes Covered", f"{aggregates.scopes_covered}/3", help="Emission scope coverage")
         
         with col4:
             st.metric("Data Points", str(total_entries), help="Total entries in database")
@@ -1632,45 +1664,9 @@ elif st.session_state.active_page == "Dashboard":
             st.markdown("<h2 style='text-align: center; margin: 3rem 0 2rem 0;'>📈 Your Analytics 📈</h2>", unsafe_allow_html=True)
             
             # Emissions by scope with vibrant colors
-            scope_data = st.session_state.emissions_data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
+            fig1 = figures.get_or_build(version, chart_filters, "scope_pie", chart_theme, lambda: build_scope_pie_chart(aggregates))
             
-            if not scope_data.empty:
-                # Create a more colorful pie chart
-                fig1 = px.pie(
-                    scope_data, 
-                    values='emissions_kgCO2e', 
-                    names='scope',
-                    title="🌍 Emissions by Scope",
-                    color_discrete_sequence=['#ff6b6b', '#4ecdc4', '#ffd93d', '#6c5ce7', '#a29bfe', '#fd79a8']
-                )
-                
-                fig1.update_traces(
-                    textposition='inside', 
-                    textinfo='percent+label',
-                    hovertemplate='<b>%{label}</b><br>%{value:.1f} kgCO2e<br>%{percent}<extra></extra>',
-                    textfont_size=14,
-                    marker=dict(line=dict(color='#FFFFFF', width=3))
-                )
-                
-                fig1.update_layout(
-                    font=dict(size=16, color='#333'),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    title_font_size=24,
-                    title_font_color='#667eea',
-                    title_x=0.5,
-                    showlegend=True,
-                    legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=-0.3,
-                        xanchor="center",
-                        x=0.5,
-                        font=dict(size=14)
-                    ),
-                    height=500
-                )
-                
+            if fig1 is not None:
                 # Center the emissions by scope chart
                 col_left, col_center, col_right = st.columns([1, 3, 1])
                 with col_center:
@@ -1681,76 +1677,18 @@ elif st.session_state.active_page == "Dashboard":
             
             with col1:
                 # Category breakdown with vibrant colors
-                category_data = st.session_state.emissions_data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
-                category_data = category_data.sort_values('emissions_kgCO2e', ascending=False).head(10)
+                fig2 = figures.get_or_build(version, chart_filters, "category_bar", chart_theme, lambda: build_category_bar_chart(aggregates))
                 
-                if not category_data.empty:
-                    fig2 = px.bar(
-                        category_data,
-                        x='emissions_kgCO2e',
-                        y='category',
-                        orientation='h',
-                        title="📊 Top Emission Categories",
-                        color='emissions_kgCO2e',
-                        color_continuous_scale=['#ff6b6b', '#4ecdc4', '#ffd93d', '#6c5ce7']
-                    )
-                    
-                    fig2.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        title_font_size=18,
-                        title_font_color='#667eea',
-                        title_x=0.5,
-                        showlegend=False,
-                        xaxis_title="Emissions (kgCO2e)",
-                        yaxis_title="Category",
-                        height=400,
-                        font=dict(size=12, color='#333')
-                    )
-                    
+                if fig2 is not None:
                     st.plotly_chart(fig2, use_container_width=True)
             
             with col2:
                 # Time series with vibrant colors
-                if 'date' in st.session_state.emissions_data.columns:
-                    time_data = st.session_state.emissions_data.copy()
-                    time_data['date'] = pd.to_datetime(time_data['date'], errors='coerce')
-                    time_data = time_data.dropna(subset=['date'])
+                if aggregates.latest_date is not None:
+                    fig3 = figures.get_or_build(version, chart_filters, "time_series", chart_theme, lambda: build_time_series_chart(aggregates))
                     
-                    if not time_data.empty:
-                        time_data['month'] = time_data['date'].dt.strftime('%Y-%m')
-                        time_data = time_data.groupby(['month', 'scope'])['emissions_kgCO2e'].sum().reset_index()
-                        
-                        if len(time_data['month'].unique()) > 0:
-                            fig3 = px.line(
-                                time_data, 
-                                x='month', 
-                                y='emissions_kgCO2e', 
-                                color='scope', 
-                                markers=True,
-                                title="📈 Emissions Over Time",
-                                color_discrete_sequence=['#ff6b6b', '#4ecdc4', '#ffd93d'],
-                                line_shape='spline'
-                            )
-                            
-                            fig3.update_layout(
-                                plot_bgcolor='rgba(0,0,0,0)',
-                                paper_bgcolor='rgba(0,0,0,0)',
-                                title_font_size=18,
-                                title_font_color='#667eea',
-                                title_x=0.5,
-                                xaxis_title="Month",
-                                yaxis_title="Emissions (kgCO2e)",
-                                legend_title="Scope",
-                                height=400,
-                                font=dict(size=12, color='#333')
-                            )
-                            
-                            fig3.update_traces(line=dict(width=4), marker=dict(size=8))
-                            
-                            st.plotly_chart(fig3, use_container_width=True)
-                        else:
-                            st.info("📊 Not enough time data to show emissions over time.")
+                    if fig3 is not None:
+                        st.plotly_chart(fig3, use_container_width=True)
                     else:
                         st.info("📅 No valid date data available for time series chart.")
                 else:
@@ -1776,24 +1714,24 @@ elif st.session_state.active_page == "Data Entry":
         st.markdown("### � Current Data Summary")
         
         col1, col2, col3, col4 = st.columns(4)
+        aggregates = current_tenant().dataset.aggregates()
         
         with col1:
-            total_entries = len(st.session_state.emissions_data)
+            total_entries = aggregates.entry_count
             st.metric("Total Entries", total_entries)
         
         with col2:
-            total_emissions = st.session_state.emissions_data['emissions_kgCO2e'].sum()
+            total_emissions = aggregates.total_emissions
             st.metric("Total Emissions (kgCO2e)", f"{total_emissions:,.2f}")
         
         with col3:
-            scopes = st.session_state.emissions_data['scope'].nunique()
-            st.metric("Scopes Covered", f"{scopes}/3")
+            st.metric("Scopes Covered", f"{aggregates.scopes_covered}/3")
         
         with col4:
             if total_entries > 0:
-                latest_date = st.session_state.emissions_data['date'].max()
+                latest_date = aggregates.latest_date
                 # Convert timestamp to string for display
-                if pd.notna(latest_date):
+                if latest_date is not None:
                     latest_date_str = str(latest_date).split(' ')[0]  # Get just the date part
                 else:
                     latest_date_str = "No valid date"
@@ -2031,21 +1969,57 @@ elif st.session_state.active_page == "Data Entry":
                     except Exception as e:
                         st.error(f"{t('entry_failed')} {str(e)}")
     
-    # Show existing data table
+    # Show existing data table, one page at a time
     if len(st.session_state.emissions_data) > 0:
         st.markdown("<h3>Existing Emissions Data</h3>", unsafe_allow_html=True)
         
-        # Create a copy of the dataframe with an action column
-        display_df = st.session_state.emissions_data.copy()
+        # The shared dataset; only the visible page is copied and sent to the browser
+        dataset = current_tenant().dataset.get()
+        
+        with st.expander("🔎 Filter & Sort", expanded=False):
+            fcol1, fcol2, fcol3 = st.columns(3)
+            with fcol1:
+                grid_start = st.date_input("From", value=None, key="grid_start_date")
+                grid_end = st.date_input("To", value=None, key="grid_end_date")
+            with fcol2:
+                grid_scopes = st.multiselect("Scope", filter_options(dataset, "scope"), key="grid_scopes")
+                grid_facilities = st.multiselect("Facility", filter_options(dataset, "facility"), key="grid_facilities")
+            with fcol3:
+                grid_units = st.multiselect("Business Unit", filter_options(dataset, "business_unit"), key="grid_business_units")
+                sort_by = st.selectbox(
+                    "Sort by",
+                    ["date", "emissions_kgCO2e", "scope", "category", "facility", "business_unit", "quantity"],
+                    key="grid_sort_by"
+                )
+                ascending = st.toggle("Ascending", value=False, key="grid_ascending")
+        
+        pcol1, pcol2 = st.columns([1, 3])
+        with pcol1:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key="grid_page_size")
+        with pcol2:
+            page_number = st.number_input("Page", min_value=1, value=1, step=1, key="grid_page")
+        
+        page = query_page(
+            dataset,
+            start_date=grid_start,
+            end_date=grid_end,
+            filters={"scope": grid_scopes, "facility": grid_facilities, "business_unit": grid_units},
+            sort_by=sort_by,
+            ascending=ascending,
+            page=page_number,
+            page_size=page_size,
+            index=current_tenant().dataset.index()
+        )
+        st.caption(f"Showing {page.first_row:,}-{page.last_row:,} of {page.total_rows:,} entries (page {page.page} of {page.page_count})")
         
-        # Add a column for the delete action
         col1, col2 = st.columns([3, 1])
         
         with col1:
-            # Display the dataframe
-            st.dataframe(
-                display_df,
+            # Display the current page; rows are selectable for deletion
+            grid = st.dataframe(
+                page.rows,
                 column_config={
+                    "record_id": st.column_config.NumberColumn("ID", format="%d"),
                     "date": st.column_config.DateColumn("Date"),
                     "business_unit": st.column_config.TextColumn("Business Unit"),
                     "project": st.column_config.TextColumn("Project"),
@@ -2064,23 +2038,25 @@ elif st.session_state.active_page == "Data Entry":
                     "notes": st.column_config.TextColumn("Notes"),
                 },
                 use_container_width=True,
-                hide_index=False
+                hide_index=False,
+                on_select="rerun",
+                selection_mode="multi-row",
+                key="emissions_grid"
             )
         
         with col2:
-            # Add delete functionality
-            st.markdown("### Delete Entry")
-            entry_to_delete = st.number_input("Select entry number to delete", min_value=0, 
-                                           max_value=len(display_df)-1 if len(display_df) > 0 else 0, 
-                                           step=1, 
-                                           help="Enter the index number of the entry you want to delete")
+            # Delete the selected entries by their record id
+            st.markdown("### Delete Entries")
+            selected_ids = [int(page.rows.index[i]) for i in grid.selection.rows]
+            st.caption(f"{len(selected_ids)} selected - tick rows in the table to select them")
             
-            if st.button("🗑️ Delete Selected Entry", type="primary"):
-                if delete_emission_entry(entry_to_delete):
-                    st.success(f"Entry {entry_to_delete} deleted successfully!")
+            if st.button("🗑️ Delete Selected Entries", type="primary", disabled=not selected_ids):
+                deleted = delete_emission_entries(selected_ids)
+                if deleted:
+                    st.success(f"{deleted} entries deleted successfully!")
                     st.rerun()
                 else:
-                    st.error(f"Failed to delete entry {entry_to_delete}")
+                    st.error("Failed to delete the selected entries")
         
     
     with tabs[1]:
@@ -2095,9 +2071,9 @@ elif st.session_state.active_page == "Data Entry":
         - `activity`: Description of the activity
         - `quantity`: Amount of activity data
         - `unit`: Unit of measurement (e.g., 'kWh', 'liter', 'kg')
-        - `emission_factor`: CO2 emission factor per unit
         
         **Optional Columns:**
+        - `emission_factor`: CO2 emission factor per unit (looked up from the built-in factor table when missing)
         - `date`: Specific date (YYYY-MM-DD format)
         - `reporting_period`: Period description (e.g., "January 2025")
         - `emissions_kgCO2e`: Pre-calculated emissions (if provided, will override quantity × emission_factor)
@@ -2121,7 +2097,10 @@ elif st.session_state.active_page == "Data Entry":
         if uploaded_file is not None:
             # Preview the uploaded file
             try:
-                preview_df = pd.read_csv(uploaded_file)
+                # Only the first rows are parsed; the import itself streams the file
+                uploaded_file.seek(0)
+                preview_df = pd.read_csv(uploaded_file, nrows=CSV_PREVIEW_ROWS)
+                uploaded_file.seek(0)
                 
                 st.markdown("#### 📋 File Preview")
                 st.dataframe(preview_df, use_container_width=True)
@@ -2129,14 +2108,14 @@ elif st.session_state.active_page == "Data Entry":
                 # Show file info
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Total Rows", len(preview_df))
+                    st.metric("Preview Rows", len(preview_df))
                 with col2:
                     st.metric("Columns", len(preview_df.columns))
             
                 
                 # Show scope breakdown if available
                 if 'scope' in preview_df.columns:
-                    st.markdown("**📊 Scope Breakdown:**")
+                    st.markdown("**📊 Scope Breakdown (preview):**")
                     scope_counts = preview_df['scope'].value_counts()
                     cols = st.columns(len(scope_counts))
                     for i, (scope, count) in enumerate(scope_counts.items()):
@@ -2161,8 +2140,7 @@ elif st.session_state.active_page == "Data Entry":
                 with col2:
                     if st.button("🔍 Validate Only", type="secondary"):
                         # Just validate without uploading
-                        required_columns = ['scope', 'category', 'activity', 'quantity', 'unit', 'emission_factor']
-                        missing_cols = [col for col in required_columns if col not in preview_df.columns]
+                        missing_cols = [col for col in REQUIRED_COLUMNS if col not in preview_df.columns]
                         
                         if missing_cols:
                             st.error(f"❌ Missing required columns: {', '.join(missing_cols)}")
@@ -2178,6 +2156,53 @@ elif st.session_state.active_page == "Data Entry":
                                 st.info("� No date column - will use current date")
         
         
+        # Bulk import of many facility files at once
+        st.markdown("#### 📦 Bulk Import")
+        st.markdown("Upload a zip archive or several CSV/XLSX files (e.g. one per facility per month). Files are validated in parallel and all valid rows are added in one step.")
+        
+        bulk_files = st.file_uploader(
+            "Choose zip archive or files",
+            type=['zip', 'csv', 'xlsx'],
+            accept_multiple_files=True,
+            key="bulk_import_files"
+        )
+        
+        if bulk_files:
+            fail_on_error = st.checkbox("Import nothing if any file fails validation", value=False)
+            if st.button("📦 Run Bulk Import", type="primary"):
+                sources = []
+                for bulk_file in bulk_files:
+                    if bulk_file.name.lower().endswith('.zip'):
+                        sources.extend(read_archive(bulk_file))
+                    else:
+                        sources.append((bulk_file.name, bulk_file.getvalue()))
+                
+                if not sources:
+                    st.error("No CSV or XLSX files found in the upload.")
+                else:
+                    progress_bar = st.progress(0.0, text="Validating files...")
+                    result = bulk_import(
+                        sources,
+                        get_emissions_store(),
+                        fail_on_error=fail_on_error,
+                        progress=lambda done, total: progress_bar.progress(done / total, text=f"Validated {done}/{total} files")
+                    )
+                    st.session_state.emissions_data, st.session_state.emissions_base = current_tenant().dataset.snapshot()
+                    
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Files Imported", result.files_ok)
+                    with col2:
+                        st.metric("Files Failed", result.files_failed)
+                    with col3:
+                        st.metric("Rows Added", result.rows_imported)
+                    
+                    st.dataframe(result.to_frame(), use_container_width=True)
+                    if result.rows_imported > 0:
+                        st.success(f"✅ Added {result.rows_imported} entries from {result.files_ok} files")
+                    elif result.files_failed > 0:
+                        st.error("❌ No data imported - fix the files listed above and try again")
+        
         # Sample CSV templates
         st.markdown("#### 📥 Download Sample CSV Templates")
         
@@ -2357,8 +2382,9 @@ elif st.session_state.active_page == "Data Entry":
         if len(st.session_state.emissions_data) > 0:
             st.markdown("#### ✅ Your Data Readiness:")
             
-            # Use all available data
-            period_data = st.session_state.emissions_data.copy()
+            # Use all available data, answered from the dataset indexes
+            period_data = current_tenant().dataset.get()
+            data_index = current_tenant().dataset.index()
             
             readiness_score = 0
             total_checks = 7
@@ -2374,7 +2400,7 @@ elif st.session_state.active_page == "Data Entry":
             
             # Check 2: Scope coverage
             if len(period_data) > 0:
-                scopes = set(period_data['scope'].unique())
+                scopes = data_index.distinct('scope')
                 if len(scopes) >= 2:
                     checks.append(f"✅ Good scope coverage ({len(scopes)}/3 scopes)")
                     readiness_score += 1
@@ -2385,13 +2411,11 @@ elif st.session_state.active_page == "Data Entry":
             
             # Check 3: Time distribution
             if len(period_data) > 0:
-                # Convert date column to datetime for proper calculation
+                # Earliest and latest date come straight from the sorted date index
                 try:
-                    period_data['date'] = pd.to_datetime(period_data['date'], errors='coerce')
-                    # Filter out any invalid dates
-                    valid_dates = period_data['date'].dropna()
-                    if len(valid_dates) > 0:
-                        date_range = (valid_dates.max() - valid_dates.min()).days
+                    first_date, last_date = data_index.date_range()
+                    if first_date is not None:
+                        date_range = (last_date - first_date).days
                         if date_range >= 30:
                             checks.append("✅ Good time distribution")
                             readiness_score += 1
@@ -2406,7 +2430,7 @@ elif st.session_state.active_page == "Data Entry":
             
             # Check 4: Data quality
             if len(period_data) > 0:
-                high_quality = len(period_data[period_data['data_quality'] == 'High'])
+                high_quality = data_index.count('data_quality', 'High')
                 if high_quality >= len(period_data) * 0.5:
                     checks.append("✅ Good data quality (50%+ high quality)")
                     readiness_score += 1
@@ -2417,7 +2441,7 @@ elif st.session_state.active_page == "Data Entry":
             
             # Check 5: Verification
             if len(period_data) > 0:
-                verified = len(period_data[period_data['verification_status'] != 'Unverified'])
+                verified = len(period_data) - data_index.count('verification_status', 'Unverified')
                 if verified >= len(period_data) * 0.3:
                     checks.append("✅ Some data verification (30%+)")
                     readiness_score += 1
@@ -2428,7 +2452,7 @@ elif st.session_state.active_page == "Data Entry":
             
             # Check 6: Facility coverage
             if len(period_data) > 0:
-                facilities = period_data['facility'].nunique()
+                facilities = len(data_index.distinct('facility'))
                 if facilities >= 2:
                     checks.append("✅ Multiple facilities covered")
                     readiness_score += 1
@@ -2439,7 +2463,7 @@ elif st.session_state.active_page == "Data Entry":
             
             # Check 7: Emission factors
             if len(period_data) > 0:
-                valid_factors = len(period_data[period_data['emission_factor'] > 0])
+                valid_factors = int((period_data['emission_factor'] > 0).sum())
                 if valid_factors == len(period_data):
                     checks.append("✅ All entries have emission factors")
                     readiness_score += 1
@@ -2484,16 +2508,11 @@ elif st.session_state.active_page == "Data Entry":
             
             if st.button("Get Assistance", key="data_entry_assistant_btn"):
                 if data_description:
-                    with st.spinner("AI assistant is analyzing your request..."):
-                        try:
-                            result = st.session_state.ai_agents.run_data_entry_crew(data_description)
-                            # Handle CrewOutput object by converting it to string
-                            result_str = str(result)
-                            st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}. Please check your API key and try again.")
+                    st.session_state.data_entry_assistant_request = st.session_state.ai_agents.run_data_entry_crew(data_description, wait=False)
                 else:
                     st.warning("Please describe your emission activity first.")
+            
+            render_crew_result("data_entry_assistant_request")
         except ImportError:
             st.error("AI agents module not available. Please ensure ai_agents.py is properly configured.")
         except Exception as e:
@@ -2516,16 +2535,17 @@ elif st.session_state.active_page == "Data Entry":
             )
             
             # Data management options
-            col1, col2, col3 = st.columns(3)
+            col1, col4, col2, col3 = st.columns(4)
             
             with col1:
                 if st.button("📥 Download Current Data"):
-                    csv = filtered_data.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="💾 Download as CSV",
-                        data=csv,
-                        file_name=f"emissions_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
+                    st.session_state.csv_export_job = get_report_generator(st.session_state.tenant_id).submit_csv_export()
+            
+            with col4:
+                if st.button("📄 Generate PDF Report"):
+                    st.session_state.pdf_report_job = get_report_generator(st.session_state.tenant_id).submit_pdf_report(
+                        company_info=st.session_state.get('company_info'),
+                        detail_mode="appendix"
                     )
             
             with col2:
@@ -2542,11 +2562,7 @@ elif st.session_state.active_page == "Data Entry":
                     col2a, col2b = st.columns(2)
                     with col2a:
                         if st.button("⚠️ Yes, Clear All", type="secondary"):
-                            st.session_state.emissions_data = pd.DataFrame(columns=[
-                                'date', 'business_unit', 'project', 'scope', 'category', 'activity',
-                                'country', 'facility', 'responsible_person', 'quantity', 'unit', 
-                                'emission_factor', 'emissions_kgCO2e', 'data_quality', 'verification_status', 'notes'
-                            ])
+                            st.session_state.emissions_data = empty_emissions_frame()
                             save_emissions_data()
                             st.session_state.clear_data_confirm = False
                             st.success("All data cleared!")
@@ -2559,6 +2575,9 @@ elif st.session_state.active_page == "Data Entry":
             with col3:
                 if st.button("🔄 Refresh Data"):
                     st.rerun()
+            
+            render_report_job("csv_export_job", "💾 Download as CSV", f"emissions_data_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv")
+            render_report_job("pdf_report_job", "💾 Download PDF Report", f"emissions_report_{datetime.now().strftime('%Y%m%d')}.pdf", "application/pdf")
         else:
             st.info("No data found for the selected period.")
 
@@ -2599,10 +2618,11 @@ elif st.session_state.active_page == "Compliance":
     
     # Import compliance framework
     from carbon_compliance import CarbonComplianceFramework, ComplianceStatus
+    import plotly.graph_objects as go
     
     # Initialize compliance framework
     if 'compliance_framework' not in st.session_state:
-        st.session_state.compliance_framework = CarbonComplianceFramework()
+        st.session_state.compliance_framework = CarbonComplianceFramework(st.session_state.tenant_id)
     
     # Check if we have emissions data
     if len(st.session_state.emissions_data) == 0:
@@ -2610,7 +2630,7 @@ elif st.session_state.active_page == "Compliance":
         st.info("The compliance assessment requires emissions data to evaluate your carbon performance against industry benchmarks.")
     else:
         # Create tabs for compliance features
-        compliance_tabs = st.tabs(["Assessment", "Industry Benchmarks", "Compliance Report"])
+        compliance_tabs = st.tabs(["Assessment", "Industry Benchmarks", "Sensitivity", "Compliance Report"])
         
         with compliance_tabs[0]:
             st.markdown("<h3>Carbon Compliance Assessment</h3>", unsafe_allow_html=True)
@@ -2985,7 +3005,7 @@ elif st.session_state.active_page == "Compliance":
                             
                             # Create a breakdown of emissions by scope
                             emissions_data = st.session_state.emissions_data
-                            scope_breakdown = emissions_data.groupby('scope')['emissions_kgCO2e'].sum() / 1000
+                            scope_breakdown = emissions_data.groupby('scope', observed=True)['emissions_kgCO2e'].sum() / 1000
                             
                             # Create pie chart
                             fig_pie = go.Figure(data=[go.Pie(
@@ -3095,6 +3115,72 @@ elif st.session_state.active_page == "Compliance":
                 st.plotly_chart(fig, use_container_width=True)
         
         with compliance_tabs[2]:
+            st.markdown("<h3>Sensitivity Analysis</h3>", unsafe_allow_html=True)
+            st.markdown("See how your compliance outcome changes with emission reductions and company size.")
+            
+            if 'compliance_result' in st.session_state and 'company_info' in st.session_state:
+                result = st.session_state.compliance_result
+                company_info = st.session_state.company_info
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    metric_label = st.selectbox(
+                        "Metric",
+                        ["Net Financial Impact (₹)", "Compliance Score"],
+                        key="sensitivity_metric"
+                    )
+                with col2:
+                    axis_label = st.selectbox(
+                        "Compare reductions against",
+                        ["Employees", "Assessment Period (Months)", "Industry"],
+                        key="sensitivity_axis"
+                    )
+                
+                employees = company_info.get('employees', 10)
+                period_months = result.actual_period_months
+                grid = st.session_state.compliance_framework.simulate_scenario_grid(
+                    result.emissions_actual,
+                    reduction_percentages=range(0, 55, 5),
+                    employees=sorted({employees} | {max(1, round(employees * f)) for f in (0.25, 0.5, 0.75, 1.25, 1.5, 2, 3)}),
+                    revenue_million_inr=[company_info.get('revenue_million_inr', 0)],
+                    assessment_period_months=sorted({period_months, 3, 6, 12, 18, 24, 36}),
+                    industries=list(st.session_state.compliance_framework.industry_benchmarks)
+                )
+                
+                column_axis = {
+                    "Employees": "employees",
+                    "Assessment Period (Months)": "assessment_period_months",
+                    "Industry": "industry"
+                }[axis_label]
+                metric = "net_financial_impact" if metric_label.startswith("Net") else "score"
+                surface = grid.surface(
+                    metric,
+                    "reduction_percentage",
+                    column_axis,
+                    employees=employees,
+                    assessment_period_months=period_months,
+                    industry=company_info.get('industry', 'services')
+                )
+                
+                fig = go.Figure(data=go.Heatmap(
+                    z=surface.values,
+                    x=[str(value).title() if column_axis == "industry" else value for value in surface.columns],
+                    y=surface.index,
+                    colorscale="RdYlGn",
+                    zmid=0 if metric == "net_financial_impact" else None,
+                    colorbar=dict(title=metric_label)
+                ))
+                fig.update_layout(
+                    title=f"{metric_label} by Emission Reduction and {axis_label}",
+                    xaxis_title=axis_label,
+                    yaxis_title="Emission Reduction (%)",
+                    xaxis_type="category"
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("Please run a compliance assessment first to explore scenarios.")
+        
+        with compliance_tabs[3]:
             st.markdown("<h3>Compliance Report</h3>", unsafe_allow_html=True)
             st.markdown("Generate and download detailed compliance reports.")
             
@@ -3139,16 +3225,11 @@ elif st.session_state.active_page == "AI Data Insights":
             st.warning("No emissions data available. Please add data first.")
         else:
             if st.button("Generate Summary", key="report_summary_btn"):
-                with st.spinner("Generating report summary..."):
-                    try:
-                        # Convert DataFrame to string representation for the AI
-                        emissions_str = st.session_state.emissions_data.to_string()
-                        result = st.session_state.ai_agents.run_report_summary_crew(emissions_str)
-                        # Handle CrewOutput object by converting it to string
-                        result_str = str(result)
-                        st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}. Please check your API key and try again.")
+                # Bounded, deterministic digest instead of the raw rows
+                emissions_str = build_emissions_digest(st.session_state.emissions_data)
+                st.session_state.report_summary_request = st.session_state.ai_agents.run_report_summary_crew(emissions_str, wait=False)
+            
+            render_crew_result("report_summary_request")
     
     with ai_tabs[1]:
         st.markdown("<h3>Carbon Offset Advisor</h3>", unsafe_allow_html=True)
@@ -3167,16 +3248,11 @@ elif st.session_state.active_page == "AI Data Insights":
             
             if st.button("Get Offset Recommendations", key="offset_advisor_btn"):
                 if location:
-                    with st.spinner("Finding offset options..."):
-                        try:
-                            result = st.session_state.ai_agents.run_offset_advice_crew(total_emissions, location, industry)
-                            # Handle CrewOutput object by converting it to string
-                            result_str = str(result)
-                            st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}. Please check your API key and try again.")
+                    st.session_state.offset_advice_request = st.session_state.ai_agents.run_offset_advice_crew(total_emissions, location, industry, wait=False)
                 else:
                     st.warning("Please enter your location.")
+            
+            render_crew_result("offset_advice_request")
     
     with ai_tabs[2]:
         st.markdown("<h3>Regulation Radar</h3>", unsafe_allow_html=True)
@@ -3191,16 +3267,11 @@ elif st.session_state.active_page == "AI Data Insights":
         
         if st.button("Check Regulations", key="regulation_radar_btn"):
             if location and len(export_markets) > 0:
-                with st.spinner("Analyzing regulatory requirements..."):
-                    try:
-                        result = st.session_state.ai_agents.run_regulation_check_crew(location, industry, ", ".join(export_markets))
-                        # Handle CrewOutput object by converting it to string
-                        result_str = str(result)
-                        st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}. Please check your API key and try again.")
+                st.session_state.regulation_check_request = st.session_state.ai_agents.run_regulation_check_crew(location, industry, ", ".join(export_markets), wait=False)
             else:
                 st.warning("Please enter your location and select at least one export market.")
+        
+        render_crew_result("regulation_check_request")
     
     with ai_tabs[3]:
         st.markdown("<h3>Emission Optimizer</h3>", unsafe_allow_html=True)
@@ -3210,15 +3281,12 @@ elif st.session_state.active_page == "AI Data Insights":
             st.warning("No emissions data available. Please add data first.")
         else:
             if st.button("Generate Optimization Recommendations", key="emission_optimizer_btn"):
-                with st.spinner("Analyzing your emissions data..."):
-                    try:
-                        # Convert DataFrame to string representation for the AI
-                        emissions_str = st.session_state.emissions_data.to_string()
-                        result = st.session_state.ai_agents.run_optimization_crew(emissions_str)
-                        # Handle CrewOutput object by converting it to string
-                        result_str = str(result)
-                        st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}. Please check your API key and try again.")
+                # Bounded, deterministic digest instead of the raw rows
+                emissions_str = build_emissions_digest(st.session_state.emissions_data)
+                st.session_state.optimization_request = st.session_state.ai_agents.run_optimization_crew(emissions_str, wait=False)
+            
+            render_crew_result("optimization_request")
     
 # About page removed - focusing on AI features only
+
+startup_timing.finish(st.session_state.active_page)
@@ -0,0 +1,273 @@
+"""
+Bulk import for YourCarbonFootprint application.
+Imports a directory or zip archive of CSV/XLSX exports (for example one file per
+facility per month) in one go: files are parsed and validated in parallel on a
+process pool, every file gets a validation report, and all valid rows are merged
+into the store in a single transaction.
+
+Usage:
+    python bulk_import.py <directory-or-zip> [--tenant ID] [--workers N] [--fail-on-error]
+"""
+
+import argparse
+import io
+import os
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+
+from csv_ingest import REQUIRED_COLUMNS, CSVIngestError, prepare_chunk
+from emissions_schema import concat_emissions_frames
+
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx")
+
+
+@dataclass
+class FileReport:
+    """Validation report for one imported file."""
+    file: str
+    status: str = "ok"
+    rows: int = 0
+    total_emissions_kgCO2e: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BulkImportResult:
+    """Outcome of a bulk import."""
+    reports: List[FileReport] = field(default_factory=list)
+    rows_imported: int = 0
+    version: Optional[int] = None
+
+    @property
+    def files_ok(self):
+        return sum(1 for report in self.reports if report.status == "ok")
+
+    @property
+    def files_failed(self):
+        return sum(1 for report in self.reports if report.status == "error")
+
+    def to_frame(self):
+        """
+        Flatten the per-file reports for display or export.
+
+        Returns:
+            pandas.DataFrame: One row per file
+        """
+        records = []
+        for report in self.reports:
+            record = asdict(report)
+            record["errors"] = "; ".join(report.errors)
+            record["warnings"] = "; ".join(report.warnings)
+            records.append(record)
+        return pd.DataFrame(records, columns=["file", "status", "rows", "total_emissions_kgCO2e", "errors", "warnings"])
+
+
+def collect_sources(path):
+    """
+    List the importable files of a directory or zip archive.
+
+    Args:
+        path (str): Directory, .zip archive or single CSV/XLSX file
+
+    Returns:
+        list: (name, source) pairs sorted by name, where source is a file
+        path or the raw bytes of an archive member
+    """
+    if os.path.isdir(path):
+        sources = []
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    full_path = os.path.join(dirpath, filename)
+                    sources.append((os.path.relpath(full_path, path), full_path))
+        return sorted(sources)
+    if zipfile.is_zipfile(path):
+        return read_archive(path)
+    if path.lower().endswith(SUPPORTED_EXTENSIONS):
+        return [(os.path.basename(path), path)]
+    raise ValueError(f"Not a directory, zip archive or CSV/XLSX file: {path}")
+
+
+def read_archive(archive):
+    """
+    Read the CSV/XLSX members of a zip archive.
+
+    Args:
+        archive: Path or binary file-like object of a zip archive
+
+    Returns:
+        list: (member name, bytes) pairs sorted by name
+    """
+    sources = []
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            name = info.filename
+            if info.is_dir() or os.path.basename(name).startswith(("._", "~$")):
+                continue
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                sources.append((name, zf.read(info)))
+    return sorted(sources)
+
+
+def parse_file(name, source, required_columns=REQUIRED_COLUMNS, default_date=None):
+    """
+    Parse and validate one file. Runs in a worker process.
+
+    Args:
+        name (str): Display name of the file
+        source: File path or raw bytes
+        required_columns (list): Columns the file must contain
+        default_date (pandas.Timestamp, optional): Date for files without dates
+
+    Returns:
+        tuple: (FileReport, typed DataFrame or None if the file is invalid)
+    """
+    report = FileReport(file=name)
+    handle = io.BytesIO(source) if isinstance(source, bytes) else source
+    try:
+        if name.lower().endswith(".xlsx"):
+            df = pd.read_excel(handle)
+        else:
+            df = pd.read_csv(handle)
+    except Exception as e:
+        report.status = "error"
+        report.errors.append(f"Could not read file: {str(e)}")
+        return report, None
+
+    if df.empty:
+        report.status = "error"
+        report.errors.append("File contains no data")
+        return report, None
+
+    missing = [col for col in required_columns if col not in df.columns]
+    if missing:
+        report.status = "error"
+        report.errors.append(f"Missing required columns: {', '.join(missing)}")
+        return report, None
+
+    for column in ["quantity", "emission_factor"]:
+        if column not in df.columns:
+            continue
+        bad_rows = df.index[pd.to_numeric(df[column], errors="coerce").isna() & df[column].notna()]
+        if len(bad_rows) > 0:
+            report.errors.append(
+                f"Non-numeric {column} in {len(bad_rows)} rows (first at row {int(bad_rows[0]) + 2})"
+            )
+    if report.errors:
+        report.status = "error"
+        return report, None
+
+    has_dates = "date" in df.columns
+    has_reporting_period = "reporting_period" in df.columns
+    if "emissions_kgCO2e" not in df.columns:
+        report.warnings.append("Emissions calculated from quantity x emission factor")
+    if not has_dates:
+        report.warnings.append("No date column - current date assigned")
+
+    try:
+        typed, invalid_dates = prepare_chunk(df, has_dates, has_reporting_period, default_date)
+    except CSVIngestError as e:
+        report.status = "error"
+        report.errors.append(str(e))
+        return report, None
+
+    if invalid_dates > 0:
+        report.warnings.append(f"{invalid_dates} invalid dates")
+    missing_quantities = int(typed["quantity"].isna().sum())
+    if missing_quantities > 0:
+        report.warnings.append(f"{missing_quantities} rows without quantity")
+    unresolved_factors = int(typed["emission_factor"].isna().sum())
+    if unresolved_factors > 0:
+        report.warnings.append(f"{unresolved_factors} rows without a known emission factor")
+
+    report.rows = len(typed)
+    report.total_emissions_kgCO2e = float(typed["emissions_kgCO2e"].sum())
+    return report, typed
+
+
+def _parse_task(task):
+    return parse_file(*task)
+
+
+def bulk_import(sources, store, workers=None, required_columns=REQUIRED_COLUMNS, fail_on_error=False, progress=None):
+    """
+    Parse files in parallel and merge the valid ones into the store.
+
+    All valid rows are appended in one store write, so either every valid
+    file is imported or (on failure) none is.
+
+    Args:
+        sources: Directory or archive path, or a list of (name, source) pairs
+        store (EmissionsStore): Store to append to
+        workers (int, optional): Worker processes, defaults to the CPU count;
+            1 parses in the calling process
+        required_columns (list): Columns every file must contain
+        fail_on_error (bool): Import nothing if any file fails validation
+        progress (callable, optional): Called as progress(done, total) as
+            files finish parsing
+
+    Returns:
+        BulkImportResult: Per-file reports and the number of rows imported
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = collect_sources(os.fspath(sources))
+    default_date = pd.Timestamp(datetime.now().date())
+    tasks = [(name, source, required_columns, default_date) for name, source in sources]
+
+    result = BulkImportResult()
+    frames = []
+    if workers == 1 or len(tasks) <= 1:
+        outcomes = map(_parse_task, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        outcomes = executor.map(_parse_task, tasks)
+    try:
+        for done, (report, frame) in enumerate(outcomes, start=1):
+            result.reports.append(report)
+            if frame is not None:
+                frames.append(frame)
+            if progress is not None:
+                progress(done, len(tasks))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if fail_on_error and result.files_failed > 0:
+        return result
+    if frames:
+        merged = concat_emissions_frames(frames)
+        result.version = store.append(merged)
+        result.rows_imported = len(merged)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import emissions CSV/XLSX files into the store")
+    parser.add_argument("path", help="Directory, zip archive or single CSV/XLSX file")
+    parser.add_argument("--tenant", help="Tenant to import into (default: the default tenant)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--fail-on-error", action="store_true", help="Import nothing if any file is invalid")
+    parser.add_argument("--report", help="Write the per-file report to this CSV file")
+    args = parser.parse_args(argv)
+
+    from tenants import get_tenant
+
+    result = bulk_import(args.path, get_tenant(args.tenant).store, workers=args.workers, fail_on_error=args.fail_on_error)
+    report = result.to_frame()
+    print(report.to_string(index=False))
+    print(f"\nImported {result.rows_imported} rows from {result.files_ok} files ({result.files_failed} failed)")
+    if args.report:
+        report.to_csv(args.report, index=False)
+    return 1 if result.files_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,8 @@ from typing import Dict, List, Tuple, Optional
 from enum import Enum
 import json
 
+from emissions_schema import coerce_emissions_frame, is_typed
+
 class ComplianceStatus(Enum):
     EXCELLENT = "excellent"
     GOOD = "good"
@@ -18,6 +20,15 @@ class ComplianceStatus(Enum):
     POOR = "poor"
     CRITICAL = "critical"
 
+# Statuses from best to worst; vectorized scoring returns indexes into this list
+STATUS_ORDER = [
+    ComplianceStatus.EXCELLENT,
+    ComplianceStatus.GOOD,
+    ComplianceStatus.NEEDS_IMPROVEMENT,
+    ComplianceStatus.POOR,
+    ComplianceStatus.CRITICAL
+]
+
 @dataclass
 class IndustryBenchmark:
     """Industry-specific emission benchmarks per employee or revenue"""
@@ -48,7 +59,14 @@ class CarbonComplianceFramework:
     based on emission performance against industry benchmarks and targets
     """
     
-    def __init__(self):
+    def __init__(self, tenant_id: Optional[str] = None):
+        """
+        Args:
+            tenant_id: Tenant whose stored data and company information are
+                assessed when assess_compliance is not given them (default tenant
+                if omitted)
+        """
+        self.tenant_id = tenant_id
         self.industry_benchmarks = self._load_industry_benchmarks()
         self.compliance_rules = self._load_compliance_rules()
         
@@ -108,33 +126,46 @@ class CarbonComplianceFramework:
         return benchmarks
     
     def _load_compliance_rules(self) -> Dict:
-        """Load compliance rules for fines and credits"""
+        """
+        Load compliance rules for fines and credits
+        
+        Each status applies to performance ratios (actual / benchmark) up to
+        and including ratio_range[1]; critical applies to everything above
+        poor. The score falls linearly across each ratio range, from the top
+        of score_range at ratio_range[0] to its bottom at ratio_range[1]
+        (critical reaches 0 at a ratio of 1.5).
+        """
         return {
             "excellent": {  # 20%+ better than benchmark
+                "ratio_range": (0.0, 0.8),
                 "score_range": (90, 100),
                 "credit_rate": 4200,  # INR per tonne CO2e saved
                 "fine_rate": 0,
                 "description": "Outstanding performance - eligible for carbon credits"
             },
             "good": {  # 10-20% better than benchmark
+                "ratio_range": (0.8, 0.9),
                 "score_range": (75, 89),
                 "credit_rate": 2100,  # INR per tonne CO2e saved
                 "fine_rate": 0,
                 "description": "Good performance - eligible for reduced carbon credits"
             },
             "needs_improvement": {  # Within 10% of benchmark
+                "ratio_range": (0.9, 1.1),
                 "score_range": (60, 74),
                 "credit_rate": 0,
                 "fine_rate": 0,
                 "description": "Meets minimum standards - no penalty or credit"
             },
             "poor": {  # 10-25% worse than benchmark
+                "ratio_range": (1.1, 1.25),
                 "score_range": (40, 59),
                 "credit_rate": 0,
                 "fine_rate": 1260,  # INR per tonne CO2e over benchmark
                 "description": "Below standards - subject to carbon tax"
             },
             "critical": {  # 25%+ worse than benchmark
+                "ratio_range": (1.25, 1.5),
                 "score_range": (0, 39),
                 "credit_rate": 0,
                 "fine_rate": 2520,  # INR per tonne CO2e over benchmark
@@ -144,31 +175,41 @@ class CarbonComplianceFramework:
     
     def assess_compliance(
         self,
-        emissions_data: pd.DataFrame,
-        company_info: Dict,
+        emissions_data: Optional[pd.DataFrame] = None,
+        company_info: Optional[Dict] = None,
         assessment_period_months: int = 12
     ) -> ComplianceResult:
         """
         Assess carbon compliance and determine fines or credits
         
         Args:
-            emissions_data: DataFrame with emission records
-            company_info: Dict with company details (industry, employees, revenue, country)
+            emissions_data: DataFrame with emission records (defaults to the
+                tenant's stored records)
+            company_info: Dict with company details (industry, employees, revenue,
+                country; defaults to the tenant's saved company information)
             assessment_period_months: Period for assessment (default 12 months)
         
         Returns:
             ComplianceResult with assessment details
         """
         
+        if emissions_data is None or company_info is None:
+            from tenants import get_tenant
+            tenant = get_tenant(self.tenant_id)
+            if emissions_data is None:
+                emissions_data = tenant.dataset.get()
+            if company_info is None:
+                company_info = tenant.load_company_info() or {}
+        
         # Calculate total emissions for assessment period
         # Use the user-specified assessment period to understand the data context
         
-        # Convert dates to datetime for validation
-        emissions_data_copy = emissions_data.copy()
-        emissions_data_copy['date'] = pd.to_datetime(emissions_data_copy['date'], errors='coerce')
+        # Coerce to the canonical schema once (no-op for frames from the store)
+        if not is_typed(emissions_data):
+            emissions_data = coerce_emissions_frame(emissions_data)
         
         # Remove rows with invalid dates
-        valid_emissions = emissions_data_copy.dropna(subset=['date'])
+        valid_emissions = emissions_data.dropna(subset=['date'])
         
         # Use all available data and treat it as representing the specified assessment period
         total_emissions_kg = emissions_data['emissions_kgCO2e'].sum()
@@ -220,36 +261,15 @@ class CarbonComplianceFramework:
         # Calculate performance ratio (lower is better)
         performance_ratio = total_emissions_tonnes / benchmark_emissions_tonnes
         
-        # Calculate compliance score (0-100)
-        if performance_ratio <= 0.8:  # 20% better than benchmark
-            score = 90 + (10 * (0.8 - performance_ratio) / 0.8)
-            status = ComplianceStatus.EXCELLENT
-        elif performance_ratio <= 0.9:  # 10-20% better
-            score = 75 + (15 * (0.9 - performance_ratio) / 0.1)
-            status = ComplianceStatus.GOOD
-        elif performance_ratio <= 1.1:  # Within 10% of benchmark
-            score = 60 + (15 * (1.1 - performance_ratio) / 0.2)
-            status = ComplianceStatus.NEEDS_IMPROVEMENT
-        elif performance_ratio <= 1.25:  # 10-25% worse
-            score = 40 + (20 * (1.25 - performance_ratio) / 0.15)
-            status = ComplianceStatus.POOR
-        else:  # 25%+ worse
-            score = max(0, 40 * (1.5 - performance_ratio) / 0.25)
-            status = ComplianceStatus.CRITICAL
-        
-        score = max(0, min(100, score))  # Ensure score is between 0-100
-        
-        # Calculate fines and credits
-        emissions_difference_tonnes = total_emissions_tonnes - benchmark_emissions_tonnes
-        
-        rules = self.compliance_rules[status.value]
-        
-        if emissions_difference_tonnes < 0:  # Better than benchmark
-            credit_amount = abs(emissions_difference_tonnes) * rules['credit_rate']
-            fine_amount = 0
-        else:  # Worse than benchmark
-            credit_amount = 0
-            fine_amount = emissions_difference_tonnes * rules['fine_rate']
+        # Calculate compliance score (0-100), status and fines/credits
+        scores, status_codes, fines, credits = self._score_performance(
+            np.array([total_emissions_tonnes], dtype=float),
+            np.array([benchmark_emissions_tonnes], dtype=float)
+        )
+        score = float(scores[0])
+        status = STATUS_ORDER[status_codes[0]]
+        fine_amount = float(fines[0])
+        credit_amount = float(credits[0])
         
         # Generate recommendations
         recommendations = self._generate_recommendations(
@@ -258,10 +278,7 @@ class CarbonComplianceFramework:
         
         # Set next review date based on assessment period and data
         if len(emissions_data) > 0:
-            # Convert date column to datetime
-            emissions_data_copy = emissions_data.copy()
-            emissions_data_copy['date'] = pd.to_datetime(emissions_data_copy['date'], errors='coerce')
-            valid_dates = emissions_data_copy['date'].dropna()
+            valid_dates = valid_emissions['date']
             
             if len(valid_dates) > 0:
                 # Calculate next review based on latest data date + assessment period
@@ -288,6 +305,134 @@ class CarbonComplianceFramework:
             actual_period_months=assessment_period_months
         )
     
+    def _score_performance(
+        self,
+        actual_tonnes: np.ndarray,
+        benchmark_tonnes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score emissions against benchmarks element-wise
+        
+        Args:
+            actual_tonnes: Actual emissions in tonnes CO2e
+            benchmark_tonnes: Benchmark emissions in tonnes CO2e (same shape)
+        
+        Returns:
+            Tuple of (score, status code, fine, credit) arrays, where status
+            code indexes STATUS_ORDER
+        """
+        ratio = actual_tonnes / benchmark_tonnes
+        rules = [self.compliance_rules[s.value] for s in STATUS_ORDER]
+        
+        # Status: first range whose upper bound is >= ratio (critical beyond poor)
+        upper_bounds = np.array([rule['ratio_range'][1] for rule in rules[:-1]])
+        status_codes = np.searchsorted(upper_bounds, ratio, side='left')
+        
+        # Score: piecewise linear through (ratio_range[1], score_range[0]) of
+        # each status, starting at 100 for zero emissions and floored at 0
+        ratio_points = [0.0] + [rule['ratio_range'][1] for rule in rules]
+        score_points = [100.0] + [float(rule['score_range'][0]) for rule in rules]
+        score = np.interp(ratio, ratio_points, score_points)
+        
+        credit_rates = np.array([rule['credit_rate'] for rule in rules], dtype=float)
+        fine_rates = np.array([rule['fine_rate'] for rule in rules], dtype=float)
+        difference = actual_tonnes - benchmark_tonnes
+        credit = np.where(difference < 0, -difference * credit_rates[status_codes], 0.0)
+        fine = np.where(difference < 0, 0.0, difference * fine_rates[status_codes])
+        
+        return score, status_codes, fine, credit
+    
+    def _benchmark_tonnes(
+        self,
+        industries: pd.Series,
+        employees: np.ndarray,
+        revenue_million_inr: np.ndarray,
+        assessment_period_months: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized benchmark emissions in tonnes, matching assess_compliance"""
+        keys = industries.astype(str).str.lower()
+        keys = keys.where(keys.isin(list(self.industry_benchmarks)), 'services')
+        per_employee = keys.map({k: b.emissions_per_employee_kg for k, b in self.industry_benchmarks.items()}).to_numpy(dtype=float)
+        per_revenue = keys.map({k: b.emissions_per_revenue_kg for k, b in self.industry_benchmarks.items()}).to_numpy(dtype=float)
+        
+        # Employees first, then revenue, else a 10-employee default
+        benchmark_kg = np.where(
+            employees > 0,
+            per_employee * employees,
+            np.where(revenue_million_inr > 0, per_revenue * revenue_million_inr, per_employee * 10)
+        )
+        return benchmark_kg * (assessment_period_months / 12) / 1000
+    
+    def assess_compliance_batch(
+        self,
+        emissions: pd.DataFrame,
+        entity_column: str = 'entity',
+        period_column: str = 'period',
+        default_industry: str = 'services',
+        default_period_months: int = 12
+    ) -> pd.DataFrame:
+        """
+        Assess compliance for many (entity, period) pairs in one vectorized pass
+        
+        Args:
+            emissions: Long-format table with entity and period columns,
+                emissions_kgCO2e and company attributes (industry, employees,
+                revenue_million_inr, assessment_period_months). Several rows per
+                (entity, period) are summed; attributes are taken from the first.
+            entity_column: Column identifying the company or client entity
+            period_column: Column identifying the assessment period
+            default_industry: Industry used where the column is missing or empty
+            default_period_months: Period length used where not given
+        
+        Returns:
+            DataFrame with one row per (entity, period): industry, emissions_actual
+            and emissions_benchmark (tonnes), performance_ratio, score, status,
+            fine_amount and credit_amount
+        """
+        keys = [entity_column, period_column]
+        missing = [col for col in keys + ['emissions_kgCO2e'] if col not in emissions.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        
+        data = pd.DataFrame({col: emissions[col] for col in keys})
+        data['emissions_kgCO2e'] = pd.to_numeric(emissions['emissions_kgCO2e'], errors='coerce').fillna(0)
+        attributes = {
+            'industry': default_industry,
+            'employees': 0,
+            'revenue_million_inr': 0,
+            'assessment_period_months': default_period_months
+        }
+        for col, default in attributes.items():
+            data[col] = emissions[col] if col in emissions.columns else default
+        
+        grouped = data.groupby(keys, sort=False, observed=True)
+        results = grouped[list(attributes)].first()
+        results['emissions_kgCO2e'] = grouped['emissions_kgCO2e'].sum()
+        results = results.reset_index()
+        
+        industries = results['industry'].fillna(default_industry)
+        employees = pd.to_numeric(results['employees'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        revenue = pd.to_numeric(results['revenue_million_inr'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        months = pd.to_numeric(results['assessment_period_months'], errors='coerce').fillna(default_period_months).to_numpy(dtype=float)
+        
+        actual = results['emissions_kgCO2e'].to_numpy(dtype=float) / 1000
+        benchmark = self._benchmark_tonnes(industries, employees, revenue, months)
+        score, status_codes, fine, credit = self._score_performance(actual, benchmark)
+        
+        status_values = np.array([s.value for s in STATUS_ORDER], dtype=object)
+        return pd.DataFrame({
+            entity_column: results[entity_column],
+            period_column: results[period_column],
+            'industry': industries.to_numpy(),
+            'emissions_actual': actual,
+            'emissions_benchmark': benchmark,
+            'performance_ratio': actual / benchmark,
+            'score': score,
+            'status': pd.Categorical(status_values[status_codes], categories=list(status_values)),
+            'fine_amount': fine,
+            'credit_amount': credit
+        })
+    
     def _generate_recommendations(
         self,
         status: ComplianceStatus,
@@ -301,8 +446,8 @@ class CarbonComplianceFramework:
         
         # Analyze emission sources
         if len(emissions_data) > 0:
-            scope_emissions = emissions_data.groupby('scope')['emissions_kgCO2e'].sum()
-            category_emissions = emissions_data.groupby('category')['emissions_kgCO2e'].sum().sort_values(ascending=False)
+            scope_emissions = emissions_data.groupby('scope', observed=True)['emissions_kgCO2e'].sum()
+            category_emissions = emissions_data.groupby('category', observed=True)['emissions_kgCO2e'].sum().sort_values(ascending=False)
             
             top_categories = category_emissions.head(3).index.tolist()
             
@@ -384,6 +529,78 @@ class CarbonComplianceFramework:
         industry_key = industry.lower()
         return self.industry_benchmarks.get(industry_key)
     
+    def simulate_scenario_grid(
+        self,
+        emissions_tonnes: float,
+        reduction_percentages,
+        employees,
+        revenue_million_inr=(0.0,),
+        assessment_period_months=(12,),
+        industries=('services',)
+    ) -> 'ScenarioGrid':
+        """
+        Evaluate compliance over a dense grid of what-if scenarios
+        
+        Every combination of the axes is scored in one NumPy broadcast using
+        the thresholds and rates of _load_compliance_rules. As in
+        assess_compliance, emissions_tonnes is taken to cover the assessment
+        period and the benchmark uses employees when > 0, else revenue.
+        
+        Args:
+            emissions_tonnes: Current emissions in tonnes CO2e
+            reduction_percentages: Emission reductions to test (%)
+            employees: Employee counts to test
+            revenue_million_inr: Annual revenues to test (million INR)
+            assessment_period_months: Assessment periods to test (months)
+            industries: Industry keys to test
+        
+        Returns:
+            ScenarioGrid with arrays shaped
+            (reduction, employees, revenue, period, industry)
+        """
+        axes = {
+            'reduction_percentage': np.asarray(reduction_percentages, dtype=float),
+            'employees': np.asarray(employees, dtype=float),
+            'revenue_million_inr': np.asarray(revenue_million_inr, dtype=float),
+            'assessment_period_months': np.asarray(assessment_period_months, dtype=float),
+            'industry': np.asarray([industry.lower() for industry in industries], dtype=object)
+        }
+        reduction, staff, revenue, months = np.ix_(
+            axes['reduction_percentage'], axes['employees'],
+            axes['revenue_million_inr'], axes['assessment_period_months']
+        )
+        per_employee = np.array([self._industry_benchmark(i).emissions_per_employee_kg for i in axes['industry']], dtype=float)
+        per_revenue = np.array([self._industry_benchmark(i).emissions_per_revenue_kg for i in axes['industry']], dtype=float)
+        
+        # Append the industry axis last: shapes (1, E, V, P, I)
+        staff, revenue, months = staff[..., None], revenue[..., None], months[..., None]
+        benchmark_kg = np.where(
+            staff > 0,
+            per_employee * staff,
+            np.where(revenue > 0, per_revenue * revenue, per_employee * 10)
+        )
+        benchmark = benchmark_kg * (months / 12) / 1000
+        actual = emissions_tonnes * (1 - reduction[..., None] / 100)
+        
+        shape = np.broadcast_shapes(actual.shape, benchmark.shape)
+        actual = np.broadcast_to(actual, shape)
+        benchmark = np.broadcast_to(benchmark, shape)
+        score, status_codes, fine, credit = self._score_performance(actual, benchmark)
+        
+        return ScenarioGrid(
+            axes=axes,
+            emissions_tonnes=actual,
+            benchmark_tonnes=benchmark,
+            score=score,
+            status_codes=status_codes,
+            fine_amount=fine,
+            credit_amount=credit
+        )
+    
+    def _industry_benchmark(self, industry: str) -> IndustryBenchmark:
+        """Benchmark for an industry key, falling back to services"""
+        return self.industry_benchmarks.get(industry.lower(), self.industry_benchmarks['services'])
+    
     def simulate_improvement_scenarios(
         self,
         current_result: ComplianceResult,
@@ -391,44 +608,90 @@ class CarbonComplianceFramework:
     ) -> List[Dict]:
         """Simulate different emission reduction scenarios"""
         
+        reductions = np.asarray(reduction_percentages, dtype=float)
+        new_emissions = current_result.emissions_actual * (1 - reductions / 100)
+        benchmark = np.full_like(new_emissions, current_result.emissions_benchmark)
+        _, status_codes, new_fines, new_credits = self._score_performance(new_emissions, benchmark)
+        
         scenarios = []
-        for reduction_pct in reduction_percentages:
-            new_emissions = current_result.emissions_actual * (1 - reduction_pct / 100)
-            new_ratio = new_emissions / current_result.emissions_benchmark
-            
-            # Calculate new status and financial impact
-            if new_ratio <= 0.8:
-                new_status = ComplianceStatus.EXCELLENT
-                new_credit = abs(new_emissions - current_result.emissions_benchmark) * 4200
-                new_fine = 0
-            elif new_ratio <= 0.9:
-                new_status = ComplianceStatus.GOOD
-                new_credit = abs(new_emissions - current_result.emissions_benchmark) * 2100
-                new_fine = 0
-            elif new_ratio <= 1.1:
-                new_status = ComplianceStatus.NEEDS_IMPROVEMENT
-                new_credit = 0
-                new_fine = 0
-            elif new_ratio <= 1.25:
-                new_status = ComplianceStatus.POOR
-                new_credit = 0
-                new_fine = (new_emissions - current_result.emissions_benchmark) * 1260
-            else:
-                new_status = ComplianceStatus.CRITICAL
-                new_credit = 0
-                new_fine = (new_emissions - current_result.emissions_benchmark) * 2520
-            
+        for i, reduction_pct in enumerate(reduction_percentages):
             scenarios.append({
                 'reduction_percentage': reduction_pct,
-                'new_emissions_tonnes': new_emissions,
-                'new_status': new_status.value,
-                'new_credit_amount': new_credit,
-                'new_fine_amount': new_fine,
-                'financial_improvement': (current_result.fine_amount - new_fine) + (new_credit - current_result.credit_amount)
+                'new_emissions_tonnes': float(new_emissions[i]),
+                'new_status': STATUS_ORDER[status_codes[i]].value,
+                'new_credit_amount': float(new_credits[i]),
+                'new_fine_amount': float(new_fines[i]),
+                'financial_improvement': (current_result.fine_amount - new_fines[i]) + (new_credits[i] - current_result.credit_amount)
             })
         
         return scenarios
 
+
+@dataclass
+class ScenarioGrid:
+    """Compliance outcomes over a grid of scenarios"""
+    axes: Dict[str, np.ndarray]  # Axis name -> values, in array dimension order
+    emissions_tonnes: np.ndarray
+    benchmark_tonnes: np.ndarray
+    score: np.ndarray
+    status_codes: np.ndarray     # Indexes into STATUS_ORDER
+    fine_amount: np.ndarray
+    credit_amount: np.ndarray
+    
+    @property
+    def net_financial_impact(self) -> np.ndarray:
+        """Credits minus fines (INR)"""
+        return self.credit_amount - self.fine_amount
+    
+    @property
+    def status(self) -> np.ndarray:
+        """Status values for every scenario"""
+        return np.array([s.value for s in STATUS_ORDER], dtype=object)[self.status_codes]
+    
+    def surface(self, metric: str, row_axis: str, column_axis: str, **fixed) -> pd.DataFrame:
+        """
+        Two-dimensional slice of the grid, e.g. for a heatmap
+        
+        Args:
+            metric: 'score', 'fine_amount', 'credit_amount', 'net_financial_impact',
+                'emissions_tonnes' or 'benchmark_tonnes'
+            row_axis: Axis shown as rows
+            column_axis: Axis shown as columns
+            **fixed: Values for the remaining axes (default: their first value)
+        
+        Returns:
+            DataFrame indexed by row_axis values with column_axis columns
+        """
+        values = getattr(self, metric)
+        names = list(self.axes)
+        index = []
+        for name in names:
+            if name in (row_axis, column_axis):
+                index.append(slice(None))
+            else:
+                positions = np.flatnonzero(self.axes[name] == fixed[name]) if name in fixed else [0]
+                if len(positions) == 0:
+                    raise ValueError(f"{fixed[name]!r} is not on the {name} axis")
+                index.append(positions[0])
+        plane = values[tuple(index)]
+        if names.index(row_axis) > names.index(column_axis):
+            plane = plane.T
+        return pd.DataFrame(plane, index=pd.Index(self.axes[row_axis], name=row_axis), columns=pd.Index(self.axes[column_axis], name=column_axis))
+    
+    def to_frame(self) -> pd.DataFrame:
+        """Long-format table with one row per scenario"""
+        grids = np.meshgrid(*self.axes.values(), indexing='ij')
+        data = {name: grid.ravel() for name, grid in zip(self.axes, grids)}
+        data.update({
+            'emissions_tonnes': self.emissions_tonnes.ravel(),
+            'benchmark_tonnes': self.benchmark_tonnes.ravel(),
+            'score': self.score.ravel(),
+            'status': self.status.ravel(),
+            'fine_amount': self.fine_amount.ravel(),
+            'credit_amount': self.credit_amount.ravel()
+        })
+        return pd.DataFrame(data)
+
 # Example usage
 if __name__ == "__main__":
     # Example company information
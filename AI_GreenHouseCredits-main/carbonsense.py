@@ -0,0 +1,227 @@
+"""
+Headless command line for YourCarbonFootprint application.
+Runs imports, compliance assessments, reports and recalculations without the
+Streamlit UI, for cron jobs and nightly batch runs. Every command runs once
+per selected tenant; with --workers the tenants are processed in parallel
+worker processes (the store's file locks keep them safe next to a running
+app). The exit status is non-zero if any tenant failed.
+
+Usage:
+    python carbonsense.py ingest FILE [--tenant ID ...] [--create]
+    python carbonsense.py assess [--all-tenants] [--period-months N] [--output PATH] [--json]
+    python carbonsense.py report [--all-tenants] [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--format pdf|csv] [--output PATH]
+    python carbonsense.py recalc [--all-tenants] [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--pair CATEGORY:ACTIVITY ...] [--include-custom] [--dry-run]
+
+Paths may contain {tenant}, replaced by each tenant's id. Run it from the
+application directory, where the data directory lives.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+
+def _dates(options):
+    """Start and end dates of the options, as Timestamps or None."""
+    start = pd.Timestamp(options["start"]) if options.get("start") else None
+    end = pd.Timestamp(options["end"]) if options.get("end") else None
+    return start, end
+
+
+def _path(template, tenant_id):
+    path = template.replace("{tenant}", tenant_id)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return path
+
+
+def ingest(tenant_id, options):
+    """Import a CSV file into a tenant's store."""
+    from data_handler import DataHandler
+    from tenants import get_tenant
+
+    path = options["file"].replace("{tenant}", tenant_id)
+    if not os.path.exists(path):
+        return False, f"File not found: {path}"
+    get_tenant(tenant_id, create=options["create"])
+    return DataHandler(tenant_id).import_csv(path)
+
+
+def assess(tenant_id, options):
+    """Assess a tenant's compliance against its industry benchmark."""
+    from carbon_compliance import CarbonComplianceFramework
+    from tenants import get_tenant
+
+    framework = CarbonComplianceFramework(tenant_id)
+    company_info = get_tenant(tenant_id).load_company_info() or {}
+    result = framework.assess_compliance(company_info=company_info, assessment_period_months=options["period_months"])
+    if options.get("output"):
+        with open(_path(options["output"], tenant_id), "w") as f:
+            f.write(framework.generate_compliance_report(result, company_info))
+    if options["json"]:
+        return True, json.dumps({
+            "tenant": tenant_id,
+            "status": result.status.value,
+            "score": round(float(result.score), 2),
+            "emissions_actual_tonnes": round(float(result.emissions_actual), 3),
+            "emissions_benchmark_tonnes": round(float(result.emissions_benchmark), 3),
+            "performance_ratio": round(float(result.performance_ratio), 4),
+            "fine_amount": round(float(result.fine_amount), 2),
+            "credit_amount": round(float(result.credit_amount), 2),
+            "period": result.period_description
+        })
+    return True, (
+        f"{result.status.value.replace('_', ' ')} (score {result.score:.1f}): "
+        f"{result.emissions_actual:.2f} t CO2e vs benchmark {result.emissions_benchmark:.2f} t, "
+        f"fine ₹{result.fine_amount:,.2f}, credits ₹{result.credit_amount:,.2f}"
+    )
+
+
+def report(tenant_id, options):
+    """Write a tenant's PDF report or CSV export."""
+    from data_handler import DataHandler
+    from report_generator import ReportGenerator
+
+    start_date, end_date = _dates(options)
+    handler = DataHandler(tenant_id)
+    if len(handler.get_filtered_data(start_date, end_date)) == 0:
+        return True, "No data for the selected period, skipped"
+    path = _path(options["output"] or f"{{tenant}}_emissions_report.{options['format']}", tenant_id)
+    if options["format"] == "csv":
+        if not handler.export_csv(path, start_date, end_date):
+            return False, "Error exporting CSV"
+        return True, f"Exported {path}"
+    success, message = ReportGenerator(handler).generate_pdf_report(
+        path, start_date, end_date,
+        company_info=handler.company_info,
+        detail_mode=options["detail_mode"]
+    )
+    return bool(success), f"{message} {path}" if success else message
+
+
+def recalc(tenant_id, options):
+    """Restate a tenant's stored emissions with the current factors."""
+    from data_handler import DataHandler
+
+    start_date, end_date = _dates(options)
+    result = DataHandler(tenant_id).recalculate_emissions(
+        start_date, end_date,
+        keys=options["pairs"],
+        include_custom=options["include_custom"],
+        dry_run=options["dry_run"]
+    )
+    return True, (
+        f"{result.rows_changed} of {result.rows_checked} rows {'would change' if options['dry_run'] else 'restated'}, "
+        f"{result.change_kgCO2e:+,.2f} kgCO2e "
+        f"({result.rows_custom} with custom factors skipped, {result.rows_unresolved} without a factor)"
+    )
+
+
+COMMANDS = {"ingest": ingest, "assess": assess, "report": report, "recalc": recalc}
+
+
+def run_tenant(command, tenant_id, options):
+    """
+    Run one command for one tenant, never raising.
+
+    Args:
+        command (str): Key of COMMANDS
+        tenant_id (str): Tenant to run it for
+        options (dict): Parsed command line options
+
+    Returns:
+        tuple: (tenant_id, success, message)
+    """
+    try:
+        success, message = COMMANDS[command](tenant_id, options)
+        return tenant_id, bool(success), message
+    except Exception as e:
+        return tenant_id, False, f"{type(e).__name__}: {e}"
+
+
+def run(command, tenant_ids, options, workers=1):
+    """
+    Run a command for many tenants, in parallel worker processes if workers > 1.
+
+    Args:
+        command (str): Key of COMMANDS
+        tenant_ids (list): Tenants to run it for
+        options (dict): Parsed command line options
+        workers (int): Worker processes
+
+    Yields:
+        tuple: (tenant_id, success, message) as tenants finish
+    """
+    if workers <= 1 or len(tenant_ids) <= 1:
+        for tenant_id in tenant_ids:
+            yield run_tenant(command, tenant_id, options)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tenant_ids))) as pool:
+        futures = [pool.submit(run_tenant, command, tenant_id, options) for tenant_id in tenant_ids]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="carbonsense", description="Batch imports, compliance assessments, reports and recalculations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, help_text):
+        command = commands.add_parser(name, help=help_text)
+        tenants = command.add_mutually_exclusive_group()
+        tenants.add_argument("--tenant", action="append", dest="tenants", metavar="ID", help="Tenant to process (repeatable; default: the default tenant)")
+        tenants.add_argument("--all-tenants", action="store_true", help="Process every tenant")
+        command.add_argument("--workers", type=int, default=1, help="Tenants processed in parallel (default: 1)")
+        return command
+
+    command = add_command("ingest", "Import a CSV file of emission records")
+    command.add_argument("file", help="CSV file; may contain {tenant}")
+    command.add_argument("--create", action="store_true", help="Create tenants that do not exist yet")
+
+    command = add_command("assess", "Assess compliance against the industry benchmark")
+    command.add_argument("--period-months", type=int, default=12, help="Assessment period in months (default: 12)")
+    command.add_argument("--output", help="Also write the Markdown compliance report here; may contain {tenant}")
+    command.add_argument("--json", action="store_true", help="Print one JSON object per tenant")
+
+    command = add_command("report", "Generate a PDF report or CSV export")
+    command.add_argument("--start", help="Earliest date (YYYY-MM-DD)")
+    command.add_argument("--end", help="Latest date (YYYY-MM-DD)")
+    command.add_argument("--format", choices=["pdf", "csv"], default="pdf")
+    command.add_argument("--detail-mode", choices=["inline", "appendix", "none"], default="appendix", help="Where PDF record tables go (default: appendix)")
+    command.add_argument("--output", help="Output file; may contain {tenant} (default: {tenant}_emissions_report.<format>)")
+
+    from recalculate import parse_pair
+    command = add_command("recalc", "Restate stored emissions with the current emission factors")
+    command.add_argument("--start", help="Earliest date restated (YYYY-MM-DD)")
+    command.add_argument("--end", help="Latest date restated (YYYY-MM-DD)")
+    command.add_argument("--pair", action="append", dest="pairs", type=parse_pair, metavar="CATEGORY:ACTIVITY", help="Only restate this (category, activity) pair (repeatable; default: all)")
+    command.add_argument("--include-custom", action="store_true", help="Also restate rows whose factor is not a known factor version")
+    command.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from tenants import get_tenant_registry
+
+    registry = get_tenant_registry()
+    tenant_ids = registry.list_tenants() if args.all_tenants else (args.tenants or [registry.default_tenant])
+    options = {key: value for key, value in vars(args).items() if key not in ("command", "tenants", "all_tenants", "workers")}
+
+    failed = 0
+    for tenant_id, success, message in run(args.command, tenant_ids, options, args.workers):
+        if args.command == "assess" and options.get("json") and success:
+            print(message)
+        else:
+            print(f"{tenant_id}: {message}" if success else f"{tenant_id}: FAILED {message}", file=sys.stdout if success else sys.stderr)
+        failed += not success
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,78 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 DATA_DIR = "data"
 EMISSIONS_FILE = os.path.join(DATA_DIR, "emissions.json")
 COMPANY_INFO_FILE = os.path.join(DATA_DIR, "company_info.json")
+STORE_DIR = os.path.join(DATA_DIR, "store")
+
+# Tenants: every company gets its own store and settings under
+# TENANTS_DIR/<tenant id>/; the default tenant keeps the layout above
+TENANTS_DIR = os.path.join(DATA_DIR, "tenants")
+DEFAULT_TENANT = os.getenv("CARBONSENSE_TENANT", "default")
+
+# Tenant datasets kept in memory at most (least recently used released)
+TENANT_MAX_OPEN = 16
+
+# Number of logged writes folded into a columnar segment at a time
+STORE_COMPACT_THRESHOLD = 5000
+
+# Appends of at least this many rows bypass the log and become a segment
+STORE_SEGMENT_ROWS = 10000
+
+# Deleted/updated records tombstoned in a segment before a background rewrite
+# of that segment drops them physically
+STORE_PURGE_TOMBSTONES = 1000
+
+# Dated emission-factor files (CSV), layered over the built-in factors
+FACTORS_DIR = os.path.join(DATA_DIR, "factors")
+
+# Rows read per chunk when importing CSV files
+CSV_CHUNK_ROWS = 50000
+
+# Rows parsed for the upload preview
+CSV_PREVIEW_ROWS = 1000
+
+# Records drawn at most in PDF report tables; None draws every record. A cap
+# is an explicit opt-in (larger ledgers are then truncated with a note
+# pointing to the CSV export)
+PDF_MAX_DETAIL_ROWS = None
+
+# Records formatted at once while drawing PDF tables
+PDF_FORMAT_CHUNK_ROWS = 5000
+
+# Background report jobs and cached report artifacts
+REPORTS_DIR = os.path.join(DATA_DIR, "reports")
+REPORT_WORKERS = 2
+REPORT_CACHE_MAX_ARTIFACTS = 50
+# Artifacts of reports finished this recently are never evicted, so they stay
+# downloadable; jobs on other hosts silent this long are taken as abandoned
+REPORT_ARTIFACT_PIN_SECONDS = 24 * 3600
+REPORT_JOB_STALE_SECONDS = 3600
+
+# Chart figure cache (serialised Plotly figures, least recently used evicted)
+FIGURE_CACHE_MAX_ENTRIES = 256
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# HTTP API: ingest requests arriving within the batch window are written as
+# one store append (at most API_BATCH_MAX_ROWS rows), large result sets are
+# streamed in chunks of API_STREAM_CHUNK_ROWS records
+API_BATCH_WINDOW_SECONDS = 0.005
+API_BATCH_MAX_ROWS = 20000
+API_STREAM_CHUNK_ROWS = 5000
+API_MAX_BODY_BYTES = 32 * 1024 * 1024
+API_KEEP_ALIVE_SECONDS = 30
+
+# AI response cache and crew execution
+AI_CACHE_FILE = os.path.join(DATA_DIR, "ai_cache.sqlite3")
+AI_CACHE_TTL_SECONDS = 7 * 24 * 3600
+AI_CACHE_MAX_ENTRIES = 500
+AI_MAX_WORKERS = 4
+
+# Emission record columns, in display order
+EMISSIONS_COLUMNS = [
+    "date", "business_unit", "project", "scope", "category", "activity",
+    "country", "facility", "responsible_person", "quantity", "unit",
+    "emission_factor", "emissions_kgCO2e", "data_quality",
+    "verification_status", "notes"
+]
 
 # Supported languages
 SUPPORTED_LANGUAGES = ["English", "Hindi"]
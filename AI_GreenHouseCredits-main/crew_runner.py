@@ -0,0 +1,201 @@
+"""
+Crew execution layer for YourCarbonFootprint application.
+Runs AI crews on a background thread pool with a persistent response cache and
+in-flight request deduplication, so identical prompts are answered once and
+the UI thread never waits on a duplicate LLM round-trip.
+
+Nothing here depends on CrewAI: a job is any zero-argument callable returning
+text, which keeps the cache and deduplication testable offline with a stub.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import AI_CACHE_FILE, AI_CACHE_TTL_SECONDS, AI_CACHE_MAX_ENTRIES, AI_MAX_WORKERS
+
+
+def normalize_prompt(text):
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+
+def prompt_key(*parts):
+    """
+    Build a cache key from prompt parts (model, agent role, task text, ...).
+
+    Args:
+        *parts: Values identifying the request
+
+    Returns:
+        str: SHA-256 hex digest of the normalised parts
+    """
+    normalized = json.dumps([normalize_prompt(part) for part in parts])
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=AI_CACHE_FILE, ttl_seconds=AI_CACHE_TTL_SECONDS, max_entries=AI_CACHE_MAX_ENTRIES):
+        """
+        Open (or create) a persistent response cache.
+
+        Args:
+            path (str): SQLite file holding the cache
+            ttl_seconds (float): Age after which an entry is ignored and dropped
+            max_entries (int): Entries kept; least recently used are evicted
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        """
+        Look up a response.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str or None: Cached response, or None if missing or expired
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def put(self, key, value):
+        """
+        Store a response, evicting expired and least recently used entries.
+
+        Args:
+            key (str): Cache key
+            value (str): Response text
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class CrewExecutor:
+    def __init__(self, cache=None, max_workers=AI_MAX_WORKERS):
+        """
+        Initialize the executor.
+
+        Args:
+            cache (ResponseCache, optional): Response cache, None disables caching
+            max_workers (int): Crews run concurrently
+        """
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, job):
+        """
+        Run a job in the background unless its answer is cached or pending.
+
+        Args:
+            key (str): Cache key of the request, see prompt_key()
+            job (callable): Zero-argument callable producing the response
+
+        Returns:
+            concurrent.futures.Future: Resolves to the response text. Callers
+            asking for a key that is already running share its future.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            # Checked under the lock: a finished job is cached before it
+            # leaves the in-flight table, so it is always found in one of them
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+            future = self._pool.submit(self._execute, key, job)
+            self._in_flight[key] = future
+            return future
+
+    def _execute(self, key, job):
+        try:
+            result = str(job())
+            # Failures are never cached, so a retry reaches the LLM again
+            if self.cache is not None:
+                self.cache.put(key, result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def run(self, key, job, timeout=None):
+        """Run a job and wait for its response (see submit())."""
+        return self.submit(key, job).result(timeout=timeout)
+
+    def in_flight(self):
+        """Number of distinct requests currently running."""
+        with self._lock:
+            return len(self._in_flight)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_crew_executor():
+    """
+    Return the process-wide crew executor, so sessions share one cache and
+    identical requests from different users are deduplicated.
+
+    Returns:
+        CrewExecutor: Shared executor backed by the persistent cache
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CrewExecutor(cache=ResponseCache())
+        return _executor
@@ -0,0 +1,208 @@
+"""
+Streaming CSV ingestion for YourCarbonFootprint application.
+Reads emissions CSV files in fixed-size chunks and validates and types each
+chunk, so parsing memory stays bounded by the chunk size rather than the file
+size. The typed chunks (compact categorical columns) are committed to the store
+with one append once the whole file has been read, so a file is imported
+completely or not at all.
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from config import CSV_CHUNK_ROWS
+from emissions_schema import coerce_emissions_frame, concat_emissions_frames
+from factor_store import get_factor_store
+
+# Columns every uploaded file must provide (date/reporting_period is optional,
+# missing emission factors are looked up in the factor store)
+REQUIRED_COLUMNS = ['scope', 'category', 'activity', 'quantity', 'unit']
+
+# Defaults for enterprise fields missing from the file
+ENTERPRISE_DEFAULTS = {
+    'business_unit': 'Corporate',
+    'project': 'Not Applicable',
+    'country': 'India',
+    'facility': '',
+    'responsible_person': '',
+    'data_quality': 'Medium',
+    'verification_status': 'Unverified',
+    'notes': ''
+}
+
+
+class CSVIngestError(ValueError):
+    """Raised when a CSV file cannot be read or fails validation."""
+
+
+@dataclass
+class IngestResult:
+    """Outcome of a streaming CSV import."""
+    rows_imported: int = 0
+    chunks: int = 0
+    invalid_dates: int = 0
+    has_dates: bool = False
+    has_reporting_period: bool = False
+    computed_emissions: bool = False
+    unresolved_factors: int = 0
+    columns: List[str] = field(default_factory=list)
+
+
+def prepare_chunk(df, has_dates, has_reporting_period, default_date=None):
+    """
+    Validate and type one chunk of an emissions CSV.
+
+    Args:
+        df (pandas.DataFrame): Raw chunk as read from the file
+        has_dates (bool): Whether the file has a date column
+        has_reporting_period (bool): Whether the file has a reporting_period column
+        default_date (pandas.Timestamp, optional): Date for files without dates,
+            defaults to today
+
+    Returns:
+        tuple: (typed DataFrame, number of invalid dates)
+    """
+    if default_date is None:
+        default_date = pd.Timestamp(datetime.now().date())
+
+    invalid_dates = 0
+    if has_dates:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        invalid_dates = int(df['date'].isnull().sum())
+    else:
+        df['date'] = default_date
+
+    for column, default_value in ENTERPRISE_DEFAULTS.items():
+        if column not in df.columns:
+            df[column] = default_value
+
+    if 'emission_factor' not in df.columns:
+        df['emission_factor'] = np.nan
+    try:
+        df['quantity'] = df['quantity'].astype(float)
+        df['emission_factor'] = df['emission_factor'].astype(float)
+    except (TypeError, ValueError) as e:
+        raise CSVIngestError(f"Data validation error: {str(e)}")
+
+    # Fill missing factors with the factor version in force on each row's
+    # date and country, and convert those rows' quantities to the factor's
+    # unit; rows it cannot resolve keep a missing factor (and so missing
+    # computed emissions)
+    missing = np.flatnonzero(df['emission_factor'].isna().to_numpy())
+    if len(missing):
+        lookup = get_factor_store().lookup(
+            df['category'].to_numpy()[missing],
+            df['activity'].to_numpy()[missing],
+            df['date'].to_numpy()[missing],
+            df['country'].to_numpy()[missing],
+            df['unit'].to_numpy()[missing]
+        )
+        resolved = ~lookup.unresolved
+        factors = df['emission_factor'].to_numpy(dtype='float64', copy=True)
+        quantities = df['quantity'].to_numpy(dtype='float64', copy=True)
+        units = df['unit'].to_numpy(dtype=object, copy=True)
+        factors[missing] = lookup.factors
+        quantities[missing[resolved]] *= lookup.conversions[resolved]
+        units[missing[resolved]] = lookup.units[resolved]
+        df['emission_factor'] = factors
+        df['quantity'] = quantities
+        df['unit'] = units
+
+    if 'emissions_kgCO2e' not in df.columns:
+        df['emissions_kgCO2e'] = df['quantity'] * df['emission_factor']
+    else:
+        df['emissions_kgCO2e'] = pd.to_numeric(df['emissions_kgCO2e'], errors='coerce')
+
+    if has_reporting_period:
+        df = df.drop('reporting_period', axis=1)
+
+    return coerce_emissions_frame(df), invalid_dates
+
+
+def _source_size(handle):
+    """Return the byte size of a seekable file handle, or None."""
+    try:
+        position = handle.tell()
+        handle.seek(0, os.SEEK_END)
+        size = handle.tell()
+        handle.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def ingest_csv(source, store, required_columns=REQUIRED_COLUMNS, chunk_rows=CSV_CHUNK_ROWS, progress=None):
+    """
+    Stream a CSV file into the emissions store chunk by chunk.
+
+    Chunks are validated and typed as they are read and committed together
+    in a single store append at the end, so a chunk that fails validation
+    stops the import with nothing saved.
+
+    Args:
+        source: Path to a CSV file or a binary file-like object
+        store (EmissionsStore): Store to append to
+        required_columns (list): Columns the header must contain
+        chunk_rows (int): Rows per chunk
+        progress (callable, optional): Called as progress(fraction, rows)
+            after each chunk, fraction being the share of the file read
+
+    Returns:
+        IngestResult: Summary of the import
+
+    Raises:
+        CSVIngestError: If the file is empty, unparseable or invalid
+    """
+    handle = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        handle.seek(0)
+        size = _source_size(handle)
+        try:
+            reader = pd.read_csv(handle, chunksize=chunk_rows)
+        except pd.errors.EmptyDataError:
+            raise CSVIngestError("The uploaded file appears to be empty. Please upload a valid CSV file.")
+
+        result = IngestResult()
+        default_date = pd.Timestamp(datetime.now().date())
+        prepared = []
+        try:
+            with reader:
+                for chunk in reader:
+                    if result.chunks == 0:
+                        result.columns = list(chunk.columns)
+                        missing = [col for col in required_columns if col not in chunk.columns]
+                        if missing:
+                            raise CSVIngestError(f"CSV must contain all required columns: {', '.join(missing)}")
+                        result.has_dates = 'date' in chunk.columns
+                        result.has_reporting_period = 'reporting_period' in chunk.columns
+                        result.computed_emissions = 'emissions_kgCO2e' not in chunk.columns
+
+                    typed, invalid_dates = prepare_chunk(
+                        chunk, result.has_dates, result.has_reporting_period, default_date
+                    )
+                    prepared.append(typed)
+                    result.chunks += 1
+                    result.rows_imported += len(typed)
+                    result.invalid_dates += invalid_dates
+                    result.unresolved_factors += int(typed['emission_factor'].isna().sum())
+
+                    if progress is not None:
+                        fraction = min(handle.tell() / size, 1.0) if size else 0.0
+                        progress(fraction, result.rows_imported)
+        except pd.errors.ParserError as e:
+            raise CSVIngestError(f"Error parsing CSV file: {str(e)}. Please check the file format.")
+
+        if result.rows_imported == 0:
+            raise CSVIngestError("The uploaded CSV file contains no data.")
+        store.append(concat_emissions_frames(prepared))
+        if progress is not None:
+            progress(1.0, result.rows_imported)
+        return result
+    finally:
+        if handle is not source:
+            handle.close()
@@ -9,10 +9,13 @@ import os
 from datetime import datetime
 import csv
 from io import StringIO
-from fpdf import FPDF  # fpdf2 package
-import matplotlib.pyplot as plt
-import seaborn as sns
 from emission_factors import get_emission_factor, get_categories, get_activities
+from emissions_schema import empty_emissions_frame
+from tenants import get_tenant
+from csv_ingest import ingest_csv, CSVIngestError
+from recalculate import recalculate_emissions
+from config import PDF_MAX_DETAIL_ROWS
+from pdf_tables import build_emissions_report, pdf_bytes
 
 # Constants
 DATA_DIR = "data"
@@ -23,38 +26,55 @@ COMPANY_INFO_FILE = os.path.join(DATA_DIR, "company_info.json")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 class DataHandler:
-    def __init__(self):
-        """Initialize the DataHandler class."""
+    # Unlike the upload page, programmatic imports must carry their own dates
+    CSV_REQUIRED_COLUMNS = ['date', 'scope', 'category', 'activity', 'quantity', 'unit']
+    
+    def __init__(self, tenant_id=None):
+        """
+        Initialize the DataHandler class.
+        
+        Args:
+            tenant_id (str, optional): Tenant whose data is handled, defaults
+                to the default tenant
+        """
+        self.tenant_id = get_tenant(tenant_id).tenant_id
         self.load_emissions_data()
         self.load_company_info()
     
+    @property
+    def tenant(self):
+        """The open tenant (reopened if it was released meanwhile)."""
+        return get_tenant(self.tenant_id)
+    
+    @property
+    def store(self):
+        return self.tenant.store
+    
+    @property
+    def dataset(self):
+        return self.tenant.dataset
+    
+    @property
+    def company_info_file(self):
+        return self.tenant.company_info_file
+    
     def load_emissions_data(self):
-        """Load emissions data from file."""
-        if os.path.exists(EMISSIONS_FILE):
-            with open(EMISSIONS_FILE, 'r') as f:
-                try:
-                    self.emissions_data = pd.DataFrame(json.load(f))
-                    # Convert date strings to datetime objects
-                    if 'date' in self.emissions_data.columns:
-                        self.emissions_data['date'] = pd.to_datetime(self.emissions_data['date'])
-                except json.JSONDecodeError:
-                    self.create_empty_emissions_data()
-        else:
+        """Load emissions data from the shared dataset cache."""
+        try:
+            self.emissions_data, self._base = self.dataset.snapshot()
+        except Exception as e:
+            print(f"Error loading emissions data: {str(e)}")
             self.create_empty_emissions_data()
     
     def create_empty_emissions_data(self):
         """Create empty emissions dataframe."""
-        self.emissions_data = pd.DataFrame(columns=[
-            'date', 'business_unit', 'project', 'scope', 'category', 'activity', 
-            'country', 'facility', 'responsible_person', 'quantity', 'unit', 
-            'emission_factor', 'emissions_kgCO2e', 'data_quality', 
-            'verification_status', 'notes'
-        ])
+        self.emissions_data = empty_emissions_frame()
+        self._base = self.emissions_data.copy(deep=False)
     
     def load_company_info(self):
         """Load company information from file."""
-        if os.path.exists(COMPANY_INFO_FILE):
-            with open(COMPANY_INFO_FILE, 'r') as f:
+        if os.path.exists(self.company_info_file):
+            with open(self.company_info_file, 'r') as f:
                 try:
                     self.company_info = json.load(f)
                 except json.JSONDecodeError:
@@ -78,18 +98,79 @@ class DataHandler:
         }
     
     def save_emissions_data(self):
-        """Save emissions data to file."""
-        # Convert datetime objects to strings
-        data_to_save = self.emissions_data.copy()
-        if 'date' in data_to_save.columns:
-            data_to_save['date'] = data_to_save['date'].dt.strftime('%Y-%m-%d')
+        """
+        Merge the edited dataset into the store.
+        
+        Only the differences are written; records other sessions or processes
+        added since the data was loaded are kept.
+        
+        Returns:
+            MergeResult: Counts of appended, updated and deleted records
+        """
+        result = self.store.merge(self.emissions_data, self._base)
+        self.load_emissions_data()
+        return result
+    
+    def append_emissions_data(self, new_rows):
+        """
+        Append rows to the store log and the in-memory dataset.
+        
+        Args:
+            new_rows (pandas.DataFrame): Emission records to append
+        """
+        self.store.append(new_rows)
+        self.emissions_data, self._base = self.dataset.snapshot()
+    
+    def delete_emission_entries(self, record_ids):
+        """
+        Delete emission records by record id.
+        
+        Args:
+            record_ids (list): Ids of the records to delete
+        
+        Returns:
+            int: Number of records deleted
+        """
+        deleted = self.store.delete(record_ids)
+        self.emissions_data, self._base = self.dataset.snapshot()
+        return deleted
+    
+    def update_emission_entries(self, rows):
+        """
+        Replace emission records, matched by record id.
+        
+        Args:
+            rows (pandas.DataFrame): New records including their record_id
+        
+        Returns:
+            int: Number of records updated
+        """
+        updated = self.store.update(rows)
+        self.emissions_data, self._base = self.dataset.snapshot()
+        return updated
+    
+    def recalculate_emissions(self, start_date=None, end_date=None, keys=None, include_custom=False, dry_run=False):
+        """
+        Restate stored records with the current emission factors.
+        
+        Args:
+            start_date (datetime, optional): Earliest date restated
+            end_date (datetime, optional): Latest date restated
+            keys (list, optional): (category, activity) pairs to restate, all by default
+            include_custom (bool): Also restate records with factors of their own
+            dry_run (bool): Only report what would change
         
-        with open(EMISSIONS_FILE, 'w') as f:
-            json.dump(data_to_save.to_dict('records'), f, indent=2)
+        Returns:
+            RecalculationResult: Counts, totals and the per-factor diff summary
+        """
+        result = recalculate_emissions(self.store, start_date=start_date, end_date=end_date, keys=keys, include_custom=include_custom, dry_run=dry_run)
+        self.emissions_data, self._base = self.dataset.snapshot()
+        return result
     
     def save_company_info(self):
         """Save company information to file."""
-        with open(COMPANY_INFO_FILE, 'w') as f:
+        os.makedirs(os.path.dirname(self.company_info_file), exist_ok=True)
+        with open(self.company_info_file, 'w') as f:
             json.dump(self.company_info, f, indent=2)
     
     def add_emission_entry(self, date, business_unit, project, scope, category, activity, country, facility, responsible_person, quantity, unit, emission_factor, data_quality, verification_status, notes=""):
@@ -140,11 +221,8 @@ class DataHandler:
                 'notes': notes
             }])
             
-            # Append to existing data
-            self.emissions_data = pd.concat([self.emissions_data, new_entry], ignore_index=True)
-            
-            # Save data
-            self.save_emissions_data()
+            # Append to the store
+            self.append_emissions_data(new_entry)
             
             return True
         except Exception as e:
@@ -162,36 +240,15 @@ class DataHandler:
             tuple: (success, message)
         """
         try:
-            # Read CSV
-            df = pd.read_csv(file_path_or_buffer)
-            
-            # Check required columns
-            required_columns = ['date', 'scope', 'category', 'activity', 'quantity', 'unit', 'emission_factor']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                return False, f"Missing required columns: {', '.join(missing_columns)}"
-            
-            # Convert date strings to datetime objects
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # Calculate emissions if not provided
-            if 'emissions_kgCO2e' not in df.columns:
-                df['emissions_kgCO2e'] = df['quantity'].astype(float) * df['emission_factor'].astype(float)
-            
-            # Add notes column if not present
-            if 'notes' not in df.columns:
-                df['notes'] = ""
-            
-            # Append to existing data
-            self.emissions_data = pd.concat([self.emissions_data, df], ignore_index=True)
-            
-            # Save data
-            self.save_emissions_data()
-            
-            return True, f"Successfully imported {len(df)} entries"
+            # Stream the file in chunks; it is committed as one append
+            result = ingest_csv(file_path_or_buffer, self.store, required_columns=self.CSV_REQUIRED_COLUMNS)
+            return True, f"Successfully imported {result.rows_imported} entries"
+        except CSVIngestError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"Error importing CSV: {str(e)}"
+        finally:
+            self.emissions_data, self._base = self.dataset.snapshot()
     
     def export_csv(self, file_path=None, start_date=None, end_date=None):
         """
@@ -207,14 +264,10 @@ class DataHandler:
         """
         try:
             # Filter data by date range if specified
-            data = self.emissions_data.copy()
-            if start_date and end_date:
-                mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-                data = data.loc[mask]
+            data = self.get_filtered_data(start_date, end_date)
             
             # Convert datetime objects to strings
-            if 'date' in data.columns:
-                data['date'] = data['date'].dt.strftime('%Y-%m-%d')
+            data = data.assign(date=data['date'].dt.strftime('%Y-%m-%d'))
             
             if file_path:
                 # Save to file
@@ -229,7 +282,7 @@ class DataHandler:
             print(f"Error exporting CSV: {str(e)}")
             return False
     
-    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None):
+    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None, detail_mode="inline", max_detail_rows=PDF_MAX_DETAIL_ROWS):
         """
         Generate PDF report.
         
@@ -237,82 +290,25 @@ class DataHandler:
             file_path (str, optional): Path to save PDF file
             start_date (datetime, optional): Start date for filtering
             end_date (datetime, optional): End date for filtering
+            detail_mode (str): "inline", "appendix" or "none", see
+                pdf_tables.build_emissions_report
+            max_detail_rows (int, optional): Opt-in cap on records in the table, None (default) for all
             
         Returns:
             bytes or bool: PDF bytes if file_path is None, otherwise True if successful
         """
         try:
-            # Filter data by date range if specified
-            data = self.emissions_data.copy()
-            if start_date and end_date:
-                mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-                data = data.loc[mask]
-            
-            # Create PDF
-            pdf = FPDF()
-            pdf.add_page()
-            
-            # Set font
-            pdf.set_font("Arial", "B", 16)
-            
-            # Title
-            pdf.cell(0, 10, "Carbon Emissions Report", 0, 1, "C")
-            pdf.set_font("Arial", "", 12)
-            
-            # Company info
-            pdf.cell(0, 10, f"Company: {self.company_info['name']}", 0, 1)
-            pdf.cell(0, 10, f"Reporting Period: {start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d') if end_date else 'All'}", 0, 1)
-            pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d')}", 0, 1)
-            
-            # Summary
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Summary", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            total_emissions = data['emissions_kgCO2e'].sum()
-            pdf.cell(0, 10, f"Total Emissions: {total_emissions:.2f} kgCO2e", 0, 1)
-            
-            # Emissions by scope
-            scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
-            for _, row in scope_data.iterrows():
-                pdf.cell(0, 10, f"{row['scope']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Emissions by category
-            category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Top Categories:", 0, 1)
-            for _, row in category_data.nlargest(5, 'emissions_kgCO2e').iterrows():
-                pdf.cell(0, 10, f"{row['category']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Data table
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Emissions Data", 0, 1)
-            pdf.set_font("Arial", "B", 10)
-            
-            # Table header
-            col_widths = [25, 25, 30, 30, 20, 15, 25, 30]
-            headers = ['Date', 'Scope', 'Category', 'Activity', 'Quantity', 'Unit', 'Factor', 'Emissions (kgCO2e)']
-            
-            for i, header in enumerate(headers):
-                pdf.cell(col_widths[i], 10, header, 1)
-            pdf.ln()
-            
-            # Table data
-            pdf.set_font("Arial", "", 8)
-            for _, row in data.iterrows():
-                pdf.cell(col_widths[0], 10, row['date'].strftime('%Y-%m-%d') if isinstance(row['date'], pd.Timestamp) else str(row['date']), 1)
-                pdf.cell(col_widths[1], 10, str(row['scope']), 1)
-                pdf.cell(col_widths[2], 10, str(row['category']), 1)
-                pdf.cell(col_widths[3], 10, str(row['activity']), 1)
-                pdf.cell(col_widths[4], 10, f"{row['quantity']:.2f}", 1)
-                pdf.cell(col_widths[5], 10, str(row['unit']), 1)
-                pdf.cell(col_widths[6], 10, f"{row['emission_factor']:.4f}", 1)
-                pdf.cell(col_widths[7], 10, f"{row['emissions_kgCO2e']:.2f}", 1)
-                pdf.ln()
+            data = self.get_filtered_data(start_date, end_date)
+            
+            pdf = build_emissions_report(
+                data,
+                [
+                    f"Company: {self.company_info['name']}",
+                    f"Reporting Period: {start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d') if end_date else 'All'}"
+                ],
+                detail_mode=detail_mode,
+                max_detail_rows=max_detail_rows
+            )
             
             if file_path:
                 # Save to file
@@ -320,7 +316,7 @@ class DataHandler:
                 return True
             else:
                 # Return PDF bytes
-                return pdf.output(dest='S').encode('latin1')
+                return pdf_bytes(pdf)
         except Exception as e:
             print(f"Error generating PDF report: {str(e)}")
             return False
@@ -332,67 +328,21 @@ class DataHandler:
         Returns:
             dict: Summary statistics
         """
-        if len(self.emissions_data) == 0:
-            return {
-                "total_emissions": 0,
-                "scope_breakdown": {},
-                "category_breakdown": {},
-                "time_series": {}
-            }
-        
-        # Total emissions
-        total_emissions = self.emissions_data['emissions_kgCO2e'].sum()
-        
-        # Emissions by scope
-        scope_data = self.emissions_data.groupby('scope')['emissions_kgCO2e'].sum().to_dict()
-        
-        # Emissions by category
-        category_data = self.emissions_data.groupby('category')['emissions_kgCO2e'].sum().to_dict()
-        
-        # Time series data (monthly)
-        time_data = self.emissions_data.copy()
-        if 'date' in time_data.columns and len(time_data) > 0:
-            time_data['month'] = time_data['date'].dt.strftime('%Y-%m')
-            time_series = time_data.groupby(['month', 'scope'])['emissions_kgCO2e'].sum().reset_index()
-            time_series_dict = {}
-            for _, row in time_series.iterrows():
-                if row['month'] not in time_series_dict:
-                    time_series_dict[row['month']] = {}
-                time_series_dict[row['month']][row['scope']] = row['emissions_kgCO2e']
-        else:
-            time_series_dict = {}
-        
-        return {
-            "total_emissions": total_emissions,
-            "scope_breakdown": scope_data,
-            "category_breakdown": category_data,
-            "time_series": time_series_dict
-        }
+        return self.dataset.aggregates().summary()
     
-    def get_filtered_data(self, start_date=None, end_date=None, scope=None, category=None):
+    def get_filtered_data(self, start_date=None, end_date=None, scope=None, category=None, **filters):
         """
-        Get filtered emissions data.
+        Get filtered emissions data through the dataset indexes.
         
         Args:
-            start_date (datetime, optional): Start date for filtering
-            end_date (datetime, optional): End date for filtering
-            scope (str, optional): Scope for filtering
-            category (str, optional): Category for filtering
+            start_date (datetime, optional): Start date for filtering (inclusive)
+            end_date (datetime, optional): End date for filtering (inclusive)
+            scope (str or list, optional): Scope or scopes for filtering
+            category (str or list, optional): Category or categories for filtering
+            **filters: Further indexed columns (facility, business_unit,
+                country, data_quality, verification_status) -> label or list
             
         Returns:
-            pandas.DataFrame: Filtered data
+            pandas.DataFrame: Filtered data (treat as read-only)
         """
-        data = self.emissions_data.copy()
-        
-        # Apply filters
-        if start_date and end_date:
-            mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-            data = data.loc[mask]
-        
-        if scope:
-            data = data[data['scope'] == scope]
-        
-        if category:
-            data = data[data['category'] == category]
-        
-        return data
+        return self.dataset.query(start_date, end_date, scope=scope, category=category, **filters)
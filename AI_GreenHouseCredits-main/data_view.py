@@ -0,0 +1,153 @@
+"""
+Paged data view for YourCarbonFootprint application.
+Answers "one page of the emissions table, filtered and sorted" without copying
+or rendering the whole dataset: filters are answered by the dataset indexes
+(or, without an index, evaluated on the column arrays), only the filtered
+positions are sorted, and only the rows of the requested page are gathered.
+"""
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from emissions_schema import ID_COLUMN, coerce_emissions_frame, is_typed
+
+DEFAULT_PAGE_SIZE = 50
+PAGE_SIZES = (25, 50, 100, 250)
+
+# Label columns the view can be filtered on
+FILTER_COLUMNS = ("scope", "category", "facility", "business_unit")
+
+
+@dataclass
+class DataPage:
+    """One page of the emissions table."""
+    rows: pd.DataFrame
+    total_rows: int
+    page: int
+    page_size: int
+
+    @property
+    def page_count(self):
+        return max(1, math.ceil(self.total_rows / self.page_size))
+
+    @property
+    def first_row(self):
+        """1-based number of the first row on the page (0 when empty)."""
+        return (self.page - 1) * self.page_size + 1 if self.total_rows else 0
+
+    @property
+    def last_row(self):
+        return min(self.page * self.page_size, self.total_rows)
+
+
+def filter_options(df, column):
+    """
+    List the values a label column can be filtered on.
+
+    Args:
+        df (pandas.DataFrame): Typed emissions data
+        column (str): Label column
+
+    Returns:
+        list: Sorted non-empty labels
+    """
+    values = df[column].cat.categories if isinstance(df[column].dtype, pd.CategoricalDtype) else df[column].dropna().unique()
+    return sorted(str(value) for value in values if str(value) != "")
+
+
+def _label_mask(series, values):
+    """Rows whose label is one of values, compared on categorical codes."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        wanted = series.cat.categories.get_indexer(list(values))
+        return np.isin(series.cat.codes.to_numpy(), wanted[wanted >= 0])
+    return series.isin(list(values)).to_numpy()
+
+
+def _sort_key(series):
+    """
+    Numeric sort key for a column; missing values sort last (ascending).
+
+    Categoricals sort by label, not by category code order.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str)
+        ranks = np.empty(len(categories) + 1, dtype="float64")
+        ranks[np.argsort(np.asarray(categories), kind="stable")] = np.arange(len(categories))
+        ranks[-1] = np.nan
+        return ranks[series.cat.codes.to_numpy()]
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = series.to_numpy().astype("int64").astype("float64")
+        values[series.isna().to_numpy()] = np.nan
+        return values
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype="float64", na_value=np.nan)
+    # Free text: rank the distinct strings
+    codes, uniques = pd.factorize(series.astype(object), sort=True)
+    return np.where(codes < 0, np.nan, codes).astype("float64")
+
+
+def _scan_positions(df, start_date, end_date, filters):
+    """Row positions matching the filters, by scanning the columns."""
+    mask = np.ones(len(df), dtype=bool)
+    if start_date is not None or end_date is not None:
+        dates = df["date"].to_numpy()
+        valid = ~np.isnat(dates)
+        if start_date is not None:
+            valid &= dates >= np.datetime64(pd.Timestamp(start_date))
+        if end_date is not None:
+            valid &= dates <= np.datetime64(pd.Timestamp(end_date))
+        mask &= valid
+    for column, values in (filters or {}).items():
+        if values:
+            mask &= _label_mask(df[column], values)
+    return np.flatnonzero(mask)
+
+
+def query_page(df, start_date=None, end_date=None, filters=None, sort_by="date", ascending=False, page=1, page_size=DEFAULT_PAGE_SIZE, index=None):
+    """
+    Fetch one page of emission records.
+
+    Args:
+        df (pandas.DataFrame): Emissions data (typed frames are used as is)
+        start_date (datetime, optional): Earliest date included
+        end_date (datetime, optional): Latest date included
+        filters (dict, optional): Label column -> allowed values; empty or
+            missing entries do not filter
+        sort_by (str): Column to sort on
+        ascending (bool): Sort direction; missing values always sort last
+        page (int): 1-based page number, clamped to the available pages
+        page_size (int): Rows per page
+        index (EmissionsIndex, optional): Indexes of the dataset, used for
+            filtering instead of scanning df (df is then taken from the index)
+
+    Returns:
+        DataPage: The page rows and the total number of matching rows
+    """
+    if index is not None:
+        df = index.frame
+        positions = index.positions(start_date, end_date, **(filters or {}))
+        if positions is None:
+            positions = np.arange(len(df))
+    else:
+        if not is_typed(df):
+            df = coerce_emissions_frame(df)
+        positions = _scan_positions(df, start_date, end_date, filters)
+
+    if sort_by in df.columns and len(positions) > 1:
+        key = _sort_key(df[sort_by])[positions]
+        if not ascending:
+            key = -key
+        # NaN sorts last either way; stable so equal keys keep store order
+        positions = positions[np.argsort(key, kind="stable")]
+
+    total_rows = len(positions)
+    page_count = max(1, math.ceil(total_rows / page_size))
+    page = min(max(1, int(page)), page_count)
+    start = (page - 1) * page_size
+    rows = df.take(positions[start:start + page_size])
+    if ID_COLUMN in rows.columns:
+        rows = rows.set_index(ID_COLUMN)
+    return DataPage(rows=rows, total_rows=total_rows, page=page, page_size=page_size)
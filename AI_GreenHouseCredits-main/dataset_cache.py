@@ -0,0 +1,231 @@
+"""
+Shared dataset cache for YourCarbonFootprint application.
+Keeps one read-mostly copy of the emissions dataset per store for the whole
+process, so concurrent sessions share memory instead of each parsing the store.
+"""
+
+import threading
+
+import pandas as pd
+
+from aggregates import EmissionsAggregates
+from emissions_index import EmissionsIndex
+from emissions_schema import ID_COLUMN, concat_emissions_frames
+from emissions_store import get_store
+
+# Sessions receive shallow copies of the shared frame. With copy-on-write a
+# session that modifies its copy gets private columns; the shared frame is
+# never mutated. Copy-on-write is always on from pandas 3.0.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+class DatasetCache:
+    def __init__(self, store):
+        """
+        Initialize the cache for a store.
+
+        Args:
+            store (EmissionsStore): Store whose dataset is cached
+        """
+        self.store = store
+        self._lock = threading.RLock()
+        self._frame = None
+        self._pending = []
+        self._aggregates = None
+        self._index = None
+        self._version = None
+        store.subscribe(self._on_write)
+
+    def _on_write(self, op, version, rows):
+        """Apply a committed write without re-reading the store."""
+        with self._lock:
+            if op == "rewrite":
+                self._frame = rows
+                self._pending = []
+                self._aggregates = None
+            elif self._frame is not None and self._version == version - 1 and op == "append":
+                self._pending.append(rows)
+                if self._aggregates is not None:
+                    self._aggregates.add(rows)
+            elif self._frame is not None and self._version == version - 1:
+                # delete or update: drop the affected records, re-add updated ones
+                frame = concat_emissions_frames([self._frame] + self._pending) if self._pending else self._frame
+                self._pending = []
+                hit = frame[ID_COLUMN].isin(rows[ID_COLUMN]).to_numpy(dtype=bool, na_value=False)
+                if self._aggregates is not None:
+                    self._aggregates.remove(frame[hit])
+                frame = frame[~hit].reset_index(drop=True)
+                if op == "update":
+                    frame = concat_emissions_frames([frame, rows])
+                    if self._aggregates is not None:
+                        self._aggregates.add(rows)
+                self._frame = frame
+            else:
+                self._frame = None
+                self._pending = []
+                self._aggregates = None
+            self._version = version
+
+    @property
+    def version(self):
+        """Dataset version the cached frame reflects (None before first load)."""
+        return self._version
+
+    def _materialise(self):
+        # refresh() picks up writes made by other processes
+        if self._frame is None or self._version != self.store.refresh():
+            self._version, self._frame = self.store.snapshot()
+            self._pending = []
+            self._aggregates = None
+        elif self._pending:
+            self._frame = concat_emissions_frames([self._frame] + self._pending)
+            self._pending = []
+        return self._frame
+
+    def get(self):
+        """
+        Return a copy-on-write view of the shared dataset.
+
+        Returns:
+            pandas.DataFrame: Shallow copy of the cached frame
+        """
+        with self._lock:
+            return self._materialise().copy(deep=False)
+
+    def snapshot(self):
+        """
+        Return a copy of the shared dataset to edit and later save with
+        EmissionsStore.merge().
+
+        Returns:
+            tuple: (shallow copy of the cached frame, base) where base is the
+            unedited frame to pass to merge() with the edited copy; copy-on-write
+            keeps it unchanged by edits of the copy
+        """
+        with self._lock:
+            frame = self._materialise()
+            return frame.copy(deep=False), frame
+
+    def aggregates(self):
+        """
+        Return the materialised aggregates of the shared dataset.
+
+        Built once per dataset version and then kept current from write
+        notifications. Callers must treat the result as read-only.
+
+        Returns:
+            EmissionsAggregates: Totals by scope, category, month, facility
+            and business unit
+        """
+        with self._lock:
+            frame = self._materialise()
+            if self._aggregates is None:
+                self._aggregates = EmissionsAggregates.from_frame(frame)
+            return self._aggregates
+
+    def versioned_aggregates(self):
+        """
+        Return the aggregates together with the dataset version they reflect,
+        for caching results derived from them under that version.
+
+        Returns:
+            tuple: (version, EmissionsAggregates)
+        """
+        with self._lock:
+            aggregates = self.aggregates()
+            return self._version, aggregates
+
+    def index(self):
+        """
+        Return the secondary indexes of the shared dataset.
+
+        Rebuilt on first use after the dataset changed. Queries on the index
+        return rows of the frame it was built from, so index and data are
+        always consistent.
+
+        Returns:
+            EmissionsIndex: Date and label indexes
+        """
+        with self._lock:
+            frame = self._materialise()
+            if self._index is None or self._index.frame is not frame:
+                self._index = EmissionsIndex(frame)
+            return self._index
+
+    def versioned_index(self):
+        """
+        Return the secondary indexes together with the dataset version they
+        were built from, for writes conditional on that version.
+
+        Returns:
+            tuple: (version, EmissionsIndex)
+        """
+        with self._lock:
+            index = self.index()
+            return self._version, index
+
+    def query(self, start_date=None, end_date=None, **filters):
+        """
+        Query the shared dataset through its indexes.
+
+        Args:
+            start_date (datetime, optional): Earliest date, inclusive
+            end_date (datetime, optional): Latest date, inclusive
+            **filters: Indexed column -> label or list of labels
+
+        Returns:
+            pandas.DataFrame: Matching rows (read-only view or copy)
+        """
+        return self.index().query(start_date, end_date, **filters)
+
+    def invalidate(self):
+        """Drop the cached frame; the next get() reloads it from the store."""
+        with self._lock:
+            self._frame = None
+            self._pending = []
+            self._aggregates = None
+            self._index = None
+            self._version = None
+
+    def close(self):
+        """Stop following the store's writes and drop the cached data."""
+        self.store.unsubscribe(self._on_write)
+        self.invalidate()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_dataset_cache(store=None):
+    """
+    Return the process-wide dataset cache for a store.
+
+    Args:
+        store (EmissionsStore, optional): Store to cache, defaults to the
+            shared default store
+
+    Returns:
+        DatasetCache: Shared cache instance
+    """
+    store = store or get_store()
+    with _caches_lock:
+        cache = _caches.get(id(store))
+        if cache is None:
+            cache = DatasetCache(store)
+            _caches[id(store)] = cache
+        return cache
+
+
+def release_dataset_cache(store):
+    """
+    Close and forget the cache of a store, freeing its dataset.
+
+    Args:
+        store (EmissionsStore): Store whose cache is released
+    """
+    with _caches_lock:
+        cache = _caches.pop(id(store), None)
+    if cache is not None:
+        cache.close()
@@ -1,102 +1,161 @@
-import json
+"""
+Detailed emissions analysis for YourCarbonFootprint application.
+Prints scope and monthly breakdowns, the largest activities and a reality
+check of unusually large entries and factors for a tenant's stored records.
+
+Usage:
+    python emissions_analysis.py [--tenant ID] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+
+import argparse
+import sys
+
 import pandas as pd
-from datetime import datetime
-
-# Load and analyze the emissions data
-with open('data/emissions.json', 'r') as f:
-    data = json.load(f)
-
-df = pd.DataFrame(data)
-df['date'] = pd.to_datetime(df['date'])
-
-print("=" * 60)
-print("DETAILED EMISSIONS DATA ANALYSIS")
-print("=" * 60)
-print(f"Total records: {len(df)}")
-print(f"Date range: {df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}")
-print(f"Period: {(df['date'].max() - df['date'].min()).days} days")
-print(f"Total emissions: {df['emissions_kgCO2e'].sum()/1000:.2f} tonnes CO2e")
-print()
-
-print("=" * 60)
-print("BREAKDOWN BY SCOPE")
-print("=" * 60)
-scope_breakdown = df.groupby('scope').agg({
-    'emissions_kgCO2e': 'sum',
-    'activity': 'count'
-}).round(2)
-scope_breakdown.columns = ['Total_Emissions_kg', 'Activity_Count']
-scope_breakdown['Emissions_tonnes'] = scope_breakdown['Total_Emissions_kg'] / 1000
-scope_breakdown['Percentage'] = (scope_breakdown['Total_Emissions_kg'] / df['emissions_kgCO2e'].sum()) * 100
-
-for scope in scope_breakdown.index:
-    row = scope_breakdown.loc[scope]
-    print(f"{scope}:")
-    print(f"  - Emissions: {row['Emissions_tonnes']:.2f} tonnes ({row['Percentage']:.1f}%)")
-    print(f"  - Activities: {row['Activity_Count']} entries")
-    print()
 
-print("=" * 60)
-print("TOP 10 HIGHEST EMISSION ACTIVITIES")
-print("=" * 60)
-top_activities = df.nlargest(10, 'emissions_kgCO2e')
-for idx, row in top_activities.iterrows():
-    print(f"{row['activity']} ({row['scope']}):")
-    print(f"  - Emissions: {row['emissions_kgCO2e']/1000:.2f} tonnes CO2e")
-    print(f"  - Calculation: {row['quantity']:.0f} {row['unit']} × {row['emission_factor']:.2f} = {row['emissions_kgCO2e']:.0f} kg CO2e")
-    print(f"  - Date: {row['date'].strftime('%Y-%m-%d')}")
-    print(f"  - Facility: {row['facility']}")
-    print(f"  - Notes: {row['notes']}")
+
+def load_emissions(tenant_id=None, start_date=None, end_date=None):
+    """
+    Load a tenant's records and company information.
+
+    Args:
+        tenant_id (str, optional): Tenant, defaults to the default tenant
+        start_date (datetime, optional): Earliest date, inclusive
+        end_date (datetime, optional): Latest date, inclusive
+
+    Returns:
+        tuple: (emission records, company information dict)
+    """
+    from tenants import get_tenant
+
+    tenant = get_tenant(tenant_id)
+    if start_date is None and end_date is None:
+        df = tenant.dataset.get()
+    else:
+        df = tenant.dataset.query(start_date, end_date)
+    return df, tenant.load_company_info() or {}
+
+
+def print_analysis(df, company_info=None):
+    """
+    Print the analysis of a set of emission records.
+
+    Args:
+        df (pandas.DataFrame): Emission records
+        company_info (dict, optional): Company information for the summary
+    """
+    company_info = company_info or {}
+    df = df.dropna(subset=['date'])
+    if len(df) == 0:
+        print("No emission records to analyse.")
+        return
+    total_kg = df['emissions_kgCO2e'].sum()
+    days = (df['date'].max() - df['date'].min()).days + 1
+
+    print("=" * 60)
+    print("DETAILED EMISSIONS DATA ANALYSIS")
+    print("=" * 60)
+    print(f"Total records: {len(df)}")
+    print(f"Date range: {df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}")
+    print(f"Period: {days} days")
+    print(f"Total emissions: {total_kg/1000:.2f} tonnes CO2e")
     print()
 
-print("=" * 60)
-print("REALITY CHECK - QUESTIONABLE ACTIVITIES")
-print("=" * 60)
-print("Activities with emissions > 10 tonnes:")
-high_emissions = df[df['emissions_kgCO2e'] > 10000]
-if len(high_emissions) > 0:
-    for idx, row in high_emissions.iterrows():
-        print(f"⚠️  {row['activity']} = {row['emissions_kgCO2e']/1000:.1f} tonnes")
-        print(f"    Calculation: {row['quantity']:.0f} {row['unit']} × {row['emission_factor']:.2f}")
-        print(f"    Date: {row['date'].strftime('%Y-%m-%d')}")
-        print(f"    Notes: {row['notes']}")
+    print("=" * 60)
+    print("BREAKDOWN BY SCOPE")
+    print("=" * 60)
+    scope_breakdown = df.groupby('scope', observed=True).agg({
+        'emissions_kgCO2e': 'sum',
+        'activity': 'count'
+    }).round(2)
+    scope_breakdown.columns = ['Total_Emissions_kg', 'Activity_Count']
+    scope_breakdown['Emissions_tonnes'] = scope_breakdown['Total_Emissions_kg'] / 1000
+    scope_breakdown['Percentage'] = (scope_breakdown['Total_Emissions_kg'] / total_kg) * 100
+
+    for scope in scope_breakdown.index:
+        row = scope_breakdown.loc[scope]
+        print(f"{scope}:")
+        print(f"  - Emissions: {row['Emissions_tonnes']:.2f} tonnes ({row['Percentage']:.1f}%)")
+        print(f"  - Activities: {row['Activity_Count']:.0f} entries")
         print()
-else:
-    print("No activities with emissions > 10 tonnes found.")
-
-print("=" * 60)
-print("MONTHLY BREAKDOWN")
-print("=" * 60)
-df['month'] = df['date'].dt.strftime('%Y-%m')
-monthly = df.groupby('month')['emissions_kgCO2e'].sum() / 1000
-for month, emissions in monthly.items():
-    print(f"{month}: {emissions:.2f} tonnes CO2e")
-
-print()
-print("=" * 60)
-print("EMISSION FACTOR ANALYSIS")
-print("=" * 60)
-print("High emission factors (>100 kg CO2e per unit):")
-high_factors = df[df['emission_factor'] > 100]
-for idx, row in high_factors.iterrows():
-    print(f"{row['activity']}: {row['emission_factor']:.0f} kg CO2e per {row['unit']}")
-    print(f"  - Quantity: {row['quantity']:.0f} {row['unit']}")
-    print(f"  - Total emissions: {row['emissions_kgCO2e']/1000:.2f} tonnes")
-    print(f"  - Notes: {row['notes']}")
+
+    print("=" * 60)
+    print("TOP 10 HIGHEST EMISSION ACTIVITIES")
+    print("=" * 60)
+    top_activities = df.nlargest(10, 'emissions_kgCO2e')
+    for idx, row in top_activities.iterrows():
+        print(f"{row['activity']} ({row['scope']}):")
+        print(f"  - Emissions: {row['emissions_kgCO2e']/1000:.2f} tonnes CO2e")
+        print(f"  - Calculation: {row['quantity']:.0f} {row['unit']} × {row['emission_factor']:.2f} = {row['emissions_kgCO2e']:.0f} kg CO2e")
+        print(f"  - Date: {row['date'].strftime('%Y-%m-%d')}")
+        print(f"  - Facility: {row['facility']}")
+        print(f"  - Notes: {row['notes']}")
+        print()
+
+    print("=" * 60)
+    print("REALITY CHECK - QUESTIONABLE ACTIVITIES")
+    print("=" * 60)
+    print("Activities with emissions > 10 tonnes:")
+    high_emissions = df[df['emissions_kgCO2e'] > 10000]
+    if len(high_emissions) > 0:
+        for idx, row in high_emissions.iterrows():
+            print(f"⚠️  {row['activity']} = {row['emissions_kgCO2e']/1000:.1f} tonnes")
+            print(f"    Calculation: {row['quantity']:.0f} {row['unit']} × {row['emission_factor']:.2f}")
+            print(f"    Date: {row['date'].strftime('%Y-%m-%d')}")
+            print(f"    Notes: {row['notes']}")
+            print()
+    else:
+        print("No activities with emissions > 10 tonnes found.")
+
+    print("=" * 60)
+    print("MONTHLY BREAKDOWN")
+    print("=" * 60)
+    monthly = df.groupby(df['date'].dt.strftime('%Y-%m'))['emissions_kgCO2e'].sum() / 1000
+    for month, emissions in monthly.items():
+        print(f"{month}: {emissions:.2f} tonnes CO2e")
+
+    print()
+    print("=" * 60)
+    print("EMISSION FACTOR ANALYSIS")
+    print("=" * 60)
+    print("High emission factors (>100 kg CO2e per unit):")
+    high_factors = df[df['emission_factor'] > 100]
+    for idx, row in high_factors.iterrows():
+        print(f"{row['activity']}: {row['emission_factor']:.0f} kg CO2e per {row['unit']}")
+        print(f"  - Quantity: {row['quantity']:.0f} {row['unit']}")
+        print(f"  - Total emissions: {row['emissions_kgCO2e']/1000:.2f} tonnes")
+        print(f"  - Notes: {row['notes']}")
+        print()
+
+    print("=" * 60)
+    print("SUMMARY FOR ANALYSIS PERIOD")
+    print("=" * 60)
+    print(f"Company: {company_info.get('name') or 'N/A'}")
+    print(f"Assessment Period: {days} days ({df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')})")
+    print(f"Total Emissions: {total_kg/1000:.2f} tonnes CO2e")
+    print(f"Daily Average: {(total_kg/1000)/days:.2f} tonnes CO2e per day")
+    print(f"Annual Projection: {(total_kg/1000)*365/days:.2f} tonnes CO2e per year")
     print()
+    print("Key Contributors:")
+    top_contributors = df.groupby('activity', observed=True)['emissions_kgCO2e'].sum().nlargest(5) / 1000
+    for rank, (activity, emissions) in enumerate(top_contributors.items(), 1):
+        print(f"{rank}. {activity}: {emissions:.2f} tonnes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a detailed analysis of stored emissions.")
+    parser.add_argument("--tenant", help="Tenant to analyse (default: the default tenant)")
+    parser.add_argument("--start", help="Earliest date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Latest date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    df, company_info = load_emissions(
+        args.tenant,
+        pd.Timestamp(args.start) if args.start else None,
+        pd.Timestamp(args.end) if args.end else None
+    )
+    print_analysis(df, company_info)
+    return 0
+
 
-print("=" * 60)
-print("SUMMARY FOR 1-MONTH PERIOD")
-print("=" * 60)
-print(f"Company: Manufacturing facility in Visakhapatnam")
-print(f"Assessment Period: 1 month (January 2025)")
-print(f"Total Emissions: {df['emissions_kgCO2e'].sum()/1000:.2f} tonnes CO2e")
-print(f"Daily Average: {(df['emissions_kgCO2e'].sum()/1000)/28:.2f} tonnes CO2e per day")
-print(f"Annual Projection: {(df['emissions_kgCO2e'].sum()/1000)*12:.2f} tonnes CO2e per year")
-print()
-print("Key Contributors:")
-print(f"1. Manufacturing Electricity: {df[df['activity']=='Manufacturing Electricity']['emissions_kgCO2e'].sum()/1000:.2f} tonnes")
-print(f"2. Refrigerant Leak: {df[df['activity']=='Refrigerant Leak']['emissions_kgCO2e'].sum()/1000:.2f} tonnes")
-print(f"3. Raw Materials: {df[df['activity']=='Raw Materials']['emissions_kgCO2e'].sum()/1000:.2f} tonnes")
-print(f"4. Boiler (Natural Gas): {df[df['activity']=='Boiler']['emissions_kgCO2e'].sum()/1000:.2f} tonnes")
-print(f"5. Chemical Production: {df[df['activity']=='Chemical Production']['emissions_kgCO2e'].sum()/1000:.2f} tonnes")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Emissions digest for YourCarbonFootprint application.
+Summarises the emissions dataset into a bounded, deterministic text block for
+LLM prompts. The digest size depends on the limits below, not on the number of
+rows, and identical data always yields identical text (so responses cache well).
+"""
+
+import pandas as pd
+
+from emissions_schema import coerce_emissions_frame, is_typed
+
+# Limits that bound the digest size
+TOP_K = 5
+MAX_MONTHS = 24
+MAX_FACILITIES = 10
+MAX_ANOMALIES = 5
+
+
+def _fmt(value):
+    """Format a kgCO2e amount with a fixed precision."""
+    return f"{value:,.1f}"
+
+
+def _share(value, total):
+    return f"{(100 * value / total if total else 0):.1f}%"
+
+
+def _ranked(totals, limit):
+    """Sort totals descending with the label as tie-breaker and keep limit rows."""
+    totals = totals[totals.index.astype(str) != ""]
+    order = sorted(totals.items(), key=lambda item: (-item[1], str(item[0])))
+    return order[:limit], order[limit:]
+
+
+def _ranked_lines(df, column, total, limit):
+    totals = df.groupby(column, observed=True)["emissions_kgCO2e"].sum()
+    counts = df.groupby(column, observed=True).size()
+    top, rest = _ranked(totals, limit)
+    lines = [
+        f"- {label}: {_fmt(value)} kgCO2e ({_share(value, total)}, {counts[label]} entries)"
+        for label, value in top
+    ]
+    if rest:
+        rest_total = sum(value for _, value in rest)
+        lines.append(f"- {len(rest)} others: {_fmt(rest_total)} kgCO2e ({_share(rest_total, total)})")
+    return lines
+
+
+def _mix_line(df, column):
+    counts = df[column].astype(object).fillna("Unknown").value_counts()
+    items = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    return ", ".join(f"{label} {_share(count, len(df))}" for label, count in items[:TOP_K])
+
+
+def _anomaly_lines(df, limit):
+    """Entries far above the typical entry of their category (Tukey fences on IQR)."""
+    emissions = df["emissions_kgCO2e"]
+    grouped = emissions.groupby(df["category"], observed=True)
+    q1 = grouped.transform(lambda s: s.quantile(0.25))
+    q3 = grouped.transform(lambda s: s.quantile(0.75))
+    fence = q3 + 3 * (q3 - q1)
+    outliers = df[(emissions > fence) & (grouped.transform("size") >= 4)]
+    outliers = outliers.assign(entry_date=outliers["date"].dt.strftime("%Y-%m-%d").fillna("no date"))
+    outliers = outliers.sort_values(["emissions_kgCO2e", "entry_date"], ascending=[False, True], kind="mergesort")
+    lines = []
+    for row in outliers.head(limit).itertuples():
+        typical = q3[row.Index]
+        # Missing labels are NaN after coercion, which is truthy
+        activity = row.activity if pd.notna(row.activity) and row.activity else "unspecified activity"
+        facility = row.facility if pd.notna(row.facility) and row.facility else "unspecified facility"
+        lines.append(
+            f"- {row.entry_date} {row.category} / {activity} at {facility}: "
+            f"{_fmt(row.emissions_kgCO2e)} kgCO2e (category upper quartile {_fmt(typical)})"
+        )
+    return lines, len(outliers)
+
+
+def build_emissions_digest(emissions_data, top_k=TOP_K, max_months=MAX_MONTHS, max_facilities=MAX_FACILITIES, max_anomalies=MAX_ANOMALIES):
+    """
+    Build a bounded statistical digest of the emissions data for LLM input.
+
+    Args:
+        emissions_data (pandas.DataFrame): Emissions records
+        top_k (int): Categories and activities listed
+        max_months (int): Most recent months in the month x scope series
+        max_facilities (int): Facilities and business units listed
+        max_anomalies (int): Unusual entries listed
+
+    Returns:
+        str: Digest text
+    """
+    df = emissions_data if is_typed(emissions_data) else coerce_emissions_frame(emissions_data)
+    df = df.assign(emissions_kgCO2e=df["emissions_kgCO2e"].fillna(0))
+    if len(df) == 0:
+        return "Emissions data digest: no entries recorded."
+
+    total = float(df["emissions_kgCO2e"].sum())
+    dates = df["date"].dropna()
+    lines = ["EMISSIONS DATA DIGEST", "", "## Overview", f"- Entries: {len(df)}", f"- Total emissions: {_fmt(total)} kgCO2e ({total / 1000:,.2f} tCO2e)"]
+    if len(dates) > 0:
+        lines.append(f"- Period: {dates.min().strftime('%Y-%m-%d')} to {dates.max().strftime('%Y-%m-%d')}")
+    missing_dates = len(df) - len(dates)
+    if missing_dates:
+        lines.append(f"- Entries without a valid date: {missing_dates}")
+
+    lines += ["", "## Emissions by scope"] + _ranked_lines(df, "scope", total, 3)
+    lines += ["", f"## Top {top_k} categories"] + _ranked_lines(df, "category", total, top_k)
+    lines += ["", f"## Top {top_k} activities"] + _ranked_lines(df, "activity", total, top_k)
+
+    if len(dates) > 0:
+        dated = df.loc[dates.index]
+        monthly = dated.groupby([dated["date"].dt.strftime("%Y-%m"), "scope"], observed=True)["emissions_kgCO2e"].sum().unstack(fill_value=0)
+        monthly = monthly.sort_index().tail(max_months)
+        scopes = sorted(str(scope) for scope in monthly.columns)
+        lines += ["", f"## Monthly emissions by scope (kgCO2e, last {len(monthly)} months)", "month | " + " | ".join(scopes) + " | total"]
+        for month, row in monthly.iterrows():
+            values = [row[scope] for scope in sorted(monthly.columns, key=str)]
+            lines.append(f"{month} | " + " | ".join(_fmt(v) for v in values) + f" | {_fmt(sum(values))}")
+
+    lines += ["", f"## Top {max_facilities} facilities"] + _ranked_lines(df, "facility", total, max_facilities)
+    lines += ["", f"## Top {max_facilities} business units"] + _ranked_lines(df, "business_unit", total, max_facilities)
+
+    lines += ["", "## Data quality", f"- Quality: {_mix_line(df, 'data_quality')}", f"- Verification: {_mix_line(df, 'verification_status')}"]
+
+    anomaly_lines, anomaly_count = _anomaly_lines(df, max_anomalies)
+    lines += ["", f"## Unusual entries ({anomaly_count} found, largest {len(anomaly_lines)} shown)"]
+    lines += anomaly_lines or ["- None detected"]
+    return "\n".join(lines)
@@ -0,0 +1,203 @@
+"""
+Secondary indexes for YourCarbonFootprint application.
+Indexes one version of the emissions dataset so filtered queries do not scan
+and copy the whole frame:
+
+- a sorted date index: date ranges are two binary searches
+- inverted indexes on the label columns: each label maps to the sorted row
+  positions holding it, so IN-lists are unions of posting lists and predicates
+  on several columns are intersections
+
+Queries return row positions, or a frame that is a zero-copy slice of the
+dataset when the matching rows are contiguous (e.g. no filter at all).
+"""
+
+import numpy as np
+import pandas as pd
+
+from emissions_schema import coerce_emissions_frame, is_typed
+
+# Label columns with an inverted index
+INDEXED_COLUMNS = ("scope", "category", "activity", "facility", "business_unit", "country", "data_quality", "verification_status")
+
+
+def _as_values(value):
+    """Normalise a predicate value to a list (scalars mean equality)."""
+    if isinstance(value, (list, tuple, set, frozenset, np.ndarray, pd.Index, pd.Series)):
+        return list(value)
+    return [value]
+
+
+def _intersect(a, b, row_count):
+    """Intersect two sorted, unique position arrays (a is the smaller one)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.empty(0, dtype="int64")
+    if len(a) * 16 < len(b):
+        # Few probes: binary search them in b
+        found = np.searchsorted(b, a)
+        found[found == len(b)] = len(b) - 1
+        return a[b[found] == a]
+    # Otherwise probe a bitmap of b, linear in len(a) + len(b)
+    members = np.zeros(row_count, dtype=bool)
+    members[b] = True
+    return a[members[a]]
+
+
+class EmissionsIndex:
+    def __init__(self, frame):
+        """
+        Build the indexes for a dataset.
+
+        Args:
+            frame (pandas.DataFrame): Emissions data; must not be modified
+                while the index is in use
+        """
+        self.frame = frame if is_typed(frame) else coerce_emissions_frame(frame)
+        self.row_count = len(self.frame)
+
+        # Sorted date index (rows without a date are left out)
+        dates = self.frame["date"].to_numpy()
+        dated = np.flatnonzero(~np.isnat(dates))
+        order = np.argsort(dates[dated], kind="stable")
+        self._date_positions = dated[order]
+        self._sorted_dates = dates[dated][order]
+
+        # Inverted indexes in CSR form: the positions of label i are
+        # positions[offsets[i]:offsets[i + 1]], ascending
+        self._postings = {}
+        for column in INDEXED_COLUMNS:
+            series = self.frame[column]
+            labels = list(series.cat.categories)
+            codes = series.cat.codes.to_numpy()
+            positions = np.argsort(codes, kind="stable")
+            counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+            missing = int((codes < 0).sum())
+            offsets = np.concatenate([[missing], missing + np.cumsum(counts)])
+            self._postings[column] = (pd.Index(labels, dtype=object), positions, offsets)
+
+    # ------------------------------------------------------------------
+    # Single-index lookups
+    # ------------------------------------------------------------------
+    def date_positions(self, start_date=None, end_date=None):
+        """
+        Rows dated within [start_date, end_date] (either bound optional).
+
+        Returns:
+            numpy.ndarray: Sorted row positions
+        """
+        lo = 0
+        hi = len(self._sorted_dates)
+        if start_date is not None:
+            lo = np.searchsorted(self._sorted_dates, np.datetime64(pd.Timestamp(start_date)), side="left")
+        if end_date is not None:
+            hi = np.searchsorted(self._sorted_dates, np.datetime64(pd.Timestamp(end_date)), side="right")
+        return np.sort(self._date_positions[lo:max(lo, hi)])
+
+    def label_positions(self, column, values):
+        """
+        Rows whose label in column is one of values.
+
+        Args:
+            column (str): Indexed column
+            values: Label or list of labels
+
+        Returns:
+            numpy.ndarray: Sorted row positions
+        """
+        labels, positions, offsets = self._postings[column]
+        codes = labels.get_indexer(_as_values(values))
+        parts = [positions[offsets[code]:offsets[code + 1]] for code in np.unique(codes[codes >= 0])]
+        if not parts:
+            return np.empty(0, dtype="int64")
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+    def pair_positions(self, pairs):
+        """
+        Rows holding any of the (category, activity) pairs.
+
+        Args:
+            pairs (iterable): (category, activity) tuples
+
+        Returns:
+            numpy.ndarray: Sorted row positions
+        """
+        parts = [
+            _intersect(self.label_positions("activity", activity), self.label_positions("category", category), self.row_count)
+            for category, activity in set(pairs)
+        ]
+        if not parts:
+            return np.empty(0, dtype="int64")
+        return np.sort(np.concatenate(parts))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def positions(self, start_date=None, end_date=None, **filters):
+        """
+        Rows matching every predicate.
+
+        Args:
+            start_date (datetime, optional): Earliest date, inclusive
+            end_date (datetime, optional): Latest date, inclusive
+            **filters: Indexed column -> label or list of labels; None or an
+                empty list does not filter
+
+        Returns:
+            numpy.ndarray or None: Sorted row positions, None when no
+            predicate was given (all rows match)
+        """
+        candidates = []
+        if start_date is not None or end_date is not None:
+            candidates.append(self.date_positions(start_date, end_date))
+        for column, values in filters.items():
+            if values is None or len(_as_values(values)) == 0:
+                continue
+            if column not in self._postings:
+                raise ValueError(f"Column '{column}' is not indexed; indexed columns: {', '.join(INDEXED_COLUMNS)}")
+            candidates.append(self.label_positions(column, values))
+        if not candidates:
+            return None
+        # Intersect the most selective predicates first
+        candidates.sort(key=len)
+        result = candidates[0]
+        for other in candidates[1:]:
+            result = _intersect(result, other, self.row_count)
+        return result
+
+    def query(self, start_date=None, end_date=None, **filters):
+        """
+        Rows matching every predicate as a DataFrame.
+
+        Args:
+            See positions()
+
+        Returns:
+            pandas.DataFrame: Matching rows in dataset order. A shallow copy
+            or slice of the dataset when the rows are contiguous, else a
+            gathered copy of just the matching rows
+        """
+        positions = self.positions(start_date, end_date, **filters)
+        if positions is None:
+            return self.frame.copy(deep=False)
+        if len(positions) and positions[-1] - positions[0] + 1 == len(positions):
+            return self.frame.iloc[positions[0]:positions[-1] + 1]
+        return self.frame.take(positions)
+
+    def count(self, column, values):
+        """Number of rows whose label in column is one of values."""
+        labels, _, offsets = self._postings[column]
+        codes = labels.get_indexer(_as_values(values))
+        return int(sum(offsets[code + 1] - offsets[code] for code in np.unique(codes[codes >= 0])))
+
+    def distinct(self, column):
+        """Labels of column that occur in at least one row."""
+        labels, _, offsets = self._postings[column]
+        return [label for label, size in zip(labels, np.diff(offsets)) if size > 0]
+
+    def date_range(self):
+        """(earliest, latest) date, or (None, None) if no row has a date."""
+        if len(self._sorted_dates) == 0:
+            return None, None
+        return pd.Timestamp(self._sorted_dates[0]), pd.Timestamp(self._sorted_dates[-1])
@@ -0,0 +1,127 @@
+"""
+Canonical emissions schema for YourCarbonFootprint application.
+Defines the column types of the emissions table and coerces frames to them
+once, at load and ingest time, so the rest of the code never re-parses dates
+or numbers.
+"""
+
+import pandas as pd
+
+from config import EMISSIONS_COLUMNS
+
+DATE_COLUMN = "date"
+DATE_DTYPE = "datetime64[ns]"
+
+# Stable record id assigned by the store (nullable until a row is stored)
+ID_COLUMN = "record_id"
+ID_DTYPE = "Int64"
+
+# Low-cardinality labels stored as pandas categoricals
+CATEGORICAL_COLUMNS = [
+    "business_unit", "project", "scope", "category", "activity", "country",
+    "facility", "unit", "data_quality", "verification_status"
+]
+
+# Measured values stored as float64
+NUMERIC_COLUMNS = ["quantity", "emission_factor", "emissions_kgCO2e"]
+
+# Free text stored as Python strings
+TEXT_COLUMNS = ["responsible_person", "notes"]
+
+
+def _as_text(series):
+    """Convert values to str, keeping missing values missing."""
+    return series.where(series.isna(), series.astype(str)).astype(object)
+
+
+def is_typed(df):
+    """
+    Check whether a frame already follows the canonical schema.
+
+    Args:
+        df (pandas.DataFrame): Emissions data
+
+    Returns:
+        bool: True if every standard column is present with its schema dtype
+    """
+    if any(column not in df.columns for column in EMISSIONS_COLUMNS):
+        return False
+    if df[DATE_COLUMN].dtype != DATE_DTYPE:
+        return False
+    if any(df[column].dtype != "float64" for column in NUMERIC_COLUMNS):
+        return False
+    return all(isinstance(df[column].dtype, pd.CategoricalDtype) for column in CATEGORICAL_COLUMNS)
+
+
+def coerce_emissions_frame(df):
+    """
+    Coerce an emissions DataFrame to the canonical schema.
+
+    Missing standard columns are added, dates become datetime64 (invalid
+    dates become NaT), numerics become float64 (invalid values become NaN),
+    labels become categoricals and any extra columns are kept as text. A
+    record_id column, if present, is kept as nullable integers after the
+    standard columns.
+
+    Args:
+        df (pandas.DataFrame): Emission records
+
+    Returns:
+        pandas.DataFrame: Typed copy with the standard columns first
+    """
+    df = df.copy(deep=False)
+    for column in EMISSIONS_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    if df[DATE_COLUMN].dtype != DATE_DTYPE:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], errors="coerce").astype(DATE_DTYPE)
+    for column in NUMERIC_COLUMNS:
+        if df[column].dtype != "float64":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    for column in CATEGORICAL_COLUMNS:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = _as_text(df[column]).astype("category")
+    id_columns = []
+    if ID_COLUMN in df.columns:
+        id_columns.append(ID_COLUMN)
+        if df[ID_COLUMN].dtype != ID_DTYPE:
+            df[ID_COLUMN] = pd.to_numeric(df[ID_COLUMN], errors="coerce").astype(ID_DTYPE)
+    extra_columns = [column for column in df.columns if column not in EMISSIONS_COLUMNS and column != ID_COLUMN]
+    for column in TEXT_COLUMNS + extra_columns:
+        if df[column].dtype != object:
+            df[column] = _as_text(df[column])
+    return df[EMISSIONS_COLUMNS + id_columns + extra_columns].reset_index(drop=True)
+
+
+def empty_emissions_frame():
+    """Return an empty emissions DataFrame with the canonical schema."""
+    return coerce_emissions_frame(pd.DataFrame(columns=EMISSIONS_COLUMNS))
+
+
+def concat_emissions_frames(frames):
+    """
+    Concatenate typed emissions frames without losing categorical dtypes.
+
+    pandas.concat falls back to object columns when categoricals have
+    different categories, so every frame is first recoded to the union of
+    the categories of each column.
+
+    Args:
+        frames (list): Typed emissions DataFrames
+
+    Returns:
+        pandas.DataFrame: Typed concatenation
+    """
+    frames = [coerce_emissions_frame(frame) for frame in frames if len(frame) > 0]
+    if not frames:
+        return empty_emissions_frame()
+    if len(frames) == 1:
+        return frames[0]
+    frames = [frame.copy(deep=False) for frame in frames]
+    for column in CATEGORICAL_COLUMNS:
+        categories = pd.Index([], dtype=object)
+        for frame in frames:
+            categories = categories.union(frame[column].cat.categories.astype(object), sort=False)
+        for frame in frames:
+            frame[column] = frame[column].cat.set_categories(categories)
+    return coerce_emissions_frame(pd.concat(frames, ignore_index=True))
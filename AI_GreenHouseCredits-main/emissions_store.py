@@ -0,0 +1,938 @@
+"""
+Emissions store for YourCarbonFootprint application.
+Persists emission records as an append-only log compacted into Parquet segments.
+
+Layout of the store directory:
+    manifest.json          committed segments, active log and dataset version
+    segments/seg-*.parquet immutable columnar segments
+    wal-*.jsonl            append-only write-ahead log, one JSON record per line
+
+A new entry costs one appended line in the log. Once the log holds
+STORE_COMPACT_THRESHOLD records it is folded into a new segment; bulk appends
+and updates of STORE_SEGMENT_ROWS or more rows are written straight to a
+segment. Every file is
+written to a temporary path and renamed into place, so a crash at any point
+leaves either the old or the new state on disk, never a mix of both.
+
+Every stored record carries a record_id that is unique within the store and
+never reused; the next free id is kept in the manifest (and recovered from the
+log after a crash). An in-memory index maps each id to its location (segment
+file and row, or log record). Deletes and updates are single log records:
+they tombstone the old rows, which are hidden on load, listed per segment in
+the manifest when the log is folded, and physically dropped by a background
+rewrite of the affected segments once STORE_PURGE_TOMBSTONES accumulate.
+
+Several processes may open the same store. Writers hold an exclusive advisory
+lock on store.lock (readers a shared one) and, on taking it, pick up whatever
+other processes committed since they last looked, so versions keep increasing
+across processes and no write is based on a stale manifest. Sessions holding
+an edited copy of the dataset save it with merge(), which turns the copy into
+deletes, updates and appends against the live records instead of replacing
+them, so rows other sessions added meanwhile are kept.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): the store is then safe within one process only
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from config import EMISSIONS_FILE, STORE_DIR, STORE_COMPACT_THRESHOLD, STORE_SEGMENT_ROWS, STORE_PURGE_TOMBSTONES
+from emissions_schema import ID_COLUMN, ID_DTYPE, NUMERIC_COLUMNS, coerce_emissions_frame, concat_emissions_frames
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "store.lock"
+
+
+class StoreConflictError(RuntimeError):
+    """A conditional write found the dataset at another version than expected."""
+
+
+@dataclass
+class MergeResult:
+    """Writes a merge() turned a session's copy of the dataset into."""
+    appended: int = 0
+    updated: int = 0
+    deleted: int = 0
+    conflicts: int = 0
+    version: int = 0
+
+
+def _fsync_write(path, text):
+    """Write text to path atomically (temp file, fsync, rename)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _fsync_copy(source, path):
+    """Copy a file atomically (temp file, fsync, rename)."""
+    tmp_path = f"{path}.tmp"
+    shutil.copyfile(source, tmp_path)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _rows_json(rows):
+    """
+    Serialise rows for the log.
+
+    json.dumps writes floats with repr, so they read back bit for bit
+    (DataFrame.to_json rounds them to 10 decimals by default).
+    """
+    values = rows.astype(object)
+    for column in rows.columns:
+        if pd.api.types.is_datetime64_any_dtype(rows[column]):
+            values[column] = rows[column].dt.strftime("%Y-%m-%dT%H:%M:%S").astype(object)
+    values = values.where(rows.notna(), None)
+    return json.dumps(values.to_dict("records"), default=str)
+
+
+def _changed(rows, base):
+    """
+    Flag the rows whose values differ from the record with the same id in
+    base; rows whose id is not in base count as changed.
+    """
+    before = base.drop_duplicates(ID_COLUMN, keep="last").set_index(ID_COLUMN).reindex(rows[ID_COLUMN])
+    changed = ~rows[ID_COLUMN].isin(base[ID_COLUMN]).to_numpy(dtype=bool, na_value=False)
+    for column in rows.columns:
+        if column == ID_COLUMN or column not in before.columns:
+            continue
+        if column in NUMERIC_COLUMNS:
+            old = before[column].to_numpy(dtype="float64", na_value=np.nan)
+            new = rows[column].to_numpy(dtype="float64", na_value=np.nan)
+            changed |= ~((old == new) | (np.isnan(old) & np.isnan(new)))
+        else:
+            old = before[column].astype(object).to_numpy()
+            new = rows[column].astype(object).to_numpy()
+            changed |= ~(pd.isna(old) & pd.isna(new)) & (pd.isna(old) | pd.isna(new) | (old != new))
+    return changed
+
+
+class EmissionsStore:
+    def __init__(self, root=STORE_DIR, compact_threshold=STORE_COMPACT_THRESHOLD, segment_rows=STORE_SEGMENT_ROWS, purge_threshold=STORE_PURGE_TOMBSTONES):
+        """
+        Open (or create) an emissions store.
+
+        Args:
+            root (str): Directory holding the store files
+            compact_threshold (int): Logged writes kept before compaction
+            segment_rows (int): Appends this large are written as a segment
+            purge_threshold (int): Tombstones that trigger a background
+                rewrite of the affected segments
+        """
+        self.root = root
+        self.segments_dir = os.path.join(root, "segments")
+        self.compact_threshold = compact_threshold
+        self.segment_rows = segment_rows
+        self.purge_threshold = purge_threshold
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_shared = False
+        self._events = []
+        self._purge_lock = threading.Lock()
+        self._purge_thread = None
+        self._listeners = []
+        # Live log rows (id -> log record number) and ids deleted or replaced
+        # by the log (id -> log record number of the delete/update)
+        self._wal_rows = {}
+        self._wal_kills = {}
+        # Id index over the segments: sorted ids with segment ordinal and row
+        self._segment_ids = {}
+        self._index_ids = np.empty(0, dtype="int64")
+        self._index_segments = np.empty(0, dtype="int64")
+        self._index_rows = np.empty(0, dtype="int64")
+        self._tombstones = {}
+        self._manifest = None
+        self._disk_state = None
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self._lock_file = open(os.path.join(root, LOCK_NAME), "a")
+        with self._locked():
+            self._cleanup_orphans()
+            if "next_id" not in self._manifest:
+                self._assign_legacy_ids()
+
+    # ------------------------------------------------------------------
+    # Locking and other processes' writes
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _locked(self, shared=False):
+        """
+        Hold the store: the thread lock plus the advisory file lock, with the
+        in-memory state brought up to date with the files first.
+
+        Re-entrant. Write notifications queued while the lock is held are
+        delivered after it is released, so listeners may call back into the
+        store from other threads without deadlocking.
+        """
+        events = []
+        with self._lock:
+            if self._lock_depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                self._lock_shared = shared
+                try:
+                    self._sync(exclusive=not shared)
+                except BaseException:
+                    self._unlock_file()
+                    raise
+            elif self._lock_shared and not shared:
+                raise RuntimeError("Cannot write while holding the store for reading")
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    self._disk_state = self._disk_signature()
+                    self._unlock_file()
+                    events, self._events = self._events, []
+        for event in events:
+            self._deliver(*event)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _disk_signature(self):
+        """Identity of the committed state: the manifest file and the log size."""
+        try:
+            manifest = os.stat(self._manifest_path())
+        except FileNotFoundError:
+            return None
+        wal_path = self._wal_path() if self._manifest else None
+        wal_size = os.path.getsize(wal_path) if wal_path and os.path.exists(wal_path) else 0
+        return (manifest.st_ino, manifest.st_mtime_ns, manifest.st_size, wal_size)
+
+    def _sync(self, exclusive):
+        """Reload the manifest and log if another process wrote since we last looked."""
+        if self._manifest is not None and self._disk_signature() == self._disk_state:
+            return
+        self._manifest = self._read_manifest()
+        self._wal_rows = {}
+        self._wal_kills = {}
+        self._wal_records, max_wal_id = self._recover_wal(truncate=exclusive)
+        self._next_id = max(self._manifest.get("next_id", 1), max_wal_id + 1)
+        self._refresh_index()
+        self._disk_state = self._disk_signature()
+
+    def refresh(self):
+        """
+        Pick up writes committed by other processes.
+
+        Returns:
+            int: Current dataset version
+        """
+        with self._locked(shared=True):
+            return self.version
+
+    # ------------------------------------------------------------------
+    # Manifest and recovery
+    # ------------------------------------------------------------------
+    def _manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def _wal_path(self):
+        return os.path.join(self.root, self._manifest["wal"])
+
+    def _read_manifest(self):
+        """Load the manifest, creating a fresh one for a new store."""
+        path = self._manifest_path()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f)
+        manifest = {
+            "format": 1,
+            "generation": 0,
+            "version": 0,
+            "segments": [],
+            "wal": "wal-000000.jsonl",
+            "migrated": False,
+            "next_id": 1
+        }
+        _fsync_write(path, json.dumps(manifest, indent=2))
+        return manifest
+
+    def _write_manifest(self, manifest):
+        _fsync_write(self._manifest_path(), json.dumps(manifest, indent=2))
+        self._manifest = manifest
+
+    def _recover_wal(self, truncate=True):
+        """
+        Count the intact records of the active log, index the ids they add,
+        delete or replace, and find the largest record id they contain.
+
+        A torn final line (a crash mid-append) is truncated away so later
+        appends start on a clean line; readers (truncate=False) only skip it.
+        """
+        path = self._wal_path()
+        if not os.path.exists(path):
+            return 0, 0
+        records = 0
+        max_id = 0
+        good_offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                records += 1
+                if record["op"] == "delete":
+                    self._track_delete(record["ids"], records)
+                else:
+                    ids = [row[ID_COLUMN] for row in record.get("rows") or [] if row.get(ID_COLUMN) is not None]
+                    max_id = max([max_id] + ids)
+                    self._track_rows(ids, records, replaces=record["op"] == "update")
+                good_offset += len(line)
+        if truncate and good_offset != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+        return records, max_id
+
+    def _assign_legacy_ids(self):
+        """Give records written before record ids existed their ids (runs once)."""
+        if self.is_empty():
+            manifest = dict(self._manifest)
+            manifest["next_id"] = self._next_id
+            self._write_manifest(manifest)
+        else:
+            self.rewrite(self.load())
+
+    def _track_rows(self, ids, seq, replaces=False):
+        """Index rows written by log record seq (an update replaces older rows)."""
+        for record_id in ids:
+            record_id = int(record_id)
+            if replaces:
+                self._wal_kills[record_id] = seq
+            self._wal_rows[record_id] = seq
+
+    def _track_delete(self, ids, seq):
+        for record_id in ids:
+            record_id = int(record_id)
+            self._wal_kills[record_id] = seq
+            self._wal_rows.pop(record_id, None)
+
+    def _refresh_index(self):
+        """Rebuild the segment id index after the set of segments changed."""
+        segments = [segment["file"] for segment in self._manifest["segments"]]
+        segment_ids = {}
+        for name in segments:
+            ids = self._segment_ids.get(name)
+            if ids is None:
+                path = os.path.join(self.segments_dir, name)
+                if ID_COLUMN in pq.read_schema(path).names:
+                    ids = pd.read_parquet(path, columns=[ID_COLUMN])[ID_COLUMN].to_numpy(dtype="int64", na_value=-1)
+                else:
+                    ids = np.empty(0, dtype="int64")
+            segment_ids[name] = ids
+        self._segment_ids = segment_ids
+        if segments:
+            all_ids = np.concatenate([segment_ids[name] for name in segments])
+            ordinals = np.concatenate([np.full(len(segment_ids[name]), i) for i, name in enumerate(segments)])
+            rows = np.concatenate([np.arange(len(segment_ids[name])) for name in segments])
+        else:
+            all_ids = ordinals = rows = np.empty(0, dtype="int64")
+        order = np.argsort(all_ids, kind="stable")
+        self._index_ids = all_ids[order]
+        self._index_segments = ordinals[order]
+        self._index_rows = rows[order]
+        self._tombstones = {name: set(ids) for name, ids in self._manifest.get("tombstones", {}).items()}
+
+    def _assign_ids(self, rows, keep_existing=False):
+        """
+        Set record ids on rows, drawing new ids from the store counter.
+
+        Args:
+            rows (pandas.DataFrame): Typed records
+            keep_existing (bool): Only fill rows without an id
+
+        Returns:
+            pandas.DataFrame: Rows with a record_id column
+        """
+        rows = rows.copy(deep=False)
+        if keep_existing and ID_COLUMN in rows.columns:
+            missing = rows[ID_COLUMN].isna().to_numpy()
+        else:
+            missing = np.ones(len(rows), dtype=bool)
+        ids = rows[ID_COLUMN].to_numpy(dtype="float64", na_value=np.nan) if ID_COLUMN in rows.columns else np.full(len(rows), np.nan)
+        count = int(missing.sum())
+        ids[missing] = np.arange(self._next_id, self._next_id + count)
+        self._next_id += count
+        if len(ids) and not missing.all():
+            self._next_id = max(self._next_id, int(np.nanmax(ids)) + 1)
+        rows[ID_COLUMN] = pd.array(ids.astype("int64"), dtype=ID_DTYPE)
+        return coerce_emissions_frame(rows)
+
+    def _cleanup_orphans(self):
+        """Remove segments and logs left behind by an interrupted compaction."""
+        live_segments = {segment["file"] for segment in self._manifest["segments"]}
+        for name in os.listdir(self.segments_dir):
+            if name not in live_segments:
+                os.remove(os.path.join(self.segments_dir, name))
+        for name in os.listdir(self.root):
+            if name.startswith("wal-") and name != self._manifest["wal"]:
+                os.remove(os.path.join(self.root, name))
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    @property
+    def version(self):
+        """Monotonically increasing dataset version, bumped by every write."""
+        return self._manifest["version"] + self._wal_records
+
+    def is_empty(self):
+        """Return True if the store holds no segments and no logged writes."""
+        return not self._manifest["segments"] and self._wal_records == 0
+
+    def _read_wal_frames(self):
+        """Return the live rows of the log (later deletes and updates applied)."""
+        path = self._wal_path()
+        frames = []
+        seqs = []
+        if not os.path.exists(path):
+            return frames
+        with open(path, "r") as f:
+            for seq, line in enumerate(f, start=1):
+                if seq > self._wal_records:
+                    break
+                record = json.loads(line)
+                if record["op"] in ("append", "update") and record["rows"]:
+                    frames.append(pd.DataFrame(record["rows"]))
+                    seqs.append(np.full(len(record["rows"]), seq))
+        if not frames:
+            return frames
+        rows = concat_emissions_frames(frames)
+        if self._wal_kills and ID_COLUMN in rows.columns:
+            # A row is dead if a delete or update of its id was logged after it
+            killed_at = rows[ID_COLUMN].map(self._wal_kills).to_numpy(dtype="float64", na_value=np.nan)
+            rows = rows[~(np.concatenate(seqs) < killed_at)]
+        return [rows]
+
+    def load(self):
+        """
+        Load the full dataset.
+
+        Returns:
+            pandas.DataFrame: All live emission records, oldest first
+            (updated records move to the end)
+        """
+        with self._locked(shared=True):
+            killed = set(self._wal_kills)
+            frames = []
+            for segment in self._manifest["segments"]:
+                frame = pd.read_parquet(os.path.join(self.segments_dir, segment["file"]))
+                # Segment rows are stale if tombstoned there or deleted/updated in the log
+                dead = self._tombstones.get(segment["file"], set()) | killed
+                if dead and ID_COLUMN in frame.columns:
+                    frame = frame[~frame[ID_COLUMN].isin(np.fromiter(dead, dtype="int64")).to_numpy(dtype=bool, na_value=False)]
+                frames.append(frame)
+            frames.extend(self._read_wal_frames())
+        return concat_emissions_frames(frames)
+
+    def snapshot(self):
+        """
+        Load the full dataset together with the version it reflects.
+
+        Returns:
+            tuple: (dataset version, pandas.DataFrame of all live records)
+        """
+        with self._locked(shared=True):
+            return self.version, self.load()
+
+    def locate(self, record_ids):
+        """
+        Find where live records are stored.
+
+        Args:
+            record_ids (iterable): Record ids
+
+        Returns:
+            dict: record id -> ("wal", log record number) or (segment file,
+            row number) for every id that refers to a live record
+        """
+        ids = np.asarray(list(record_ids), dtype="int64")
+        locations = {}
+        with self._locked(shared=True):
+            segments = self._manifest["segments"]
+            left = np.searchsorted(self._index_ids, ids, side="left")
+            right = np.searchsorted(self._index_ids, ids, side="right")
+            for record_id, start, stop in zip(ids.tolist(), left.tolist(), right.tolist()):
+                if record_id in self._wal_rows:
+                    locations[record_id] = ("wal", self._wal_rows[record_id])
+                    continue
+                if record_id in self._wal_kills:
+                    continue
+                # An updated record has older, tombstoned copies in earlier segments
+                for position in range(start, stop):
+                    name = segments[self._index_segments[position]]["file"]
+                    if record_id not in self._tombstones.get(name, ()):
+                        locations[record_id] = (name, int(self._index_rows[position]))
+        return locations
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def subscribe(self, callback):
+        """
+        Register a callback invoked after every committed write.
+
+        Args:
+            callback (callable): Called as callback(op, version, rows) where op
+                is "append" or "rewrite" and rows is the typed frame
+                that was appended or the complete rewritten dataset
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a callback registered with subscribe()."""
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, op, version, rows):
+        """Queue a notification, delivered once the store lock is released."""
+        self._events.append((op, version, rows))
+
+    def _deliver(self, op, version, rows):
+        for callback in list(self._listeners):
+            callback(op, version, rows)
+
+    def append(self, rows):
+        """
+        Append emission records to the log.
+
+        Large batches (segment_rows or more) skip the log: they are written
+        together with any logged rows as a new segment in one commit.
+
+        Args:
+            rows (pandas.DataFrame or list): Records to append
+
+        Returns:
+            int: New dataset version
+        """
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(list(rows))
+        if len(rows) == 0:
+            return self.version
+        rows = coerce_emissions_frame(rows)
+        if len(rows) >= self.segment_rows:
+            return self._append_segment(rows)
+        with self._locked():
+            rows = self._assign_ids(rows)
+            version = self._write_log("append", "rows", _rows_json(rows))
+            self._track_rows(rows[ID_COLUMN].to_numpy(dtype="int64"), self._wal_records)
+            if self._wal_records >= self.compact_threshold:
+                self.compact()
+            self._notify("append", version, rows)
+            return version
+
+    def _write_log(self, op, field, payload_json):
+        """Append one durable record to the log and return the new version."""
+        version = self.version + 1
+        line = f'{{"v": {version}, "op": "{op}", "{field}": {payload_json}}}\n'
+        with open(self._wal_path(), "a") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._wal_records += 1
+        return version
+
+    def delete(self, record_ids):
+        """
+        Delete records by record id.
+
+        Costs one log record regardless of the dataset size; the rows are
+        tombstoned and dropped from disk later by compaction.
+
+        Args:
+            record_ids (iterable): Ids of the records to delete
+
+        Returns:
+            int: Number of records deleted (unknown or already deleted ids
+            are ignored)
+        """
+        with self._locked():
+            live = sorted(self.locate(record_ids))
+            if not live:
+                return 0
+            version = self._write_log("delete", "ids", json.dumps(live))
+            self._track_delete(live, self._wal_records)
+            if self._wal_records >= self.compact_threshold:
+                self.compact()
+            self._notify("delete", version, pd.DataFrame({ID_COLUMN: pd.array(live, dtype=ID_DTYPE)}))
+            return len(live)
+
+    def update(self, rows, expected_version=None):
+        """
+        Replace records, matched by record id, with new values.
+
+        Large batches (segment_rows or more) skip the log: the new rows are
+        written as a segment and the old rows tombstoned in one commit.
+
+        Args:
+            rows (pandas.DataFrame): Complete new records including record_id
+            expected_version (int, optional): Only update if the dataset is
+                still at this version (compare-and-swap)
+
+        Returns:
+            int: Number of records updated (rows whose id is not a live record
+            are ignored)
+
+        Raises:
+            StoreConflictError: If expected_version is given and another
+                write came first
+        """
+        rows = coerce_emissions_frame(rows)
+        if ID_COLUMN not in rows.columns or len(rows) == 0:
+            return 0
+        rows = rows[rows[ID_COLUMN].notna().to_numpy()].drop_duplicates(ID_COLUMN, keep="last")
+        with self._locked():
+            if expected_version is not None and self.version != expected_version:
+                raise StoreConflictError(f"Dataset is at version {self.version}, expected {expected_version}")
+            live = self.locate(rows[ID_COLUMN].to_numpy(dtype="int64"))
+            rows = rows[rows[ID_COLUMN].isin(list(live)).to_numpy(dtype=bool)].reset_index(drop=True)
+            if len(rows) == 0:
+                return 0
+            if len(rows) >= self.segment_rows:
+                self._update_segment(rows, live)
+                return len(rows)
+            version = self._write_log("update", "rows", _rows_json(rows))
+            self._track_rows(rows[ID_COLUMN].to_numpy(dtype="int64"), self._wal_records, replaces=True)
+            if self._wal_records >= self.compact_threshold:
+                self.compact()
+            self._notify("update", version, rows)
+            return len(rows)
+
+    def _append_segment(self, rows):
+        with self._locked():
+            rows = self._assign_ids(rows)
+            frames, tombstones = self._fold_wal()
+            segment = self._write_segment(concat_emissions_frames(frames + [rows]), self._manifest["generation"] + 1)
+            self._commit(self._manifest["segments"] + [segment], [], tombstones=tombstones)
+            self._notify("append", self.version, rows)
+            self._schedule_purge()
+            return self.version
+
+    def _update_segment(self, rows, locations):
+        """Commit updated rows as a segment, tombstoning the rows they replace."""
+        frames, tombstones = self._fold_wal()
+        ids = rows[ID_COLUMN].to_numpy(dtype="int64")
+        # Replaced log rows are dropped from the fold, replaced segment rows
+        # are tombstoned in their segment
+        frames = [frame[~frame[ID_COLUMN].isin(ids).to_numpy(dtype=bool, na_value=False)] for frame in frames]
+        for record_id, (name, _) in locations.items():
+            if name != "wal":
+                tombstones.setdefault(name, set()).add(record_id)
+        segment = self._write_segment(concat_emissions_frames(frames + [rows]), self._manifest["generation"] + 1)
+        self._commit(self._manifest["segments"] + [segment], [], tombstones=tombstones)
+        self._notify("update", self.version, rows)
+        self._schedule_purge()
+
+    def _write_segment(self, df, generation):
+        name = f"seg-{generation:06d}.parquet"
+        path = os.path.join(self.segments_dir, name)
+        tmp_path = f"{path}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return {"file": name, "rows": len(df)}
+
+    def _commit(self, segments, retired_segments, bump_version=True, tombstones=None, reset_wal=True):
+        """
+        Publish a new manifest, then drop retired files.
+
+        Args:
+            segments (list): Segments of the new state
+            retired_segments (list): Segments no longer referenced
+            bump_version (bool): Whether the visible dataset changed
+            tombstones (dict, optional): Segment file -> tombstoned ids,
+                defaults to the current tombstones
+            reset_wal (bool): Start a new, empty log (the old log must have
+                been folded into the segments)
+        """
+        generation = self._manifest["generation"] + 1
+        old_wal = self._wal_path()
+        live_files = {segment["file"] for segment in segments}
+        tombstones = self._manifest.get("tombstones", {}) if tombstones is None else tombstones
+        manifest = dict(self._manifest)
+        manifest.update({
+            "generation": generation,
+            "version": (self.version if reset_wal else self._manifest["version"]) + (1 if bump_version else 0),
+            "segments": segments,
+            "next_id": self._next_id,
+            "tombstones": {
+                name: sorted(int(record_id) for record_id in ids)
+                for name, ids in tombstones.items() if ids and name in live_files
+            }
+        })
+        if reset_wal:
+            manifest["wal"] = f"wal-{generation:06d}.jsonl"
+        self._write_manifest(manifest)
+        if reset_wal:
+            self._wal_records = 0
+            self._wal_rows = {}
+            self._wal_kills = {}
+            if os.path.exists(old_wal):
+                os.remove(old_wal)
+        for segment in retired_segments:
+            segment_path = os.path.join(self.segments_dir, segment["file"])
+            if os.path.exists(segment_path):
+                os.remove(segment_path)
+        self._refresh_index()
+
+    def _fold_wal(self):
+        """
+        Prepare folding the log into the segments.
+
+        Returns:
+            tuple: (live log rows as a list of frames, segment file ->
+            tombstoned ids including the deletes and updates of the log)
+        """
+        frames = self._read_wal_frames()
+        segments = self._manifest["segments"]
+        tombstones = {name: set(ids) for name, ids in self._tombstones.items()}
+        killed = np.fromiter(self._wal_kills, dtype="int64")
+        left = np.searchsorted(self._index_ids, killed, side="left")
+        right = np.searchsorted(self._index_ids, killed, side="right")
+        for record_id, start, stop in zip(killed.tolist(), left.tolist(), right.tolist()):
+            for position in range(start, stop):
+                name = segments[self._index_segments[position]]["file"]
+                tombstones.setdefault(name, set()).add(record_id)
+        return frames, tombstones
+
+    def compact(self):
+        """Fold the active log into a new Parquet segment."""
+        with self._locked():
+            if self._wal_records == 0:
+                return
+            frames, tombstones = self._fold_wal()
+            segments = list(self._manifest["segments"])
+            if frames:
+                segments.append(self._write_segment(concat_emissions_frames(frames), self._manifest["generation"] + 1))
+            self._commit(segments, [], bump_version=False, tombstones=tombstones)
+            self._schedule_purge()
+
+    def _schedule_purge(self):
+        """Start a background purge once enough tombstones have accumulated."""
+        pending = sum(len(ids) for ids in self._manifest.get("tombstones", {}).values())
+        if pending < self.purge_threshold:
+            return
+        if self._purge_thread is not None and self._purge_thread.is_alive():
+            return
+        self._purge_thread = threading.Thread(target=self.purge_tombstones, name="store-purge", daemon=True)
+        self._purge_thread.start()
+
+    def purge_tombstones(self):
+        """
+        Rewrite segments that hold tombstoned records without those records.
+
+        Segments are read outside the store lock; each rewritten segment is
+        swapped in by its own commit, so writers are only blocked while one
+        segment is written.
+
+        Returns:
+            int: Number of records physically removed
+        """
+        removed = 0
+        with self._purge_lock:
+            with self._locked():
+                pending = list(self._manifest.get("tombstones", {}))
+            for name in pending:
+                try:
+                    frame = pd.read_parquet(os.path.join(self.segments_dir, name))
+                except FileNotFoundError:
+                    # Already purged by another process
+                    continue
+                with self._locked():
+                    segments = self._manifest["segments"]
+                    position = next((i for i, segment in enumerate(segments) if segment["file"] == name), None)
+                    ids = self._manifest.get("tombstones", {}).get(name)
+                    if position is None or not ids:
+                        continue
+                    keep = ~frame[ID_COLUMN].isin(ids).to_numpy(dtype=bool, na_value=False)
+                    new_segments = list(segments)
+                    if keep.any():
+                        new_segments[position] = self._write_segment(frame[keep], self._manifest["generation"] + 1)
+                    else:
+                        del new_segments[position]
+                    tombstones = dict(self._manifest["tombstones"])
+                    del tombstones[name]
+                    self._commit(new_segments, [segments[position]], bump_version=False, tombstones=tombstones, reset_wal=False)
+                    removed += int((~keep).sum())
+        return removed
+
+    def rewrite(self, df, expected_version=None):
+        """
+        Replace the whole dataset with df as a single segment.
+
+        Used for bulk edits; appends should use append() and edited session
+        copies merge(). Records keep their record_id; records without one get
+        a new id.
+
+        Args:
+            df (pandas.DataFrame): Complete dataset to persist
+            expected_version (int, optional): Only replace the dataset if it
+                is still at this version (compare-and-swap)
+
+        Returns:
+            int: New dataset version
+
+        Raises:
+            StoreConflictError: If expected_version is given and another
+                write came first
+        """
+        df = coerce_emissions_frame(df)
+        with self._locked():
+            if expected_version is not None and self.version != expected_version:
+                raise StoreConflictError(f"Dataset is at version {self.version}, expected {expected_version}")
+            df = self._assign_ids(df, keep_existing=True)
+            old_segments = self._manifest["segments"]
+            segments = []
+            if len(df) > 0:
+                segments.append(self._write_segment(df, self._manifest["generation"] + 1))
+            self._commit(segments, old_segments, tombstones={})
+            self._notify("rewrite", self.version, df)
+            return self.version
+
+    def merge(self, df, base):
+        """
+        Save an edited copy of the dataset without discarding other writes.
+
+        The copy is compared with the records it was taken from (three-way,
+        under the store lock): rows without a record_id are appended, rows the
+        copy changed are updated, and records the copy dropped are deleted.
+        Rows the copy did not change are left alone, so records written,
+        updated or deleted by others after the copy was taken keep those
+        writes; edits of records deleted meanwhile are counted as conflicts.
+        Only the differences are written, as at most one delete, one update
+        and one append.
+
+        Args:
+            df (pandas.DataFrame): Edited copy of the dataset
+            base (pandas.DataFrame): The records as they were when the copy
+                was taken, see DatasetCache.snapshot()
+
+        Returns:
+            MergeResult: Counts of the writes and the new dataset version
+        """
+        df = coerce_emissions_frame(df)
+        base = coerce_emissions_frame(base)
+        result = MergeResult()
+        with self._locked():
+            has_id = df[ID_COLUMN].notna().to_numpy()
+            new_rows = df[~has_id]
+            edited = df[has_id].drop_duplicates(ID_COLUMN, keep="last")
+            edited_ids = edited[ID_COLUMN].to_numpy(dtype="int64")
+            base_ids = base[ID_COLUMN].dropna().to_numpy(dtype="int64")
+            current_ids = np.fromiter(self.locate(np.union1d(base_ids, edited_ids)), dtype="int64")
+
+            removed = base_ids[~np.isin(base_ids, edited_ids) & np.isin(base_ids, current_ids)]
+            edited = edited[_changed(edited, base)]
+            live = np.isin(edited[ID_COLUMN].to_numpy(dtype="int64"), current_ids)
+            result.conflicts = int((~live).sum())
+            edited = edited[live]
+
+            if len(removed):
+                result.deleted = self.delete(removed.tolist())
+            if len(edited):
+                result.updated = self.update(edited)
+            if len(new_rows):
+                self.append(new_rows)
+                result.appended = len(new_rows)
+            result.version = self.version
+        return result
+
+    def mark_migrated(self):
+        with self._locked():
+            manifest = dict(self._manifest)
+            manifest["migrated"] = True
+            self._write_manifest(manifest)
+
+
+def migrate_json_store(store, json_path=EMISSIONS_FILE):
+    """
+    One-time migration of the legacy emissions.json file into the store.
+
+    The legacy file is left untouched; the manifest records that the
+    migration ran so it is never repeated. Runs under the store lock, so
+    processes opening the store together migrate it once.
+
+    Args:
+        store (EmissionsStore): Target store
+        json_path (str): Legacy JSON file
+
+    Returns:
+        int: Number of migrated records
+    """
+    with store._locked():
+        if store._manifest.get("migrated"):
+            return 0
+        migrated = 0
+        if store.is_empty() and os.path.exists(json_path):
+            with open(json_path, "r") as f:
+                raw = f.read().strip()
+            try:
+                records = json.loads(raw) if raw else []
+            except json.JSONDecodeError:
+                backup_file = os.path.join(os.path.dirname(json_path), f"emissions_backup_{int(time.time())}.json")
+                _fsync_copy(json_path, backup_file)
+                print(f"Corrupted emissions data file found. A backup has been created at {backup_file}")
+                records = []
+            if records:
+                store.rewrite(pd.DataFrame(records))
+                migrated = len(records)
+        store.mark_migrated()
+        return migrated
+
+
+# A store stays registered while anything (a tenant, a session) uses it
+_stores = weakref.WeakValueDictionary()
+_stores_lock = threading.Lock()
+
+
+def get_store(root=STORE_DIR, legacy_json=EMISSIONS_FILE):
+    """
+    Return the process-wide store for root, opening and migrating it once.
+
+    Every user of a store directory in this process shares one instance, so
+    its lock and change listeners see all writes.
+
+    Args:
+        root (str): Store directory
+        legacy_json (str, optional): Legacy emissions.json to migrate from
+
+    Returns:
+        EmissionsStore: Shared store instance
+    """
+    key = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = EmissionsStore(root)
+            if legacy_json:
+                migrate_json_store(store, legacy_json)
+            _stores[key] = store
+        return store
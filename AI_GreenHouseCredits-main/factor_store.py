@@ -0,0 +1,404 @@
+"""
+Versioned emission-factor store for YourCarbonFootprint application.
+Keeps every published version of every factor with its source, region and
+validity period, so each row is calculated with the factor that applied on
+its date. The built-in EMISSION_FACTORS are the undated, region-independent
+baseline; CSV files in FACTORS_DIR add dated versions on top, e.g.
+
+    category,activity,factor,unit,source,region,valid_from,valid_to
+    Electricity,India Grid,0.716,kWh,CEA v19,India,2023-04-01,2024-04-01
+
+valid_from is inclusive and valid_to exclusive; either may be left empty
+(open-ended). A version replaces the previous one of its key from its
+valid_from on, and after its valid_to the key has no factor until the next
+version starts. region is matched against the row's country, and rows fall back
+to the factors without a region. Files are read in name order, and a later
+file's version replaces an earlier one with the same key and valid_from.
+
+Lookups are an as-of join in the style of pandas.merge_asof(by=key): versions
+are sorted once by (key, valid_from), and every row is placed among them by a
+single binary search on a combined (key, day) integer.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from config import FACTORS_DIR
+from emission_factors import EMISSION_FACTORS
+from units import get_unit_registry
+
+# Columns of the factor versions table
+VERSION_COLUMNS = ["category", "activity", "region", "factor", "unit", "source", "valid_from", "valid_to"]
+
+# Columns every factor file must provide
+REQUIRED_FACTOR_COLUMNS = ["category", "activity", "factor", "unit"]
+
+BUILTIN_SOURCE = "built-in"
+
+# Days since the epoch, offset into 32 bits so that (key, day) packs into one
+# int64; open validity bounds map to the ends of the range
+_DAY_OFFSET = 2 ** 31
+_MIN_DAY = -(2 ** 31)
+_MAX_DAY = 2 ** 31 - 1
+
+
+def _days(values, missing):
+    """Dates as int64 days since the epoch, missing dates as missing."""
+    dates = pd.to_datetime(pd.Series(np.asarray(values)), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    days = dates.astype("datetime64[D]").astype("int64")
+    days[np.isnat(dates)] = missing
+    return days
+
+
+def _intern(values, labels):
+    """
+    Map values to their codes in labels.
+
+    Each distinct value is looked up once, however many rows carry it.
+
+    Args:
+        values: Array-like or Series of labels
+        labels (pandas.Index): Interned labels
+
+    Returns:
+        numpy.ndarray: int64 codes; -1 for labels not in labels, -2 for
+        missing values
+    """
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        categorical = values.array
+    else:
+        categorical = pd.Categorical(np.asarray(values, dtype=object))
+    categories = categorical.categories
+    mapping = labels.get_indexer(categories.astype(object)) if len(categories) else np.empty(0, dtype="int64")
+    # Categorical code -1 (missing value) picks the trailing -2
+    mapping = np.append(mapping.astype("int64"), -2)
+    return mapping[np.asarray(categorical.codes)]
+
+
+def _labels(series):
+    """Factor file labels as stripped strings, missing as ""."""
+    return series.fillna("").astype(str).str.strip()
+
+
+def builtin_versions():
+    """
+    The built-in factors as an undated versions table.
+
+    Returns:
+        pandas.DataFrame: One version per built-in (category, activity)
+    """
+    records = [
+        {
+            "category": category,
+            "activity": activity,
+            "region": "",
+            "factor": float(entry["factor"]),
+            "unit": entry["unit"],
+            "source": BUILTIN_SOURCE,
+            "valid_from": pd.NaT,
+            "valid_to": pd.NaT
+        }
+        for category, entries in EMISSION_FACTORS.items()
+        for activity, entry in entries.items()
+    ]
+    return pd.DataFrame(records, columns=VERSION_COLUMNS)
+
+
+def read_factor_file(path):
+    """
+    Read one factor file.
+
+    Args:
+        path (str): CSV file with at least the REQUIRED_FACTOR_COLUMNS
+
+    Returns:
+        pandas.DataFrame: Versions table; source defaults to the file name
+
+    Raises:
+        ValueError: If columns are missing or values are invalid
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    missing = [column for column in REQUIRED_FACTOR_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    versions = pd.DataFrame({
+        "category": _labels(df["category"]),
+        "activity": _labels(df["activity"]),
+        "region": _labels(df["region"]) if "region" in df.columns else "",
+        "factor": pd.to_numeric(df["factor"].str.strip(), errors="coerce"),
+        "unit": _labels(df["unit"]),
+        "source": _labels(df["source"]) if "source" in df.columns else os.path.splitext(os.path.basename(path))[0],
+        "valid_from": pd.to_datetime(df["valid_from"].str.strip(), errors="coerce") if "valid_from" in df.columns else pd.NaT,
+        "valid_to": pd.to_datetime(df["valid_to"].str.strip(), errors="coerce") if "valid_to" in df.columns else pd.NaT
+    }, columns=VERSION_COLUMNS)
+
+    bad_rows = np.flatnonzero(versions["factor"].isna().to_numpy())
+    if len(bad_rows) > 0:
+        raise ValueError(f"Non-numeric factor in {len(bad_rows)} rows (first at row {int(bad_rows[0]) + 2})")
+    for column in ["valid_from", "valid_to"]:
+        if column in df.columns:
+            bad_rows = np.flatnonzero((versions[column].isna() & (df[column].str.strip() != "")).to_numpy())
+            if len(bad_rows) > 0:
+                raise ValueError(f"Invalid {column} in {len(bad_rows)} rows (first at row {int(bad_rows[0]) + 2})")
+    return versions
+
+
+def _factor_files(directory):
+    """(name, mtime, size) of the factor files in directory, in name order."""
+    if not os.path.isdir(directory):
+        return ()
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.lower().endswith(".csv"):
+            stat = entry.stat()
+            files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(files))
+
+
+def load_factor_versions(directory=FACTORS_DIR):
+    """
+    Load the built-in factors and every factor file of a directory.
+
+    Files that cannot be read are reported and skipped.
+
+    Args:
+        directory (str): Directory of factor CSV files
+
+    Returns:
+        pandas.DataFrame: Versions table, built-in versions first
+    """
+    frames = [builtin_versions()]
+    for name, _, _ in _factor_files(directory):
+        try:
+            frames.append(read_factor_file(os.path.join(directory, name)))
+        except (OSError, ValueError, pd.errors.ParserError) as e:
+            print(f"Error loading emission factors from {name}: {str(e)}")
+    return pd.concat(frames, ignore_index=True)
+
+
+@dataclass
+class FactorLookup:
+    """
+    Result of a factor lookup, one entry per row.
+
+    factors are per unit of units (the factor's unit); quantities in the
+    row's unit are multiplied by conversions to express them in that unit.
+    """
+    factors: np.ndarray
+    versions: np.ndarray
+    unresolved: np.ndarray
+    units: np.ndarray
+    conversions: np.ndarray
+
+
+class FactorStore:
+    def __init__(self, versions, signature=None):
+        """
+        Index a versions table for as-of lookups.
+
+        Args:
+            versions (pandas.DataFrame): Factor versions with VERSION_COLUMNS
+            signature (optional): Identifies the files the table was loaded
+                from, so callers can tell when it is out of date
+        """
+        self.versions = versions[VERSION_COLUMNS].reset_index(drop=True)
+        self.signature = signature
+
+        self.categories = pd.Index(self.versions["category"].unique(), dtype=object)
+        self.activities = pd.Index(self.versions["activity"].unique(), dtype=object)
+        self.regions = pd.Index(pd.unique(np.append(self.versions["region"].to_numpy(dtype=object), "")), dtype=object)
+        self._global_region = self.regions.get_loc("")
+
+        keys = self._combine(
+            self.categories.get_indexer(self.versions["category"]),
+            self.activities.get_indexer(self.versions["activity"]),
+            self.regions.get_indexer(self.versions["region"])
+        )
+        from_days = _days(self.versions["valid_from"], _MIN_DAY)
+
+        # Sort by (key, valid_from, file order) and keep the last of every
+        # (key, valid_from), so later files replace earlier versions
+        order = np.lexsort((np.arange(len(keys)), from_days, keys))
+        keys = keys[order]
+        from_days = from_days[order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (keys[1:] != keys[:-1]) | (from_days[1:] != from_days[:-1])
+        order = order[last]
+
+        # Keys are renumbered densely so (key, day) fits into one int64
+        self._keys, dense_keys = np.unique(keys[last], return_inverse=True)
+        self._slot_keys = dense_keys.astype("int64")
+        self._slots = (self._slot_keys << 32) | (from_days[last] + _DAY_OFFSET)
+        self._slot_versions = order
+        self._slot_to_days = _days(self.versions["valid_to"], _MAX_DAY)[order]
+        self._slot_factors = self.versions["factor"].to_numpy(dtype="float64")[order]
+        self._slot_units = self.versions["unit"].to_numpy(dtype=object)[order]
+        self._slot_unit_codes = get_unit_registry().codes(self._slot_units)
+
+    def _combine(self, category_codes, activity_codes, region_codes):
+        """Single integer key of (category, activity, region) codes."""
+        return (category_codes.astype("int64") * len(self.activities) + activity_codes) * len(self.regions) + region_codes
+
+    def _dense_keys(self, category_codes, activity_codes, region_codes):
+        """Dense key of every row, -1 where no version has the key."""
+        known = (category_codes >= 0) & (activity_codes >= 0) & (region_codes >= 0)
+        keys = self._combine(category_codes, activity_codes, region_codes)
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(known & (self._keys[positions] == keys), positions, -1)
+
+    def _as_of(self, dense_keys, days):
+        """Slot of the version of every row's key in force on its day, -1 if none."""
+        targets = (dense_keys << 32) | (days + _DAY_OFFSET)
+        slots = np.maximum(np.searchsorted(self._slots, targets, side="right") - 1, 0)
+        # The slot must be a version of the same key that starts on or before
+        # the day (not the last slot of the previous key) and has not expired
+        found = (dense_keys >= 0) & (self._slot_keys[slots] == dense_keys) & (self._slots[slots] <= targets) & (days < self._slot_to_days[slots])
+        return np.where(found, slots, -1)
+
+    def lookup(self, categories, activities, dates, regions=None, units=None):
+        """
+        Find the factor in force for every row.
+
+        Args:
+            categories: Array-like or Series of emission categories
+            activities: Array-like or Series of activities
+            dates: Array-like or Series of row dates; rows without a date get
+                the factors in force today
+            regions (optional): Array-like or Series of row regions (countries);
+                rows without a regional factor use the factors without region
+            units (optional): Array-like or Series of quantity units; a row
+                whose unit cannot be converted to its factor's unit (another
+                dimension, or an unknown unit other than the factor's) is
+                unresolved. Missing units are taken to be the factor's unit
+
+        Returns:
+            FactorLookup: factors (NaN where unresolved), versions (positions
+            in self.versions, -1 where unresolved), the unresolved mask, the
+            factor units and the quantity conversions (1 without units)
+        """
+        category_codes = _intern(categories, self.categories)
+        activity_codes = _intern(activities, self.activities)
+        days = _days(dates, np.datetime64("today", "D").astype("int64"))
+
+        global_codes = np.full(len(category_codes), self._global_region, dtype="int64")
+        slots = np.full(len(category_codes), -1, dtype="int64")
+        if regions is not None:
+            region_codes = _intern(regions, self.regions)
+            regional = np.flatnonzero((region_codes >= 0) & (region_codes != self._global_region))
+            if len(regional):
+                slots[regional] = self._as_of(
+                    self._dense_keys(category_codes[regional], activity_codes[regional], region_codes[regional]),
+                    days[regional]
+                )
+        fallback = np.flatnonzero(slots < 0)
+        if len(fallback):
+            slots[fallback] = self._as_of(
+                self._dense_keys(category_codes[fallback], activity_codes[fallback], global_codes[fallback]),
+                days[fallback]
+            )
+
+        unresolved = slots < 0
+        found = np.maximum(slots, 0)
+        conversions = np.ones(len(slots))
+        if units is not None:
+            registry = get_unit_registry()
+            conversions = registry.ratios_by_code(registry.codes(units), self._slot_unit_codes[found])
+            # Missing units and unknown units equal to the factor's unit
+            unconverted = np.flatnonzero(np.isnan(conversions) & ~unresolved)
+            if len(unconverted):
+                row_units = np.asarray(units, dtype=object)[unconverted]
+                same = pd.isna(row_units) | (row_units == self._slot_units[found[unconverted]])
+                conversions[unconverted[same]] = 1.0
+            unresolved |= np.isnan(conversions)
+        slots[unresolved] = -1
+        return FactorLookup(
+            factors=np.where(unresolved, np.nan, self._slot_factors[found]),
+            versions=np.where(unresolved, -1, self._slot_versions[found]),
+            unresolved=unresolved,
+            units=np.where(unresolved, None, self._slot_units[found]),
+            conversions=np.where(unresolved, np.nan, conversions)
+        )
+
+    def is_known_factor(self, categories, activities, factors):
+        """
+        Check which rows carry a factor that some version of their
+        (category, activity) has or had, in any region.
+
+        Args:
+            categories: Array-like or Series of emission categories
+            activities: Array-like or Series of activities
+            factors: Array-like or Series of the rows' factors
+
+        Returns:
+            numpy.ndarray: Boolean mask
+        """
+        known = pd.MultiIndex.from_arrays([
+            self.categories.get_indexer(self.versions["category"]) * len(self.activities) + self.activities.get_indexer(self.versions["activity"]),
+            self.versions["factor"].to_numpy(dtype="float64")
+        ])
+        category_codes = _intern(categories, self.categories)
+        activity_codes = _intern(activities, self.activities)
+        keys = np.where((category_codes >= 0) & (activity_codes >= 0), category_codes * len(self.activities) + activity_codes, -1)
+        rows = pd.MultiIndex.from_arrays([keys, np.asarray(factors, dtype="float64")])
+        return rows.isin(known) & (keys >= 0)
+
+    def merge_factors(self, df, date_column="date", region_column="country"):
+        """
+        Attach the factor version in force to every row of an emissions frame.
+
+        Args:
+            df (pandas.DataFrame): Rows with category, activity, unit and date
+            date_column (str): Column with the row dates
+            region_column (str): Column matched against factor regions, ignored
+                if df does not have it
+
+        Returns:
+            pandas.DataFrame: Shallow copy of df with the columns factor,
+            factor_unit, factor_source, factor_region, factor_valid_from and
+            factor_valid_to (missing where unresolved)
+        """
+        result = self.lookup(
+            df["category"],
+            df["activity"],
+            df[date_column],
+            df[region_column] if region_column in df.columns else None,
+            df["unit"] if "unit" in df.columns else None
+        )
+        # The all-missing extra row answers the unresolved rows
+        versions = pd.concat([self.versions, pd.DataFrame([{}], columns=VERSION_COLUMNS)], ignore_index=True)
+        matched = versions.take(np.where(result.versions >= 0, result.versions, len(self.versions)))
+        merged = df.copy(deep=False)
+        merged["factor"] = result.factors
+        for column in ["unit", "source", "region", "valid_from", "valid_to"]:
+            merged[f"factor_{column}"] = matched[column].to_numpy()
+        return merged
+
+    def __len__(self):
+        return len(self._slots)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_factor_store(directory=FACTORS_DIR):
+    """
+    Return the process-wide factor store, reloaded when the factor files change.
+
+    Args:
+        directory (str): Directory of factor CSV files
+
+    Returns:
+        FactorStore: Shared store
+    """
+    global _store
+    with _store_lock:
+        signature = (directory, _factor_files(directory))
+        if _store is None or _store.signature != signature:
+            _store = FactorStore(load_factor_versions(directory), signature)
+        return _store
@@ -0,0 +1,171 @@
+"""
+Chart figure cache for YourCarbonFootprint application.
+Keeps finished Plotly figures as serialised JSON keyed on (dataset version,
+filter, chart kind, theme), so a rerun with unchanged data skips both the
+aggregation and the Plotly figure construction. A new dataset version gives new
+keys; figures of old versions are simply never hit again and age out of the
+least-recently-used order.
+"""
+
+import functools
+import json
+import threading
+from collections import OrderedDict
+
+from config import FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES
+
+
+def figure_key(version, filters, kind, theme):
+    """
+    Build the cache key for a chart.
+
+    Args:
+        version (int): Dataset version the chart is drawn from
+        filters: JSON-serialisable description of the data filter (date range,
+            scope, ...), None for the full dataset
+        kind (str): Chart kind, e.g. "scope_pie"
+        theme (str): Styling variant
+
+    Returns:
+        tuple: Hashable key
+    """
+    return (version, json.dumps(filters, sort_keys=True, default=str), kind, theme)
+
+
+class FigureCache:
+    def __init__(self, max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): Figures kept at most
+            max_bytes (int): Total size of the serialised figures kept at most
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a figure.
+
+        Args:
+            key (tuple): Key from figure_key()
+
+        Returns:
+            plotly.graph_objects.Figure or None: A fresh figure the caller may
+            modify, or None if not cached
+        """
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        import plotly.graph_objects as go
+
+        # The JSON was written by Plotly from a validated figure, so the
+        # (comparatively slow) property validation can be skipped
+        return go.Figure(json.loads(payload), _validate=False)
+
+    def put(self, key, fig):
+        """
+        Store a figure, evicting least recently used figures over the limits.
+
+        Args:
+            key (tuple): Key from figure_key()
+            fig (plotly.graph_objects.Figure): Figure to store
+        """
+        payload = fig.to_json()
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = payload
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get_or_build(self, version, filters, kind, theme, build):
+        """
+        Return a cached figure or build and cache it.
+
+        Args:
+            version (int): Dataset version, None disables caching
+            filters: Data filter description, see figure_key()
+            kind (str): Chart kind
+            theme (str): Styling variant
+            build (callable): Zero-argument callable returning the figure, or
+                None when there is nothing to draw (not cached)
+
+        Returns:
+            plotly.graph_objects.Figure or None: The figure
+        """
+        if version is None:
+            return build()
+        key = figure_key(version, filters, kind, theme)
+        fig = self.get(key)
+        if fig is None:
+            fig = build()
+            if fig is not None:
+                self.put(key, fig)
+        return fig
+
+    def clear(self):
+        """Remove every cached figure."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self):
+        """Total size of the cached serialised figures."""
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_figure_cache():
+    """
+    Return the process-wide figure cache, shared by all sessions.
+
+    Returns:
+        FigureCache: Shared cache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FigureCache()
+        return _cache
+
+
+def cached_figure(kind, theme="default"):
+    """
+    Decorate a chart builder method(self, data) so callers can pass the
+    dataset version and filter the data came from; the figure is then served
+    from the shared figure cache. Without a version the chart is built as usual.
+
+    Args:
+        kind (str): Chart kind used in the cache key
+        theme (str): Styling variant used in the cache key
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, data, version=None, filters=None):
+            return get_figure_cache().get_or_build(version, filters, kind, theme, lambda: method(self, data))
+        return wrapper
+    return decorator
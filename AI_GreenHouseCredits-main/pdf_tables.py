@@ -0,0 +1,321 @@
+"""
+PDF table rendering for YourCarbonFootprint application.
+Builds the emissions PDF report shared by ReportGenerator and DataHandler.
+
+Table cells are formatted per column (vectorised over a chunk of rows, with
+each distinct label fitted to its cell once) and drawn page by page with plain
+text and grid lines, which is far cheaper than one bordered pdf.cell per value.
+Detail rows can be placed inline, moved to an appendix or left out; every
+record is drawn unless a cap is asked for.
+
+fpdf2 keeps the whole document in memory until it is written, so pages cannot
+be streamed to the output file. Formatting PDF_FORMAT_CHUNK_ROWS rows at a
+time keeps the remaining cost to the page content, roughly 0.4 KB per record;
+the CSV export is the bounded alternative for very large ledgers.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+from fpdf import FPDF  # fpdf2 package
+
+from config import PDF_MAX_DETAIL_ROWS, PDF_FORMAT_CHUNK_ROWS
+
+DETAIL_MODES = ("inline", "appendix", "none")
+
+# Detail table layout: (header, column, width in mm, format)
+DETAIL_COLUMNS = [
+    ("Date", "date", 25, "date"),
+    ("Scope", "scope", 25, "text"),
+    ("Category", "category", 30, "text"),
+    ("Activity", "activity", 30, "text"),
+    ("Quantity", "quantity", 20, "{:.2f}"),
+    ("Unit", "unit", 15, "text"),
+    ("Factor", "emission_factor", 25, "{:.4f}"),
+    ("Emissions (kgCO2e)", "emissions_kgCO2e", 30, "{:.2f}")
+]
+
+FONT = "Helvetica"
+ROW_HEIGHT = 6
+TOP_MARGIN = 15
+BOTTOM_MARGIN = 15
+LEFT_MARGIN = 10
+CELL_PADDING = 1
+
+
+def _latin1(text):
+    """Core PDF fonts only cover latin-1; replace anything else."""
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+
+def _fit(pdf, text, width):
+    """Truncate text with an ellipsis so it fits a cell of the given width."""
+    text = _latin1(text)
+    available = width - 2 * CELL_PADDING
+    if pdf.get_string_width(text) <= available:
+        return text
+    while text and pdf.get_string_width(text + "...") > available:
+        text = text[:-1]
+    return text + "..."
+
+
+def format_column(pdf, series, width, fmt):
+    """
+    Format a whole column as cell strings.
+
+    Args:
+        pdf (FPDF): Document, with the table font already selected
+        series (pandas.Series): Column values
+        width (float): Cell width in mm
+        fmt (str): "date", "text" or a format string for numbers
+
+    Returns:
+        list: One string per value
+    """
+    if fmt == "date":
+        values = pd.to_datetime(series, errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    elif fmt == "text":
+        values = series.astype(object).where(series.notna(), "").astype(str)
+    else:
+        numbers = pd.to_numeric(series, errors="coerce")
+        values = numbers.map(lambda value: fmt.format(value) if pd.notna(value) else "")
+        # Numbers are nearly all distinct but no glyph in them is wider than
+        # a digit, so only strings longer than a cell's worth of digits need fitting
+        max_chars = int((width - 2 * CELL_PADDING) // pdf.get_string_width("0"))
+        values = values.tolist()
+        return [value if len(value) <= max_chars else _fit(pdf, value, width) for value in values]
+    # Fit each distinct value once; labels repeat heavily across rows
+    fitted = {value: _fit(pdf, value, width) for value in pd.unique(values)}
+    return [fitted[value] for value in values]
+
+
+def _slicer(columns):
+    """Serve rows start to stop of preformatted column lists."""
+    return lambda start, stop: [column[start:stop] for column in columns]
+
+
+def fit_widths(pdf, widths):
+    """Scale column widths down proportionally to the printable page width."""
+    total = sum(widths)
+    if total <= pdf.epw:
+        return list(widths)
+    return [width * pdf.epw / total for width in widths]
+
+
+def render_table(pdf, headers, widths, columns, font_size=8, progress=None, total_rows=None):
+    """
+    Draw a paginated table with a repeated header row.
+
+    Args:
+        pdf (FPDF): Document to draw into; the table starts at the current position
+        headers (list): Column headers
+        widths (list): Column widths in mm
+        columns (list or callable): Column arrays of preformatted strings
+            (equal lengths), or a callable columns(start, stop) returning them
+            for rows start to stop, which requires total_rows
+        font_size (int): Body font size
+        progress (callable, optional): Called as progress(rows_done, total_rows)
+            after each page
+        total_rows (int, optional): Number of rows when columns is a callable
+    """
+    if not callable(columns):
+        total_rows = len(columns[0]) if columns else 0
+        columns = _slicer(columns)
+    table_width = sum(widths)
+    x_positions = [LEFT_MARGIN]
+    for width in widths[:-1]:
+        x_positions.append(x_positions[-1] + width)
+    page_bottom = pdf.h - BOTTOM_MARGIN
+    auto_page_break = pdf.auto_page_break
+    pdf.set_auto_page_break(False)
+
+    def draw_header(y):
+        pdf.set_font(FONT, "B", font_size + 1)
+        for x, width, header in zip(x_positions, widths, headers):
+            pdf.text(x + CELL_PADDING, y + ROW_HEIGHT - 1.8, _fit(pdf, header, width))
+        pdf.set_font(FONT, "", font_size)
+        return y + ROW_HEIGHT
+
+    def draw_grid(top, bottom):
+        y = top
+        while y <= bottom + 0.01:
+            pdf.line(LEFT_MARGIN, y, LEFT_MARGIN + table_width, y)
+            y += ROW_HEIGHT
+        for x in x_positions + [LEFT_MARGIN + table_width]:
+            pdf.line(x, top, x, bottom)
+
+    row = 0
+    y = pdf.get_y()
+    if y + 2 * ROW_HEIGHT > page_bottom:
+        pdf.add_page()
+        y = TOP_MARGIN
+    while True:
+        top = y
+        y = draw_header(y)
+        rows_on_page = max(0, min(int((page_bottom - y) // ROW_HEIGHT), total_rows - row))
+        page_columns = columns(row, row + rows_on_page)
+        for i in range(rows_on_page):
+            baseline = y + ROW_HEIGHT - 1.8
+            for x, column in zip(x_positions, page_columns):
+                value = column[i]
+                if value:
+                    pdf.text(x + CELL_PADDING, baseline, value)
+            y += ROW_HEIGHT
+        draw_grid(top, y)
+        row += rows_on_page
+        if progress is not None:
+            progress(row, total_rows)
+        if row >= total_rows:
+            break
+        pdf.add_page()
+        y = TOP_MARGIN
+
+    pdf.set_auto_page_break(auto_page_break, margin=BOTTOM_MARGIN)
+    pdf.set_xy(LEFT_MARGIN, y + 2)
+
+
+def render_detail_table(pdf, data, max_rows=PDF_MAX_DETAIL_ROWS, progress=None):
+    """
+    Draw the emission records table from column arrays.
+
+    Args:
+        pdf (FPDF): Document to draw into
+        data (pandas.DataFrame): Emission records
+        max_rows (int, optional): Opt-in cap on the rows drawn; None (the
+            default) draws every row
+        progress (callable, optional): See render_table()
+    """
+    shown = data if max_rows is None else data.head(max_rows)
+    pdf.set_font(FONT, "", 8)
+    widths = fit_widths(pdf, [width for _, _, width, _ in DETAIL_COLUMNS])
+    chunk = {"start": 0, "stop": 0, "columns": []}
+
+    def columns(start, stop):
+        # Pages ask for consecutive rows; format a chunk of them at a time
+        if stop > chunk["stop"] or start < chunk["start"]:
+            part = shown.iloc[start:max(stop, start + PDF_FORMAT_CHUNK_ROWS)]
+            chunk.update(start=start, stop=start + len(part), columns=[
+                format_column(pdf, part[column], width, fmt)
+                for (_, column, _, fmt), width in zip(DETAIL_COLUMNS, widths)
+            ])
+        offset = start - chunk["start"]
+        return [column[offset:offset + stop - start] for column in chunk["columns"]]
+
+    render_table(
+        pdf,
+        [header for header, _, _, _ in DETAIL_COLUMNS],
+        widths,
+        columns,
+        progress=progress,
+        total_rows=len(shown)
+    )
+    if len(shown) < len(data):
+        pdf.set_font(FONT, "I", 9)
+        pdf.cell(0, 8, f"{len(data) - len(shown):,} further records not shown - export CSV for the full ledger.", 0, 1)
+
+
+def render_monthly_table(pdf, data):
+    """Draw emissions per month and scope (used when details are not inline)."""
+    dated = data.dropna(subset=["date"])
+    if len(dated) == 0:
+        return
+    monthly = dated.groupby([dated["date"].dt.strftime("%Y-%m"), "scope"], observed=True)["emissions_kgCO2e"].sum().unstack(fill_value=0).sort_index()
+    scopes = sorted(monthly.columns, key=str)
+    headers = ["Month"] + [str(scope) for scope in scopes] + ["Total"]
+    # Many scopes are squeezed into the printable width rather than overflowing it
+    widths = fit_widths(pdf, [30] + [40] * len(scopes) + [40])
+    pdf.set_font(FONT, "", 8)
+    values = [list(monthly.index)] + [monthly[scope] for scope in scopes] + [monthly[scopes].sum(axis=1)]
+    columns = [values[0]]
+    columns += [format_column(pdf, column, width, "{:,.2f}") for column, width in zip(values[1:], widths[1:])]
+    render_table(pdf, headers, widths, columns)
+
+
+def _heading(pdf, text, size=14):
+    pdf.set_font(FONT, "B", size)
+    pdf.cell(0, 10, text, 0, 1)
+    pdf.set_font(FONT, "", 12)
+
+
+def build_emissions_report(data, header_lines, detail_mode="inline", max_detail_rows=PDF_MAX_DETAIL_ROWS, closing_sections=None, progress=None):
+    """
+    Build the emissions PDF report.
+
+    Args:
+        data (pandas.DataFrame): Emission records to report on
+        header_lines (list): Lines printed under the title (company, period, ...)
+        detail_mode (str): "inline" puts the records table in the body,
+            "appendix" shows monthly totals in the body and the records in an
+            appendix, "none" leaves the records out
+        max_detail_rows (int, optional): Opt-in cap on records drawn, None
+            (the default) for all
+        closing_sections (list, optional): (title, lines) sections added after
+            the data
+        progress (callable, optional): Called as progress(rows_done, total_rows)
+            while the records table is drawn
+
+    Returns:
+        FPDF: The finished document
+    """
+    if detail_mode not in DETAIL_MODES:
+        raise ValueError(f"detail_mode must be one of {', '.join(DETAIL_MODES)}")
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=BOTTOM_MARGIN)
+    pdf.add_page()
+
+    # Title
+    pdf.set_font(FONT, "B", 16)
+    pdf.cell(0, 10, "Carbon Emissions Report", 0, 1, "C")
+    pdf.set_font(FONT, "", 12)
+    for line in header_lines:
+        pdf.cell(0, 10, _latin1(line), 0, 1)
+    pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d')}", 0, 1)
+
+    # Summary
+    pdf.ln(10)
+    _heading(pdf, "Summary")
+    total_emissions = data['emissions_kgCO2e'].sum()
+    pdf.cell(0, 10, f"Total Emissions: {total_emissions:.2f} kgCO2e", 0, 1)
+    pdf.cell(0, 10, f"Records: {len(data):,}", 0, 1)
+
+    # Emissions by scope
+    scope_data = data.groupby('scope', observed=True)['emissions_kgCO2e'].sum()
+    pdf.ln(5)
+    pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
+    for scope, emissions in scope_data.items():
+        pdf.cell(0, 10, _latin1(f"{scope}: {emissions:.2f} kgCO2e ({emissions / total_emissions * 100:.1f}%)"), 0, 1)
+
+    # Emissions by category
+    category_data = data.groupby('category', observed=True)['emissions_kgCO2e'].sum()
+    pdf.ln(5)
+    pdf.cell(0, 10, "Top Categories:", 0, 1)
+    for category, emissions in category_data.nlargest(5).items():
+        pdf.cell(0, 10, _latin1(f"{category}: {emissions:.2f} kgCO2e ({emissions / total_emissions * 100:.1f}%)"), 0, 1)
+
+    if detail_mode == "inline":
+        pdf.ln(10)
+        _heading(pdf, "Emissions Data")
+        render_detail_table(pdf, data, max_detail_rows, progress)
+    else:
+        pdf.ln(10)
+        _heading(pdf, "Emissions by Month")
+        render_monthly_table(pdf, data)
+
+    for title, lines in closing_sections or []:
+        pdf.ln(10)
+        _heading(pdf, title)
+        for line in lines:
+            pdf.multi_cell(0, 10, _latin1(line), new_x="LMARGIN", new_y="NEXT")
+
+    if detail_mode == "appendix":
+        pdf.add_page()
+        _heading(pdf, "Appendix: Emissions Data")
+        render_detail_table(pdf, data, max_detail_rows, progress)
+
+    return pdf
+
+
+def pdf_bytes(pdf):
+    """Return the finished document as bytes."""
+    return bytes(pdf.output())
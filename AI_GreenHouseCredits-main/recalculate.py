@@ -0,0 +1,247 @@
+"""
+Emissions recalculation for YourCarbonFootprint application.
+Restates stored records after emission factors change: the rows of the
+affected (category, activity) pairs and period are found through the dataset
+indexes, every row gets the factor version in force on its date (see
+factor_store), emissions are recomputed as quantity x factor for all of them
+at once, and the changed records are written back as one store update.
+
+Only rows whose factor came from the factor store are restated by default:
+rows without a factor, or whose factor equals some version of their
+(category, activity). Rows carrying a factor of their own are reported and
+left alone unless include_custom is set. To correct a factor, add the new value
+as a dated version in a factor file rather than editing EMISSION_FACTORS, so
+rows with the old value are still recognised.
+
+Usage:
+    python recalculate.py [--tenant ID] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+                          [--pair CATEGORY:ACTIVITY ...] [--include-custom] [--dry-run]
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import get_dataset_cache
+from emissions_store import StoreConflictError, get_store
+from factor_store import get_factor_store
+
+# Columns of the diff summary
+CHANGE_COLUMNS = ["category", "activity", "old_factor", "new_factor", "rows", "emissions_before_kgCO2e", "emissions_after_kgCO2e", "change_kgCO2e"]
+
+
+@dataclass
+class RecalculationResult:
+    """Outcome of a recalculation."""
+    rows_checked: int = 0
+    rows_changed: int = 0
+    rows_unresolved: int = 0
+    rows_custom: int = 0
+    emissions_before_kgCO2e: float = 0.0
+    emissions_after_kgCO2e: float = 0.0
+    version: Optional[int] = None
+    changes: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=CHANGE_COLUMNS))
+
+    @property
+    def change_kgCO2e(self):
+        return self.emissions_after_kgCO2e - self.emissions_before_kgCO2e
+
+
+def affected_positions(index, start_date=None, end_date=None, keys=None):
+    """
+    Row positions a recalculation has to look at.
+
+    Args:
+        index (EmissionsIndex): Indexes of the dataset
+        start_date (datetime, optional): Earliest date, inclusive
+        end_date (datetime, optional): Latest date, inclusive
+        keys (list, optional): (category, activity) pairs whose factors
+            changed; all rows when omitted
+
+    Returns:
+        numpy.ndarray: Sorted row positions
+    """
+    if keys is None:
+        positions = index.positions(start_date, end_date)
+        return np.arange(index.row_count) if positions is None else positions
+    positions = index.pair_positions(keys)
+    if start_date is not None or end_date is not None:
+        positions = np.intersect1d(positions, index.date_positions(start_date, end_date), assume_unique=True)
+    return positions
+
+
+def _summarise(before, after):
+    """Diff summary of the changed rows by (category, activity, old, new factor)."""
+    changes = pd.DataFrame({
+        "category": before["category"].astype(object).to_numpy(),
+        "activity": before["activity"].astype(object).to_numpy(),
+        "old_factor": before["emission_factor"].to_numpy(),
+        "new_factor": after["emission_factor"].to_numpy(),
+        "rows": 1,
+        "emissions_before_kgCO2e": before["emissions_kgCO2e"].to_numpy(),
+        "emissions_after_kgCO2e": after["emissions_kgCO2e"].to_numpy()
+    })
+    changes = changes.groupby(["category", "activity", "old_factor", "new_factor"], dropna=False, sort=True).sum(min_count=0).reset_index()
+    changes["change_kgCO2e"] = changes["emissions_after_kgCO2e"] - changes["emissions_before_kgCO2e"]
+    return changes[CHANGE_COLUMNS]
+
+
+def plan_recalculation(index, factor_store=None, start_date=None, end_date=None, keys=None, include_custom=False):
+    """
+    Work out the restated records without writing them.
+
+    Args:
+        index (EmissionsIndex): Indexes of the dataset to restate
+        factor_store (FactorStore, optional): Factors to apply, defaults to
+            the shared factor store
+        start_date (datetime, optional): Earliest date restated
+        end_date (datetime, optional): Latest date restated
+        keys (list, optional): (category, activity) pairs to restate
+        include_custom (bool): Also restate rows whose factor is not one of
+            the factor store's
+
+    Returns:
+        tuple: (changed records with their record_id, RecalculationResult)
+    """
+    factor_store = factor_store or get_factor_store()
+    rows = index.frame.take(affected_positions(index, start_date, end_date, keys))
+    result = RecalculationResult(rows_checked=len(rows))
+    if len(rows) == 0:
+        return rows, result
+
+    lookup = factor_store.lookup(rows["category"], rows["activity"], rows["date"], rows["country"], rows["unit"])
+    old_factors = rows["emission_factor"].to_numpy(dtype="float64")
+    eligible = np.ones(len(rows), dtype=bool)
+    if not include_custom:
+        from_store = np.isnan(old_factors) | factor_store.is_known_factor(rows["category"], rows["activity"], old_factors)
+        result.rows_custom = int((~from_store).sum())
+        eligible &= from_store
+    result.rows_unresolved = int((eligible & lookup.unresolved).sum())
+    eligible &= ~lookup.unresolved
+
+    # Express quantities in the factor's unit and recompute quantity x factor;
+    # rows without a quantity keep their emissions. Emissions entered with
+    # other rounding are compared with a tolerance
+    old_quantities = rows["quantity"].to_numpy(dtype="float64")
+    quantities = old_quantities * lookup.conversions
+    old_emissions = rows["emissions_kgCO2e"].to_numpy(dtype="float64")
+    new_emissions = np.where(np.isnan(quantities), old_emissions, quantities * lookup.factors)
+    changed = eligible & (
+        (old_factors != lookup.factors)
+        | (lookup.conversions != 1.0)
+        | ~np.isclose(old_emissions, new_emissions, rtol=1e-9, atol=0.0, equal_nan=True)
+    )
+
+    before = rows[changed]
+    after = before.assign(
+        quantity=np.where(np.isnan(quantities), old_quantities, quantities)[changed],
+        unit=lookup.units[changed],
+        emission_factor=lookup.factors[changed],
+        emissions_kgCO2e=new_emissions[changed]
+    )
+    result.rows_changed = len(after)
+    result.emissions_before_kgCO2e = float(np.nansum(old_emissions[changed]))
+    result.emissions_after_kgCO2e = float(np.nansum(new_emissions[changed]))
+    result.changes = _summarise(before, after)
+    return after.reset_index(drop=True), result
+
+
+def recalculate_emissions(store=None, factor_store=None, start_date=None, end_date=None, keys=None, include_custom=False, dry_run=False, attempts=3):
+    """
+    Restate stored records with the current emission factors.
+
+    The changed records are written as one store update, so the dataset
+    moves to the restated state in a single version. The update only goes
+    through if the dataset is still at the version the plan was made from;
+    if another write came first, the plan is made again from the new data.
+
+    Args:
+        store (EmissionsStore, optional): Store to restate, defaults to the
+            shared store
+        factor_store (FactorStore, optional): Factors to apply
+        start_date (datetime, optional): Earliest date restated
+        end_date (datetime, optional): Latest date restated
+        keys (list, optional): (category, activity) pairs to restate
+        include_custom (bool): Also restate rows with factors of their own
+        dry_run (bool): Only report what would change
+        attempts (int): Plans made before giving up on concurrent writes
+
+    Returns:
+        RecalculationResult: Counts, totals and the per-factor diff summary
+
+    Raises:
+        StoreConflictError: If other writes changed the dataset during every
+            attempt
+    """
+    store = store or get_store()
+    dataset = get_dataset_cache(store)
+    for attempt in range(1, attempts + 1):
+        version, index = dataset.versioned_index()
+        changed, result = plan_recalculation(index, factor_store, start_date, end_date, keys, include_custom)
+        if len(changed) == 0 or dry_run:
+            result.version = version
+            return result
+        try:
+            store.update(changed, expected_version=version)
+        except StoreConflictError:
+            if attempt == attempts:
+                raise
+            continue
+        result.version = store.version
+        return result
+
+
+def parse_pair(text):
+    """
+    Parse a command-line (category, activity) pair.
+
+    Args:
+        text (str): "CATEGORY:ACTIVITY"; the activity may contain ":"
+
+    Returns:
+        tuple: (category, activity)
+
+    Raises:
+        argparse.ArgumentTypeError: If either part is missing
+    """
+    category, _, activity = text.partition(":")
+    if not category.strip() or not activity.strip():
+        raise argparse.ArgumentTypeError(f"expected CATEGORY:ACTIVITY, got {text!r}")
+    return category.strip(), activity.strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Restate stored emissions with the current emission factors.")
+    parser.add_argument("--tenant", help="Tenant to restate (default: the default tenant)")
+    parser.add_argument("--start", help="Earliest date restated (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Latest date restated (YYYY-MM-DD)")
+    parser.add_argument("--pair", action="append", dest="pairs", type=parse_pair, metavar="CATEGORY:ACTIVITY", help="Only restate this (category, activity) pair (repeatable; default: all)")
+    parser.add_argument("--include-custom", action="store_true", help="Also restate rows whose factor is not a known factor version")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args(argv)
+    from tenants import get_tenant
+
+    result = recalculate_emissions(
+        get_tenant(args.tenant).store,
+        start_date=pd.Timestamp(args.start) if args.start else None,
+        end_date=pd.Timestamp(args.end) if args.end else None,
+        keys=args.pairs,
+        include_custom=args.include_custom,
+        dry_run=args.dry_run
+    )
+    if len(result.changes) > 0:
+        print(result.changes.to_string(index=False))
+    print(
+        f"{result.rows_changed} of {result.rows_checked} rows {'would change' if args.dry_run else 'restated'}, "
+        f"{result.change_kgCO2e:+,.2f} kgCO2e "
+        f"({result.rows_custom} with custom factors skipped, {result.rows_unresolved} without a factor)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,22 +4,21 @@ Generates PDF reports and visualizations.
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-from fpdf import FPDF  # fpdf2 package
+from config import PDF_MAX_DETAIL_ROWS
+from pdf_tables import build_emissions_report, pdf_bytes
+from report_jobs import artifact_key, get_report_queue
+from figure_cache import cached_figure
 import os
 from datetime import datetime
-import base64
-from io import BytesIO
 
 class ReportGenerator:
     def __init__(self, data_handler):
         """Initialize the ReportGenerator class."""
         self.data_handler = data_handler
     
-    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None, company_info=None):
+    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None, company_info=None, detail_mode="inline", max_detail_rows=PDF_MAX_DETAIL_ROWS, progress=None):
         """
         Generate PDF report.
         
@@ -28,9 +27,14 @@ class ReportGenerator:
             start_date (datetime, optional): Start date for filtering
             end_date (datetime, optional): End date for filtering
             company_info (dict, optional): Company information
+            detail_mode (str): "inline", "appendix" (aggregates in the body,
+                records in an appendix) or "none" (aggregates only)
+            max_detail_rows (int, optional): Opt-in cap on records in the table, None (default) for all
+            progress (callable, optional): Called as progress(rows_done, total_rows)
             
         Returns:
-            bytes or bool: PDF bytes if file_path is None, otherwise True if successful
+            tuple: (PDF bytes if file_path is None, otherwise True, message);
+            (False, message) on failure
         """
         try:
             # Get filtered data
@@ -39,97 +43,7 @@ class ReportGenerator:
             if len(data) == 0:
                 return False, "No data available for the selected period."
             
-            # Create PDF
-            pdf = FPDF()
-            pdf.add_page()
-            
-            # Set font
-            pdf.set_font("Arial", "B", 16)
-            
-            # Title
-            pdf.cell(0, 10, "Carbon Emissions Report", 0, 1, "C")
-            pdf.set_font("Arial", "", 12)
-            
-            # Company info
-            if company_info:
-                pdf.cell(0, 10, f"Company: {company_info.get('name', 'N/A')}", 0, 1)
-                pdf.cell(0, 10, f"Industry: {company_info.get('industry', 'N/A')}", 0, 1)
-                pdf.cell(0, 10, f"Location: {company_info.get('location', 'N/A')}", 0, 1)
-            
-            # Reporting period
-            pdf.cell(0, 10, f"Reporting Period: {start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d') if end_date else 'All'}", 0, 1)
-            pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d')}", 0, 1)
-            
-            # Summary
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Summary", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            total_emissions = data['emissions_kgCO2e'].sum()
-            pdf.cell(0, 10, f"Total Emissions: {total_emissions:.2f} kgCO2e", 0, 1)
-            
-            # Emissions by scope
-            scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
-            for _, row in scope_data.iterrows():
-                pdf.cell(0, 10, f"{row['scope']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Emissions by category
-            category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Top Categories:", 0, 1)
-            for _, row in category_data.nlargest(5, 'emissions_kgCO2e').iterrows():
-                pdf.cell(0, 10, f"{row['category']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Data table
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Emissions Data", 0, 1)
-            pdf.set_font("Arial", "B", 10)
-            
-            # Table header
-            col_widths = [25, 25, 30, 30, 20, 15, 25, 30]
-            headers = ['Date', 'Scope', 'Category', 'Activity', 'Quantity', 'Unit', 'Factor', 'Emissions (kgCO2e)']
-            
-            for i, header in enumerate(headers):
-                pdf.cell(col_widths[i], 10, header, 1)
-            pdf.ln()
-            
-            # Table data
-            pdf.set_font("Arial", "", 8)
-            for _, row in data.iterrows():
-                pdf.cell(col_widths[0], 10, row['date'].strftime('%Y-%m-%d') if isinstance(row['date'], pd.Timestamp) else str(row['date']), 1)
-                pdf.cell(col_widths[1], 10, str(row['scope']), 1)
-                pdf.cell(col_widths[2], 10, str(row['category']), 1)
-                pdf.cell(col_widths[3], 10, str(row['activity']), 1)
-                pdf.cell(col_widths[4], 10, f"{row['quantity']:.2f}", 1)
-                pdf.cell(col_widths[5], 10, str(row['unit']), 1)
-                pdf.cell(col_widths[6], 10, f"{row['emission_factor']:.4f}", 1)
-                pdf.cell(col_widths[7], 10, f"{row['emissions_kgCO2e']:.2f}", 1)
-                pdf.ln()
-            
-            # Compliance section
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Regulatory Compliance", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            pdf.cell(0, 10, "EU CBAM: This report can be used as supporting documentation for EU CBAM compliance.", 0, 1)
-            pdf.cell(0, 10, "Japan GX League: This report follows the GX League reporting format.", 0, 1)
-            pdf.cell(0, 10, "Indonesia ETS/ETP: This report can be used for Indonesia ETS/ETP compliance.", 0, 1)
-            
-            # Recommendations
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Recommendations", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            pdf.cell(0, 10, "1. Focus on reducing emissions from the top categories identified in this report.", 0, 1)
-            pdf.cell(0, 10, "2. Consider implementing energy efficiency measures for Scope 2 emissions.", 0, 1)
-            pdf.cell(0, 10, "3. Explore renewable energy options to reduce your carbon footprint.", 0, 1)
-            pdf.cell(0, 10, "4. Engage with suppliers to address Scope 3 emissions in your value chain.", 0, 1)
+            pdf = self._build_pdf(data, start_date, end_date, company_info, detail_mode, max_detail_rows, progress)
             
             if file_path:
                 # Save to file
@@ -137,21 +51,141 @@ class ReportGenerator:
                 return True, "Report generated successfully."
             else:
                 # Return PDF bytes
-                return pdf.output(dest='S').encode('latin1'), "Report generated successfully."
+                return pdf_bytes(pdf), "Report generated successfully."
         except Exception as e:
             return False, f"Error generating PDF report: {str(e)}"
     
+    def _build_pdf(self, data, start_date, end_date, company_info, detail_mode, max_detail_rows, progress):
+        """Lay out the PDF report for already filtered data."""
+        header_lines = []
+        if company_info:
+            header_lines += [
+                f"Company: {company_info.get('name', 'N/A')}",
+                f"Industry: {company_info.get('industry', 'N/A')}",
+                f"Location: {company_info.get('location', 'N/A')}"
+            ]
+        header_lines.append(f"Reporting Period: {start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d') if end_date else 'All'}")
+
+        pdf = build_emissions_report(
+            data,
+            header_lines,
+            detail_mode=detail_mode,
+            max_detail_rows=max_detail_rows,
+            closing_sections=[
+                ("Regulatory Compliance", [
+                    "EU CBAM: This report can be used as supporting documentation for EU CBAM compliance.",
+                    "Japan GX League: This report follows the GX League reporting format.",
+                    "Indonesia ETS/ETP: This report can be used for Indonesia ETS/ETP compliance."
+                ]),
+                ("Recommendations", [
+                    "1. Focus on reducing emissions from the top categories identified in this report.",
+                    "2. Consider implementing energy efficiency measures for Scope 2 emissions.",
+                    "3. Explore renewable energy options to reduce your carbon footprint.",
+                    "4. Engage with suppliers to address Scope 3 emissions in your value chain."
+                ])
+            ],
+            progress=progress
+        )
+        return pdf
+    
+    def _snapshot(self, start_date, end_date):
+        """Return the current dataset version and the filtered data at that version."""
+        # Version and index come from one call, so the data always matches its key
+        version, index = self.data_handler.dataset.versioned_index()
+        return version, index.query(start_date, end_date)
+    
+    def submit_pdf_report(self, start_date=None, end_date=None, company_info=None, detail_mode="inline", max_detail_rows=PDF_MAX_DETAIL_ROWS, queue=None):
+        """
+        Generate a PDF report in the background.
+        
+        Reports are cached by tenant, dataset version, date range, company
+        information and layout options; an unchanged request is served from the cache.
+        
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            company_info (dict, optional): Company information
+            detail_mode (str): "inline", "appendix" or "none"
+            max_detail_rows (int, optional): Opt-in cap on records in the table, None (default) for all
+            queue (ReportJobQueue, optional): Queue to use, defaults to the shared queue
+            
+        Returns:
+            str or None: Job id, or None if there is no data for the period
+        """
+        queue = queue or get_report_queue()
+        version, data = self._snapshot(start_date, end_date)
+        if len(data) == 0:
+            return None
+        key = artifact_key("pdf", self.data_handler.tenant_id, version, start_date, end_date, company_info or {}, detail_mode, max_detail_rows)
+        
+        def render(progress):
+            pdf = self._build_pdf(
+                data, start_date, end_date, company_info, detail_mode, max_detail_rows,
+                lambda done, total: progress(done / total if total else 1.0)
+            )
+            return pdf_bytes(pdf)
+        
+        return queue.submit("pdf", key, render, extension="pdf")
+    
+    def submit_csv_export(self, start_date=None, end_date=None, queue=None):
+        """
+        Export the emissions data as CSV in the background (cached like PDFs).
+        
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            queue (ReportJobQueue, optional): Queue to use, defaults to the shared queue
+            
+        Returns:
+            str: Job id
+        """
+        queue = queue or get_report_queue()
+        version, data = self._snapshot(start_date, end_date)
+        key = artifact_key("csv", self.data_handler.tenant_id, version, start_date, end_date)
+        
+        def render(progress):
+            export = data.assign(date=data['date'].dt.strftime('%Y-%m-%d'))
+            return export.to_csv(index=False).encode('utf-8')
+        
+        return queue.submit("csv", key, render, extension="csv")
+    
+    def create_charts(self, start_date=None, end_date=None):
+        """
+        Create all report charts for a period, reusing cached figures while
+        the data is unchanged.
+        
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            
+        Returns:
+            dict: Chart name -> plotly.graph_objects.Figure
+        """
+        version, data = self._snapshot(start_date, end_date)
+        filters = {"tenant": self.data_handler.tenant_id, "start_date": start_date, "end_date": end_date}
+        return {
+            "scope_pie": self.create_scope_pie_chart(data, version=version, filters=filters),
+            "category_bar": self.create_category_bar_chart(data, version=version, filters=filters),
+            "time_series": self.create_time_series_chart(data, version=version, filters=filters),
+            "activity_treemap": self.create_activity_treemap(data, version=version, filters=filters),
+            "monthly_comparison": self.create_monthly_comparison_chart(data, version=version, filters=filters)
+        }
+    
+    @cached_figure("scope_pie", theme="report")
     def create_scope_pie_chart(self, data):
         """
         Create pie chart of emissions by scope.
         
         Args:
             data (pandas.DataFrame): Emissions data
+            version (int, optional): Dataset version the data comes from;
+                enables the shared figure cache
+            filters (optional): Filter applied to the data, part of the cache key
             
         Returns:
             plotly.graph_objects.Figure: Pie chart figure
         """
-        scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
+        scope_data = data.groupby('scope', observed=True)['emissions_kgCO2e'].sum().reset_index()
         fig = px.pie(
             scope_data, 
             values='emissions_kgCO2e', 
@@ -171,17 +205,21 @@ class ReportGenerator:
         )
         return fig
     
+    @cached_figure("category_bar", theme="report")
     def create_category_bar_chart(self, data):
         """
         Create bar chart of emissions by category.
         
         Args:
             data (pandas.DataFrame): Emissions data
+            version (int, optional): Dataset version the data comes from;
+                enables the shared figure cache
+            filters (optional): Filter applied to the data, part of the cache key
             
         Returns:
             plotly.graph_objects.Figure: Bar chart figure
         """
-        category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
+        category_data = data.groupby('category', observed=True)['emissions_kgCO2e'].sum().reset_index()
         category_data = category_data.sort_values('emissions_kgCO2e', ascending=False)
         fig = px.bar(
             category_data, 
@@ -200,12 +238,16 @@ class ReportGenerator:
         )
         return fig
     
+    @cached_figure("time_series", theme="report")
     def create_time_series_chart(self, data):
         """
         Create time series chart of emissions over time.
         
         Args:
             data (pandas.DataFrame): Emissions data
+            version (int, optional): Dataset version the data comes from;
+                enables the shared figure cache
+            filters (optional): Filter applied to the data, part of the cache key
             
         Returns:
             plotly.graph_objects.Figure: Line chart figure
@@ -225,7 +267,7 @@ class ReportGenerator:
         # Group by month and scope
         time_data = data.copy()
         time_data['month'] = pd.to_datetime(time_data['date']).dt.strftime('%Y-%m')
-        time_data = time_data.groupby(['month', 'scope'])['emissions_kgCO2e'].sum().reset_index()
+        time_data = time_data.groupby(['month', 'scope'], observed=True)['emissions_kgCO2e'].sum().reset_index()
         
         fig = px.line(
             time_data, 
@@ -244,12 +286,16 @@ class ReportGenerator:
         )
         return fig
     
+    @cached_figure("activity_treemap", theme="report")
     def create_activity_treemap(self, data):
         """
         Create treemap of emissions by scope, category, and activity.
         
         Args:
             data (pandas.DataFrame): Emissions data
+            version (int, optional): Dataset version the data comes from;
+                enables the shared figure cache
+            filters (optional): Filter applied to the data, part of the cache key
             
         Returns:
             plotly.graph_objects.Figure: Treemap figure
@@ -272,12 +318,16 @@ class ReportGenerator:
         )
         return fig
     
+    @cached_figure("monthly_comparison", theme="report")
     def create_monthly_comparison_chart(self, data):
         """
         Create bar chart comparing emissions by month.
         
         Args:
             data (pandas.DataFrame): Emissions data
+            version (int, optional): Dataset version the data comes from;
+                enables the shared figure cache
+            filters (optional): Filter applied to the data, part of the cache key
             
         Returns:
             plotly.graph_objects.Figure: Bar chart figure
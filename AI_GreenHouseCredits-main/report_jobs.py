@@ -0,0 +1,327 @@
+"""
+Background report jobs for YourCarbonFootprint application.
+Runs report generation on a thread pool and tracks each job in a small SQLite
+table, so the UI gets a job id back immediately, can poll progress and survives
+reruns. Finished reports are kept as artifacts keyed on the inputs that
+determine them (dataset version, date range, company info, options), so asking
+again for an unchanged report is answered from disk without regenerating it.
+
+Several processes (app replicas, batch workers) may share the job table. Every
+job records the process that runs it, and a queued or running job is only
+failed once that process is gone.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import REPORTS_DIR, REPORT_WORKERS, REPORT_CACHE_MAX_ARTIFACTS, REPORT_ARTIFACT_PIN_SECONDS, REPORT_JOB_STALE_SECONDS
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def artifact_key(*parts):
+    """
+    Build the artifact cache key for a report.
+
+    Args:
+        *parts: JSON-serialisable inputs that determine the report content
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _read_first_line(path):
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return ""
+
+
+def _process_start(pid):
+    """Start time of a process in clock ticks since boot ("" if unknown)."""
+    stat = _read_first_line(f"/proc/{pid}/stat")
+    # Fields after the parenthesised command name; starttime is field 22
+    fields = stat.rsplit(")", 1)[-1].split()
+    return fields[19] if len(fields) > 19 else ""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+def process_owner():
+    """
+    Identify the current process across hosts, reboots and pid reuse.
+
+    Returns:
+        str: "host|boot id|pid|process start"
+    """
+    boot_id = _read_first_line("/proc/sys/kernel/random/boot_id")
+    pid = os.getpid()
+    return f"{socket.gethostname()}|{boot_id}|{pid}|{_process_start(pid)}"
+
+
+def owner_alive(owner, updated_at, now=None):
+    """
+    Check whether the process that owns a job can still finish it.
+
+    Processes on this host are checked directly; for other hosts the job must
+    have been updated within REPORT_JOB_STALE_SECONDS.
+
+    Args:
+        owner (str): Owner recorded with the job, see process_owner()
+        updated_at (float): Last update of the job
+        now (float, optional): Current time
+
+    Returns:
+        bool: False if the owner is known to be gone
+    """
+    try:
+        host, boot_id, pid, start = owner.split("|")
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        # Jobs recorded before owners were tracked
+        return False
+    if host != socket.gethostname():
+        return (now or time.time()) - updated_at < REPORT_JOB_STALE_SECONDS
+    if boot_id != _read_first_line("/proc/sys/kernel/random/boot_id"):
+        return False
+    if not _pid_alive(pid):
+        return False
+    return not start or _process_start(pid) in ("", start)
+
+
+class ReportJobQueue:
+    def __init__(self, root=REPORTS_DIR, max_workers=REPORT_WORKERS, max_artifacts=REPORT_CACHE_MAX_ARTIFACTS):
+        """
+        Open (or create) the job table and artifact cache.
+
+        Args:
+            root (str): Directory for the job table and artifacts
+            max_workers (int): Reports generated concurrently
+            max_artifacts (int): Finished reports kept; oldest are removed
+        """
+        self.root = root
+        self.artifacts_dir = os.path.join(root, "artifacts")
+        self.max_artifacts = max_artifacts
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        self.owner = process_owner()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "jobs.sqlite3"), check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, cache_key TEXT NOT NULL, "
+                "status TEXT NOT NULL, progress REAL NOT NULL, message TEXT, "
+                "artifact TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, owner TEXT)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        with self._lock, self._conn:
+            self._fail_orphans()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+
+    def _fail_orphans(self, cache_key=None):
+        """
+        Fail the queued and running jobs whose owning process is gone (they
+        can never finish). Call with the lock held, inside a transaction.
+        """
+        query = "SELECT id, owner, updated_at FROM jobs WHERE status IN (?, ?)"
+        params = (JOB_QUEUED, JOB_RUNNING)
+        if cache_key is not None:
+            query += " AND cache_key = ?"
+            params += (cache_key,)
+        now = time.time()
+        orphans = [
+            (JOB_FAILED, "Interrupted by application restart", now, job_id)
+            for job_id, owner, updated_at in self._conn.execute(query, params).fetchall()
+            if owner != self.owner and not owner_alive(owner, updated_at, now)
+        ]
+        self._conn.executemany(
+            "UPDATE jobs SET status = ?, message = ?, updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+            orphans
+        )
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _artifact_path(self, cache_key, extension):
+        return os.path.join(self.artifacts_dir, f"{cache_key}.{extension}")
+
+    def submit(self, kind, cache_key, render, extension="pdf"):
+        """
+        Queue a report unless it is cached or already being generated.
+
+        Args:
+            kind (str): Report type, e.g. "pdf" or "csv"
+            cache_key (str): Artifact key, see artifact_key()
+            render (callable): Called as render(progress) and returns the
+                report bytes; progress(fraction) reports completion in [0, 1]
+            extension (str): Artifact file extension
+
+        Returns:
+            str: Job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        artifact = self._artifact_path(cache_key, extension)
+        with self._lock, self._conn:
+            self._fail_orphans(cache_key)
+            pending = self._conn.execute(
+                "SELECT id FROM jobs WHERE cache_key = ? AND status IN (?, ?)",
+                (cache_key, JOB_QUEUED, JOB_RUNNING)
+            ).fetchone()
+            if pending:
+                return pending[0]
+            if os.path.exists(artifact):
+                os.utime(artifact)
+                self._conn.execute(
+                    "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, cache_key, JOB_DONE, 1.0, "Served from cache", artifact, now, now, self.owner)
+                )
+                return job_id
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, cache_key, JOB_QUEUED, 0.0, None, None, now, now, self.owner)
+            )
+        self._pool.submit(self._run, job_id, render, artifact)
+        return job_id
+
+    def _run(self, job_id, render, artifact):
+        self._update(job_id, status=JOB_RUNNING)
+
+        last = {"progress": 0.0, "time": 0.0}
+
+        def progress(fraction):
+            # Throttled: each update is a committed write to the job table
+            fraction = max(0.0, min(1.0, float(fraction)))
+            now = time.time()
+            if fraction - last["progress"] >= 0.01 and now - last["time"] >= 0.25:
+                last.update(progress=fraction, time=now)
+                self._update(job_id, progress=fraction)
+
+        try:
+            content = render(progress)
+            tmp_path = f"{artifact}.{job_id}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, artifact)
+            self._update(job_id, status=JOB_DONE, progress=1.0, message="Report generated successfully.", artifact=artifact)
+            self._evict_artifacts()
+        except Exception as e:
+            self._update(job_id, status=JOB_FAILED, message=f"Error generating report: {str(e)}")
+
+    def _evict_artifacts(self):
+        """
+        Remove the least recently used artifacts beyond max_artifacts, except
+        those of reports finished within REPORT_ARTIFACT_PIN_SECONDS, which
+        may not have been downloaded yet.
+        """
+        with self._lock:
+            pinned = {
+                row[0] for row in self._conn.execute(
+                    "SELECT artifact FROM jobs WHERE status = ? AND artifact IS NOT NULL AND updated_at >= ?",
+                    (JOB_DONE, time.time() - REPORT_ARTIFACT_PIN_SECONDS)
+                )
+            }
+        paths = [
+            os.path.join(self.artifacts_dir, name)
+            for name in os.listdir(self.artifacts_dir)
+            if not name.endswith(".tmp")
+        ]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.max_artifacts:]:
+            if path in pinned:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def status(self, job_id):
+        """
+        Get the state of a job.
+
+        Args:
+            job_id (str): Job id returned by submit()
+
+        Returns:
+            dict or None: id, kind, status, progress and message
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, progress, message FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["id", "kind", "status", "progress", "message"], row))
+
+    def result(self, job_id):
+        """
+        Get the report produced by a finished job.
+
+        Args:
+            job_id (str): Job id returned by submit()
+
+        Returns:
+            bytes or None: Report content, or None if not finished (or, once
+            older than REPORT_ARTIFACT_PIN_SECONDS, evicted)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, artifact FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None or row[0] != JOB_DONE or not row[1] or not os.path.exists(row[1]):
+            return None
+        with open(row[1], "rb") as f:
+            return f.read()
+
+    def purge(self, older_than_seconds=7 * 24 * 3600):
+        """Delete job records (not artifacts) older than the given age."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE updated_at < ? AND status IN (?, ?)",
+                (time.time() - older_than_seconds, JOB_DONE, JOB_FAILED)
+            )
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_report_queue():
+    """
+    Return the process-wide report job queue.
+
+    Returns:
+        ReportJobQueue: Shared queue
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ReportJobQueue()
+        return _queue
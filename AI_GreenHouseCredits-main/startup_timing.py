@@ -0,0 +1,128 @@
+"""
+Startup instrumentation for YourCarbonFootprint application.
+With CARBONSENSE_PROFILE_STARTUP=1 every Streamlit script run prints how long
+its phases (imports, session set-up, page render) took, how many modules it
+loaded and which heavy libraries were imported. Without it the marks are no-ops.
+
+Running this module prints the slowest imports of the modules app.py loads at
+startup, measured with python -X importtime in a fresh interpreter.
+
+Usage:
+    python startup_timing.py [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ENABLED = os.getenv("CARBONSENSE_PROFILE_STARTUP", "").lower() in ("1", "true", "yes")
+
+# Libraries that should only be loaded by the pages that use them
+HEAVY_MODULES = ("plotly", "crewai", "matplotlib", "seaborn", "fpdf")
+
+# Project modules app.py imports before painting a page
+STARTUP_MODULES = (
+    "streamlit", "pandas", "dotenv", "emissions_schema", "tenants", "config", "csv_ingest", "bulk_import",
+    "emissions_digest", "report_jobs", "figure_cache", "data_view"
+)
+
+_t0 = None
+_modules = frozenset()
+_marks = []
+
+
+def start():
+    """Start timing a script run."""
+    global _t0, _modules
+    if not ENABLED:
+        return
+    _t0 = time.perf_counter()
+    _modules = frozenset(sys.modules)
+    _marks.clear()
+
+
+def mark(label):
+    """
+    Record the end of a phase.
+
+    Args:
+        label (str): Phase name
+    """
+    if ENABLED and _t0 is not None:
+        _marks.append((label, time.perf_counter()))
+
+
+def finish(label="render"):
+    """
+    Record the last phase and print the timings of the run.
+
+    Args:
+        label (str): Name of the last phase, e.g. the page rendered
+    """
+    if not ENABLED or _t0 is None:
+        return
+    mark(label)
+    parts = []
+    previous = _t0
+    for name, at in _marks:
+        parts.append(f"{name} {(at - previous) * 1000:.0f} ms")
+        previous = at
+    loaded = set(sys.modules) - _modules
+    heavy = sorted({name.split(".")[0] for name in sys.modules if name.split(".")[0] in HEAVY_MODULES})
+    print(
+        f"[startup] {(previous - _t0) * 1000:.0f} ms total ({', '.join(parts)}); "
+        f"{len(loaded)} modules loaded; heavy: {', '.join(heavy) or 'none'}",
+        file=sys.stderr
+    )
+
+
+def import_times(modules=STARTUP_MODULES):
+    """
+    Measure module import times in a fresh interpreter.
+
+    Args:
+        modules (tuple): Modules to import
+
+    Returns:
+        tuple: (total seconds, list of (cumulative seconds, self seconds,
+            module name), slowest first)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    total = 0.0
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented; top-level ones add up to the total
+        if not name[1:].startswith(" "):
+            total += int(cumulative) / 1e6
+        times.append((int(cumulative) / 1e6, int(own) / 1e6, name.strip()))
+    return total, sorted(times, reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the slowest imports of the app's startup modules.")
+    parser.add_argument("--top", type=int, default=25, help="Imports listed (default: 25)")
+    args = parser.parse_args(argv)
+
+    total, times = import_times()
+    print(f"Startup imports: {total * 1000:.0f} ms")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative, own, name in times[:args.top]:
+        print(f"{cumulative * 1000:>9.1f} ms {own * 1000:>7.1f} ms  {name}")
+    heavy = sorted({name.split(".")[0] for _, _, name in times if name.split(".")[0] in HEAVY_MODULES})
+    print(f"Heavy modules imported: {', '.join(heavy) or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Tenant partitioning for YourCarbonFootprint application.
+Lets one deployment serve many companies. Every tenant has its own emissions
+store (segments, log and manifest) and company settings under
+TENANTS_DIR/<tenant id>/, so tenants never share segments or indexes.
+
+Tenants are opened lazily on first use. At most TENANT_MAX_OPEN stay open;
+opening another one releases the least recently used tenant's in-memory
+dataset, aggregates and indexes, so memory tracks the number of active tenants
+rather than the total. A released tenant reopens transparently on its next use.
+
+The default tenant keeps the single-company layout (data/store,
+data/company_info.json and the legacy data/emissions.json migration) and is
+never released.
+"""
+
+import json
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from config import TENANTS_DIR, DEFAULT_TENANT, TENANT_MAX_OPEN, COMPANY_INFO_FILE
+from dataset_cache import DatasetCache, get_dataset_cache, release_dataset_cache
+from emissions_store import EmissionsStore, get_store
+
+# Tenant ids double as directory names
+_TENANT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+def validate_tenant_id(tenant_id):
+    """
+    Check a tenant id.
+
+    Args:
+        tenant_id (str): Letters, digits, "_" and "-", at most 64 characters
+
+    Returns:
+        str: The tenant id
+
+    Raises:
+        ValueError: If the id is not valid
+    """
+    if not isinstance(tenant_id, str) or not _TENANT_ID.match(tenant_id):
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    return tenant_id
+
+
+@dataclass(eq=False)
+class Tenant:
+    """An open tenant: its store and the shared dataset cache of that store."""
+    tenant_id: str
+    store: EmissionsStore
+    dataset: DatasetCache
+    company_info_file: str
+
+    def load_company_info(self):
+        """
+        Load the tenant's company information.
+
+        Returns:
+            dict or None: Company information, None if not saved yet
+        """
+        if not os.path.exists(self.company_info_file):
+            return None
+        with open(self.company_info_file, "r") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return None
+
+
+class TenantRegistry:
+    def __init__(self, root=TENANTS_DIR, max_open=TENANT_MAX_OPEN, default_tenant=DEFAULT_TENANT):
+        """
+        Initialize the registry; no tenant is opened yet.
+
+        Args:
+            root (str): Directory holding one directory per tenant
+            max_open (int): Tenants kept open besides the default tenant
+            default_tenant (str): Tenant using the single-company layout
+        """
+        self.root = root
+        self.max_open = max_open
+        self.default_tenant = validate_tenant_id(default_tenant)
+        self._lock = threading.Lock()
+        self._default = None
+        self._open = OrderedDict()
+        # Released tenants still referenced elsewhere (e.g. by a session) are
+        # reused on reopen
+        self._released = weakref.WeakValueDictionary()
+
+    def _tenant_dir(self, tenant_id):
+        return os.path.join(self.root, tenant_id)
+
+    def exists(self, tenant_id):
+        """True if the tenant has been created."""
+        tenant_id = validate_tenant_id(tenant_id)
+        return tenant_id == self.default_tenant or os.path.isdir(self._tenant_dir(tenant_id))
+
+    def list_tenants(self):
+        """
+        List the created tenants.
+
+        Returns:
+            list: Tenant ids, the default tenant first
+        """
+        tenants = []
+        if os.path.isdir(self.root):
+            tenants = sorted(
+                name for name in os.listdir(self.root)
+                if _TENANT_ID.match(name) and name != self.default_tenant and os.path.isdir(self._tenant_dir(name))
+            )
+        return [self.default_tenant] + tenants
+
+    def get(self, tenant_id=None, create=False):
+        """
+        Return an open tenant, opening it if needed.
+
+        Args:
+            tenant_id (str, optional): Tenant id, defaults to the default tenant
+            create (bool): Create the tenant if it does not exist yet
+
+        Returns:
+            Tenant: The open tenant
+
+        Raises:
+            ValueError: If the id is invalid, or the tenant does not exist
+                and create is False
+        """
+        tenant_id = validate_tenant_id(tenant_id or self.default_tenant)
+        with self._lock:
+            if tenant_id == self.default_tenant:
+                if self._default is None:
+                    store = get_store()
+                    self._default = Tenant(tenant_id, store, get_dataset_cache(store), COMPANY_INFO_FILE)
+                return self._default
+
+            tenant = self._open.get(tenant_id)
+            if tenant is not None:
+                self._open.move_to_end(tenant_id)
+                return tenant
+
+            tenant = self._released.pop(tenant_id, None)
+            if tenant is not None:
+                tenant.dataset = get_dataset_cache(tenant.store)
+            else:
+                tenant_dir = self._tenant_dir(tenant_id)
+                if not create and not os.path.isdir(tenant_dir):
+                    raise ValueError(f"Unknown tenant: {tenant_id}")
+                store = get_store(os.path.join(tenant_dir, "store"), legacy_json=None)
+                tenant = Tenant(tenant_id, store, get_dataset_cache(store), os.path.join(tenant_dir, "company_info.json"))
+            self._open[tenant_id] = tenant
+
+            while len(self._open) > self.max_open:
+                _, evicted = self._open.popitem(last=False)
+                self._release(evicted)
+            return tenant
+
+    def _release(self, tenant):
+        """Free a tenant's cached dataset; the store stays usable."""
+        release_dataset_cache(tenant.store)
+        self._released[tenant.tenant_id] = tenant
+
+    def release(self, tenant_id):
+        """Release an open tenant now (no-op for the default or closed tenants)."""
+        with self._lock:
+            tenant = self._open.pop(tenant_id, None)
+            if tenant is not None:
+                self._release(tenant)
+
+    def open_tenants(self):
+        """Ids of the open tenants besides the default, least recently used first."""
+        with self._lock:
+            return list(self._open)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_tenant_registry():
+    """
+    Return the process-wide tenant registry.
+
+    Returns:
+        TenantRegistry: Shared registry
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TenantRegistry()
+        return _registry
+
+
+def get_tenant(tenant_id=None, create=False):
+    """
+    Return an open tenant from the shared registry.
+
+    Args:
+        tenant_id (str, optional): Tenant id, defaults to the default tenant
+        create (bool): Create the tenant if it does not exist yet
+
+    Returns:
+        Tenant: The open tenant
+    """
+    return get_tenant_registry().get(tenant_id, create)
@@ -0,0 +1,192 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+import csv_ingest
+from api import EmissionsAPI
+from factor_store import FactorStore, builtin_versions
+from tenants import TenantRegistry
+
+
+class Response:
+    def __init__(self, messages):
+        self.messages = messages
+        start = messages[0]
+        self.status = start["status"]
+        self.headers = dict(start["headers"])
+        self.body = b"".join(message.get("body", b"") for message in messages[1:])
+
+    def json(self):
+        return json.loads(self.body)
+
+
+async def call(app, method, path, body=b"", content_type="application/json", query=b"", chunk=None, send=None):
+    """Drive the ASGI app with a fake receive/send pair."""
+    chunk = chunk or max(len(body), 1)
+    parts = [body[n:n + chunk] for n in range(0, len(body), chunk)] or [b""]
+    incoming = [{"type": "http.request", "body": part, "more_body": n < len(parts) - 1} for n, part in enumerate(parts)]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {"type": "http.disconnect"}
+
+    async def record(message):
+        sent.append(message)
+        if send is not None:
+            await send(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": [(b"content-type", content_type.encode())]}
+    await app(scope, receive, record)
+    return Response(sent)
+
+
+def reading(n, facility=None):
+    return {
+        "date": f"2024-01-{n % 28 + 1:02d}",
+        "scope": "Scope 2",
+        "category": "Electricity",
+        "activity": "India Grid",
+        "quantity": float(n + 1),
+        "unit": "kWh",
+        "facility": facility or f"F{n % 3}"
+    }
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = TenantRegistry(root=str(tmp_path / "tenants"))
+    registry.get("iot", create=True)
+    factors = FactorStore(builtin_versions())
+    monkeypatch.setattr(api, "get_tenant", lambda tenant_id=None, create=False: registry.get(tenant_id, create))
+    monkeypatch.setattr(csv_ingest, "get_factor_store", lambda: factors)
+    return registry
+
+
+def post(app, records, **kwargs):
+    return call(app, "POST", "/v1/tenants/iot/emissions", json.dumps(records).encode(), **kwargs)
+
+
+def test_concurrent_requests_are_written_together(registry):
+    app = EmissionsAPI(batch_window=0.05, batch_rows=1000)
+
+    async def scenario():
+        return await asyncio.gather(*[post(app, [reading(n)]) for n in range(60)])
+
+    responses = asyncio.run(scenario())
+    assert {response.status for response in responses} == {200}
+    results = [response.json() for response in responses]
+    assert {result["version"] for result in results} == {1}
+    assert {result["batched_requests"] for result in results} == {60}
+    assert all(result["accepted"] == 1 and result["unresolved_factors"] == 0 for result in results)
+
+    store = registry.get("iot").store
+    assert store.version == 1
+    df = store.load()
+    assert sorted(df["quantity"]) == [float(n + 1) for n in range(60)]
+    assert df["emissions_kgCO2e"].sum() == pytest.approx(sum(n + 1 for n in range(60)) * 0.82)
+
+
+def test_batches_are_capped_at_batch_rows(registry):
+    app = EmissionsAPI(batch_window=0.05, batch_rows=10)
+
+    async def scenario():
+        single = [post(app, [reading(n)]) for n in range(25)]
+        return await asyncio.gather(*single, post(app, [reading(n) for n in range(15)]))
+
+    results = [response.json() for response in asyncio.run(scenario())]
+    # An oversized request is written on its own
+    assert results[-1]["batched_requests"] == 1 and results[-1]["accepted"] == 15
+    sizes = {}
+    for result in results[:-1]:
+        sizes[result["version"]] = result["batched_requests"]
+    assert sorted(sizes.values()) == [5, 10, 10]
+    assert len(registry.get("iot").store.load()) == 40
+
+
+def test_invalid_requests_are_rejected_before_queueing(registry):
+    app = EmissionsAPI(batch_window=0.01, max_body=2000)
+
+    async def scenario():
+        return [
+            await call(app, "POST", "/v1/tenants/iot/emissions", b'[{"scope": "Scope 1"}]'),
+            await post(app, [dict(reading(0), quantity="lots")]),
+            await call(app, "POST", "/v1/tenants/iot/emissions", b"{not json"),
+            await call(app, "POST", "/v1/tenants/iot/emissions", json.dumps([reading(n) for n in range(30)]).encode(), chunk=500),
+            await call(app, "POST", "/v1/tenants/nope/emissions", b"[]"),
+            await call(app, "DELETE", "/v1/tenants/iot/emissions"),
+            await call(app, "GET", "/v1/tenants/iot/aggregates", query=b"group_by=planet"),
+            await call(app, "POST", "/v1/tenants/iot/compliance", b'{"company_info": ["x"]}'),
+        ]
+
+    responses = asyncio.run(scenario())
+    assert [response.status for response in responses] == [400, 400, 400, 413, 404, 405, 400, 400]
+    assert "missing: category" in responses[0].json()["error"]
+    assert registry.get("iot").store.version == 0
+
+
+def test_records_are_streamed_as_ndjson_and_aggregated(registry):
+    app = EmissionsAPI(batch_window=0.01, stream_rows=7)
+    ndjson = "\n".join(json.dumps(reading(n)) for n in range(30)).encode()
+
+    async def scenario():
+        await call(app, "POST", "/v1/tenants/iot/emissions", ndjson, content_type="application/x-ndjson")
+        listing = await call(app, "GET", "/v1/tenants/iot/emissions", query=b"start=2024-01-01&end=2024-01-14&facility=F1,F2")
+        totals = await call(app, "GET", "/v1/tenants/iot/aggregates", query=b"group_by=facility")
+        return listing, totals
+
+    listing, totals = asyncio.run(scenario())
+    expected = [n for n in range(30) if n % 28 + 1 <= 14 and n % 3 in (1, 2)]
+    lines = [json.loads(line) for line in listing.body.splitlines()]
+    assert listing.headers[b"x-record-count"] == str(len(expected)).encode()
+    assert sorted(line["quantity"] for line in lines) == [float(n + 1) for n in expected]
+    assert len(listing.messages) == 1 + -(-len(expected) // 7)
+
+    groups = {group["facility"]: group["emissions_kgCO2e"] for group in totals.json()["groups"]}
+    assert groups["F0"] == pytest.approx(sum(n + 1 for n in range(0, 30, 3)) * 0.82)
+    assert totals.json()["entry_count"] == 30
+
+
+def test_a_failure_after_the_response_started_is_not_answered_twice(registry):
+    app = EmissionsAPI(batch_window=0.01, stream_rows=2)
+    started = []
+
+    async def failing_send(message):
+        if message["type"] == "http.response.start":
+            started.append(message["status"])
+        elif message.get("more_body"):
+            raise ConnectionResetError("client went away")
+
+    async def scenario():
+        await post(app, [reading(n) for n in range(6)])
+        await call(app, "GET", "/v1/tenants/iot/emissions", send=failing_send)
+
+    # The error propagates so the server aborts the connection; no error
+    # response is started after the 200 that already went out
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(scenario())
+    assert started == [200]
+
+
+def test_shutdown_writes_queued_requests(registry):
+    app = EmissionsAPI(batch_window=0.2)
+
+    async def scenario():
+        pending = asyncio.ensure_future(post(app, [reading(1)]))
+        await asyncio.sleep(0.01)
+        lifespan = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return lifespan.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        await app({"type": "lifespan"}, receive, send)
+        assert registry.get("iot").store.version == 1
+        assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+        return await pending
+
+    assert asyncio.run(scenario()).status == 200
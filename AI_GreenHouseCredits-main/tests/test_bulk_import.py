@@ -0,0 +1,63 @@
+import zipfile
+
+import pytest
+
+from bulk_import import bulk_import, collect_sources
+from emissions_store import EmissionsStore
+
+GOOD = "date,scope,category,activity,quantity,unit,emission_factor\n2024-01-01,Scope 1,Fuel,Diesel,{q},liter,2.5\n2024-01-02,Scope 1,Fuel,Diesel,{q},liter,2.5\n"
+NON_NUMERIC = "date,scope,category,activity,quantity,unit,emission_factor\n2024-01-01,Scope 1,Fuel,Diesel,ten,liter,2.5\n"
+NO_UNIT = "date,scope,category,activity,quantity\n2024-01-01,Scope 1,Fuel,Diesel,1\n"
+
+
+@pytest.fixture
+def exports(tmp_path):
+    root = tmp_path / "exports"
+    (root / "plant_b").mkdir(parents=True)
+    (root / "plant_a.csv").write_text(GOOD.format(q=10))
+    (root / "plant_b" / "2024-01.csv").write_text(GOOD.format(q=20))
+    (root / "plant_b" / "broken.csv").write_text(NON_NUMERIC)
+    (root / "no_unit.csv").write_text(NO_UNIT)
+    (root / "notes.txt").write_text("not an export")
+    return root
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmissionsStore(str(tmp_path / "store"))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_valid_files_are_imported_in_one_append(exports, store, workers):
+    result = bulk_import(str(exports), store, workers=workers)
+
+    assert (result.rows_imported, result.files_ok, result.files_failed) == (4, 2, 2)
+    assert result.version == store.version == 1
+    assert sorted(store.load()["quantity"]) == [10.0, 10.0, 20.0, 20.0]
+
+    report = result.to_frame().set_index("file")
+    assert list(report.index) == ["no_unit.csv", "plant_a.csv", "plant_b/2024-01.csv", "plant_b/broken.csv"]
+    assert report.loc["plant_a.csv", "total_emissions_kgCO2e"] == 50.0
+    assert "Non-numeric quantity in 1 rows (first at row 2)" in report.loc["plant_b/broken.csv", "errors"]
+    assert "Missing required columns: unit" in report.loc["no_unit.csv", "errors"]
+
+
+def test_fail_on_error_imports_nothing(exports, store):
+    result = bulk_import(str(exports), store, workers=1, fail_on_error=True)
+    assert result.rows_imported == 0 and result.version is None
+    assert store.version == 0
+
+
+def test_archives_skip_folders_and_metadata_files(tmp_path, store):
+    archive = tmp_path / "exports.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("2024/", "")
+        zf.writestr("2024/plant_a.csv", GOOD.format(q=1))
+        zf.writestr("__MACOSX/2024/._plant_a.csv", "junk")
+        zf.writestr("2024/~$plant_a.xlsx", "lock file")
+    assert [name for name, _ in collect_sources(str(archive))] == ["2024/plant_a.csv"]
+
+    result = bulk_import(str(archive), store)
+    assert (result.rows_imported, result.files_failed) == (2, 0)
+    with pytest.raises(ValueError):
+        collect_sources(str(tmp_path / "exports.txt"))
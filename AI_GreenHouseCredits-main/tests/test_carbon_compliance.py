@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from carbon_compliance import STATUS_ORDER, CarbonComplianceFramework
+
+
+@pytest.fixture
+def framework():
+    return CarbonComplianceFramework()
+
+
+def emissions(tonnes):
+    return pd.DataFrame({
+        "date": ["2024-01-01", "2024-06-30"],
+        "scope": ["Scope 1", "Scope 2"],
+        "category": ["Fuel", "Electricity"],
+        "emissions_kgCO2e": [tonnes * 400.0, tonnes * 600.0]
+    })
+
+
+def test_status_boundaries_scores_and_rates(framework):
+    ratios = np.array([0.0, 0.5, 0.8, 0.85, 1.0, 1.1, 1.2, 1.25, 1.4, 2.0])
+    score, codes, fine, credit = framework._score_performance(ratios * 100, np.full(len(ratios), 100.0))
+
+    assert [STATUS_ORDER[code].value for code in codes] == [
+        "excellent", "excellent", "excellent", "good", "needs_improvement",
+        "needs_improvement", "poor", "poor", "critical", "critical"
+    ]
+    assert score == pytest.approx([100, 93.75, 90, 82.5, 67.5, 60, 46 + 2 / 3, 40, 16, 0])
+    assert credit == pytest.approx([100 * 4200, 50 * 4200, 20 * 4200, 15 * 2100, 0, 0, 0, 0, 0, 0])
+    assert fine == pytest.approx([0, 0, 0, 0, 0, 0, 20 * 1260, 25 * 1260, 40 * 2520, 100 * 2520])
+
+
+@pytest.mark.parametrize("company_info", [
+    {"industry": "manufacturing", "employees": 40},
+    {"industry": "retail", "employees": 0, "revenue_million_inr": 120.0},
+    {"industry": "unknown"},
+])
+def test_grid_cells_match_single_assessments(framework, company_info):
+    grid = framework.simulate_scenario_grid(
+        250.0,
+        reduction_percentages=[0, 10, 35],
+        employees=[company_info.get("employees", 0)],
+        revenue_million_inr=[company_info.get("revenue_million_inr", 0.0)],
+        assessment_period_months=[6, 12],
+        industries=[company_info["industry"]]
+    )
+    assert grid.score.shape == (3, 1, 1, 2, 1)
+    for r, reduction in enumerate([0, 10, 35]):
+        for p, months in enumerate([6, 12]):
+            result = framework.assess_compliance(emissions(250.0 * (1 - reduction / 100)), company_info, months)
+            cell = (r, 0, 0, p, 0)
+            assert grid.benchmark_tonnes[cell] == pytest.approx(result.emissions_benchmark)
+            assert grid.score[cell] == pytest.approx(result.score)
+            assert grid.status[cell] == result.status.value
+            assert grid.fine_amount[cell] == pytest.approx(result.fine_amount)
+            assert grid.credit_amount[cell] == pytest.approx(result.credit_amount)
+
+
+def test_surfaces_and_long_format(framework):
+    grid = framework.simulate_scenario_grid(
+        100.0, [0, 20], employees=[10, 20, 30], assessment_period_months=[12], industries=["services", "energy"]
+    )
+    surface = grid.surface("score", "employees", "reduction_percentage", industry="energy")
+    assert surface.shape == (3, 2)
+    assert list(surface.index) == [10, 20, 30]
+    assert surface.loc[20, 20.0] == pytest.approx(grid.score[1, 1, 0, 0, 1])
+    with pytest.raises(ValueError):
+        grid.surface("score", "employees", "reduction_percentage", industry="mining")
+
+    frame = grid.to_frame()
+    assert len(frame) == grid.score.size == 12
+    row = frame[(frame["employees"] == 30) & (frame["reduction_percentage"] == 0) & (frame["industry"] == "services")]
+    assert row["credit_amount"].iloc[0] == pytest.approx(grid.credit_amount[0, 2, 0, 0, 0])
+
+
+def test_improvement_scenarios_use_the_same_scoring(framework):
+    current = framework.assess_compliance(emissions(400.0), {"industry": "services", "employees": 20})
+    scenarios = framework.simulate_improvement_scenarios(current, [0, 25, 50])
+    assert scenarios[0]["financial_improvement"] == pytest.approx(0.0)
+    assert scenarios[0]["new_status"] == current.status.value
+    for scenario in scenarios[1:]:
+        expected = framework.assess_compliance(
+            emissions(scenario["new_emissions_tonnes"]), {"industry": "services", "employees": 20}
+        )
+        assert scenario["new_status"] == expected.status.value
+        assert scenario["financial_improvement"] == pytest.approx(
+            current.fine_amount - expected.fine_amount + expected.credit_amount - current.credit_amount
+        )
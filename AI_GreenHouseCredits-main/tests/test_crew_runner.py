@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+import crew_runner
+from crew_runner import CrewExecutor, ResponseCache, prompt_key
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class StubLLM:
+    """Stands in for a crew: counts calls and answers with the prompt."""
+
+    def __init__(self, release=None, fail=False):
+        self.calls = 0
+        self.release = release
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def job(self, prompt):
+        def run():
+            with self._lock:
+                self.calls += 1
+            if self.release is not None:
+                self.release.wait(5)
+            if self.fail:
+                raise RuntimeError("LLM unavailable")
+            return f"answer to {prompt}"
+        return run
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(crew_runner.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def executor(tmp_path):
+    executor = CrewExecutor(cache=ResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60, max_entries=3))
+    yield executor
+    executor.shutdown()
+
+
+def test_cache_hit_within_ttl_and_miss_after_expiry(executor, clock):
+    llm = StubLLM()
+    key = prompt_key("model", "analyst", "Summarise  the\nemissions")
+
+    assert executor.run(key, llm.job("a"), timeout=5) == "answer to a"
+    clock.now += 59
+    assert executor.run(prompt_key("model", "analyst", "Summarise the emissions"), llm.job("b"), timeout=5) == "answer to a"
+    assert llm.calls == 1
+
+    clock.now += 2
+    assert executor.run(key, llm.job("c"), timeout=5) == "answer to c"
+    assert llm.calls == 2
+
+
+def test_least_recently_used_entries_are_evicted(executor, clock):
+    llm = StubLLM()
+    keys = [prompt_key("task", n) for n in range(4)]
+    for n in range(3):
+        clock.now += 1
+        executor.run(keys[n], llm.job(n), timeout=5)
+    clock.now += 1
+    executor.run(keys[0], llm.job("again"), timeout=5)  # hit, now most recently used
+    clock.now += 1
+    executor.run(keys[3], llm.job(3), timeout=5)
+
+    assert len(executor.cache) == 3
+    assert executor.cache.get(keys[1]) is None
+    assert executor.cache.get(keys[0]) == "answer to 0"
+    assert llm.calls == 4
+
+
+def test_concurrent_identical_requests_share_one_call(executor):
+    release = threading.Event()
+    llm = StubLLM(release=release)
+    key = prompt_key("model", "optimizer", "Reduce emissions")
+
+    first = executor.submit(key, llm.job("first"))
+    second = executor.submit(key, llm.job("second"))
+    assert first is second
+    assert executor.in_flight() == 1
+    release.set()
+
+    assert first.result(timeout=5) == second.result(timeout=5) == "answer to first"
+    assert llm.calls == 1
+    assert executor.in_flight() == 0
+
+
+def test_failures_are_not_cached(executor):
+    failing = StubLLM(fail=True)
+    key = prompt_key("model", "radar", "Regulations")
+
+    with pytest.raises(RuntimeError):
+        executor.run(key, failing.job("x"), timeout=5)
+    assert executor.cache.get(key) is None
+    assert executor.in_flight() == 0
+
+    working = StubLLM()
+    assert executor.run(key, working.job("retry"), timeout=5) == "answer to retry"
+    assert working.calls == 1
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+import csv_ingest
+from csv_ingest import CSVIngestError, ingest_csv
+from emissions_store import EmissionsStore
+from factor_store import FactorStore, builtin_versions
+
+HEADER = "date,scope,category,activity,quantity,unit,emission_factor\n"
+ROW = "2024-01-{day:02d},Scope 2,Electricity,India Grid,{quantity},kWh,\n"
+
+
+def csv_file(quantities, extra=""):
+    rows = "".join(ROW.format(day=n % 28 + 1, quantity=quantity) for n, quantity in enumerate(quantities))
+    return io.BytesIO((HEADER + rows + extra).encode())
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    factors = FactorStore(builtin_versions())
+    monkeypatch.setattr(csv_ingest, "get_factor_store", lambda: factors)
+    return EmissionsStore(str(tmp_path / "store"))
+
+
+def test_chunks_are_committed_as_one_append(store):
+    fractions = []
+    result = ingest_csv(csv_file([1.0, 2.0, 3.0, 4.0, 5.0]), store, chunk_rows=2,
+                        progress=lambda fraction, rows: fractions.append((fraction, rows)))
+
+    assert (result.rows_imported, result.chunks, result.unresolved_factors) == (5, 3, 0)
+    assert store.version == 1
+    df = store.load()
+    assert list(df["quantity"]) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert list(df["emissions_kgCO2e"]) == pytest.approx([0.82, 1.64, 2.46, 3.28, 4.1])
+    assert fractions[-1] == (1.0, 5)
+    assert [rows for _, rows in fractions[:3]] == [2, 4, 5]
+
+
+@pytest.mark.parametrize("bad_row", [
+    "2024-02-01,Scope 2,Electricity,India Grid,lots,kWh,\n",
+    "2024-02-01,Scope 2,\"Electricity,India Grid,1.0,kWh,\n"
+])
+def test_a_bad_row_late_in_the_file_imports_nothing(store, bad_row):
+    with pytest.raises(CSVIngestError):
+        ingest_csv(csv_file([1.0] * 6, extra=bad_row), store, chunk_rows=2)
+    assert store.version == 0
+    assert len(store.load()) == 0
+
+
+def test_files_without_required_columns_or_rows_are_rejected(store):
+    with pytest.raises(CSVIngestError, match="required columns: unit"):
+        ingest_csv(io.BytesIO(b"scope,category,activity,quantity\nScope 1,Fuel,Diesel,1\n"), store)
+    with pytest.raises(CSVIngestError, match="no data"):
+        ingest_csv(io.BytesIO(HEADER.encode()), store)
+    with pytest.raises(CSVIngestError, match="empty"):
+        ingest_csv(io.BytesIO(b""), store)
+    assert store.version == 0
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_view import query_page
+from dataset_cache import DatasetCache
+from emissions_store import EmissionsStore
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    rng = np.random.default_rng(11)
+    rows = 3_000
+    df = pd.DataFrame({
+        "date": (pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, rows), unit="D")).where(rng.random(rows) > 0.02),
+        "scope": rng.choice(["Scope 1", "Scope 2", "Scope 3"], rows),
+        "category": rng.choice(["Fuel", "Electricity", "Travel", "Waste"], rows),
+        "activity": rng.choice(["Diesel", "India Grid", "Flight"], rows),
+        "facility": rng.choice(["Plant B", "Plant A", "Depot", ""], rows),
+        "business_unit": rng.choice(["Retail", "Corporate"], rows),
+        "quantity": np.round(rng.random(rows) * 100, 1),
+        "unit": "kWh",
+        "emission_factor": 0.5,
+        "emissions_kgCO2e": np.where(rng.random(rows) > 0.05, np.round(rng.random(rows) * 50, 2), np.nan)
+    })
+    store = EmissionsStore(str(tmp_path_factory.mktemp("view") / "store"))
+    store.append(df)
+    cache = DatasetCache(store)
+    yield cache.get(), cache.index()
+    cache.close()
+
+
+def reference(df, start, end, filters, sort_by, ascending):
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["date"] >= start
+    if end is not None:
+        mask &= df["date"] <= end
+    for column, values in filters.items():
+        mask &= df[column].astype(object).isin(values)
+    key = df.loc[mask, sort_by]
+    if isinstance(key.dtype, pd.CategoricalDtype):
+        key = key.astype(object).astype(str)
+    order = key.sort_values(ascending=ascending, na_position="last", kind="stable").index
+    return df.loc[order, "record_id"].tolist()
+
+
+@pytest.mark.parametrize("start, end, filters, sort_by, ascending", [
+    (None, None, {}, "date", False),
+    ("2023-03-01", "2023-09-30", {"scope": ["Scope 2"]}, "emissions_kgCO2e", False),
+    (None, "2024-06-30", {"facility": ["Plant A", "Depot"], "business_unit": ["Retail"]}, "facility", True),
+    ("2024-01-01", None, {"category": ["Travel", "Missing"]}, "quantity", True),
+    (None, None, {"scope": []}, "category", False),
+])
+def test_pages_match_a_full_sort(dataset, start, end, filters, sort_by, ascending):
+    df, index = dataset
+    start = pd.Timestamp(start) if start else None
+    end = pd.Timestamp(end) if end else None
+    expected = reference(df, start, end, {k: v for k, v in filters.items() if v}, sort_by, ascending)
+
+    for source in ({"index": index}, {}):
+        seen = []
+        page = query_page(df, start, end, filters, sort_by, ascending, page=1, page_size=250, **source)
+        assert page.total_rows == len(expected)
+        for number in range(1, page.page_count + 1):
+            page = query_page(df, start, end, filters, sort_by, ascending, page=number, page_size=250, **source)
+            seen += page.rows.index.tolist()
+        assert seen == expected
+
+
+def test_page_numbers_are_clamped(dataset):
+    df, _ = dataset
+    last = query_page(df, page=10_000, page_size=100)
+    assert (last.page, last.page_count, last.first_row, last.last_row) == (30, 30, 2901, 3000)
+    assert len(query_page(df, page=0, page_size=100).rows) == 100
+
+    empty = query_page(df, filters={"scope": ["Scope 9"]})
+    assert (empty.total_rows, empty.page, empty.page_count, empty.first_row, empty.last_row) == (0, 1, 1, 0, 0)
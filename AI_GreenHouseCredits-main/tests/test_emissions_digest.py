@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from emissions_digest import build_emissions_digest
+
+
+def ledger(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 1000, rows), unit="D"),
+        "scope": rng.choice(["Scope 1", "Scope 2", "Scope 3"], rows),
+        "category": rng.choice([f"Category {n}" for n in range(12)], rows),
+        "activity": rng.choice([f"Activity {n}" for n in range(30)], rows),
+        "facility": rng.choice([f"Plant {n}" for n in range(40)], rows),
+        "business_unit": rng.choice(["Corporate", "Retail", "Logistics"], rows),
+        "quantity": rng.random(rows) * 100,
+        "unit": "kWh",
+        "emission_factor": 0.5,
+        "emissions_kgCO2e": rng.random(rows) * 100
+    })
+
+
+def section(digest, heading):
+    lines = digest.split("\n")
+    start = next(n for n, line in enumerate(lines) if line.startswith(heading))
+    end = next((n for n in range(start + 1, len(lines)) if lines[n].startswith("## ")), len(lines))
+    return [line for line in lines[start + 1:end] if line]
+
+
+def test_digest_size_does_not_grow_with_the_rows():
+    small = build_emissions_digest(ledger(2_000))
+    large = build_emissions_digest(ledger(50_000, seed=1))
+    assert abs(len(large.splitlines()) - len(small.splitlines())) <= 2
+    assert len(large) < 5_000
+    assert len(section(large, "## Monthly emissions")) == 24 + 1
+    assert len(section(large, "## Top 10 facilities")) == 11
+    assert section(large, "## Top 10 facilities")[-1].startswith("- 30 others")
+
+
+def test_digest_is_deterministic_and_totals_add_up():
+    df = ledger(5_000)
+    digest = build_emissions_digest(df)
+    assert build_emissions_digest(df.sample(frac=1, random_state=3)) == digest
+    assert f"- Entries: {len(df)}" in digest
+    assert f"- Total emissions: {df['emissions_kgCO2e'].sum():,.1f} kgCO2e" in digest
+
+    scope_totals = df.groupby("scope")["emissions_kgCO2e"].sum().sort_values(ascending=False)
+    assert section(digest, "## Emissions by scope")[0].startswith(f"- {scope_totals.index[0]}: {scope_totals.iloc[0]:,.1f} kgCO2e")
+
+
+def test_outliers_missing_labels_and_dates_are_described():
+    df = ledger(200)
+    df.loc[5, "emissions_kgCO2e"] = 1e6
+    df.loc[5, "facility"] = None
+    df.loc[6, "date"] = pd.NaT
+    digest = build_emissions_digest(df)
+
+    anomalies = section(digest, "## Unusual entries")
+    assert "1 found" in digest
+    assert anomalies[0].startswith(f"- {df.loc[5, 'date']:%Y-%m-%d} {df.loc[5, 'category']} / {df.loc[5, 'activity']} at unspecified facility: 1,000,000.0 kgCO2e")
+    assert "- Entries without a valid date: 1" in digest
+    assert "nan" not in digest
+
+
+def test_empty_data():
+    assert build_emissions_digest(ledger(0)) == "Emissions data digest: no entries recorded."
@@ -0,0 +1,146 @@
+import pandas as pd
+import pytest
+
+from dataset_cache import DatasetCache
+from emissions_store import EmissionsStore
+
+
+def records(*quantities, facility="Plant A"):
+    return pd.DataFrame({
+        "date": ["2024-03-01"] * len(quantities),
+        "scope": ["Scope 1"] * len(quantities),
+        "category": ["Fuel"] * len(quantities),
+        "activity": ["Diesel"] * len(quantities),
+        "facility": [facility] * len(quantities),
+        "quantity": list(quantities),
+        "unit": ["liter"] * len(quantities),
+        "emission_factor": [2.68] * len(quantities),
+        "emissions_kgCO2e": [q * 2.68 for q in quantities]
+    })
+
+
+def by_id(df):
+    return df.set_index("record_id").sort_index()
+
+
+def test_merge_of_stale_copy_keeps_concurrent_writes(tmp_path):
+    root = str(tmp_path / "store")
+    session_store = EmissionsStore(root)
+    other = EmissionsStore(root)
+
+    session_store.append(records(10.0, 20.0, 30.0))
+    base = session_store.load()
+    copy = base.copy()
+
+    # Another process writes while the session edits its copy
+    other.append(records(40.0, 50.0, facility="Plant B"))
+    changed = other.load()
+    changed = changed[changed["record_id"] == 2].assign(notes="audited")
+    assert other.update(changed) == 1
+    assert other.delete([3]) == 1
+
+    copy.loc[copy["record_id"] == 1, "quantity"] = 11.0
+    copy.loc[copy["record_id"] == 3, "quantity"] = 33.0
+    copy = pd.concat([copy, records(60.0, facility="Plant C")], ignore_index=True)
+
+    result = session_store.merge(copy, base)
+    assert (result.updated, result.appended, result.deleted, result.conflicts) == (1, 1, 0, 1)
+
+    other.append(records(70.0))
+    for store in (session_store, other, EmissionsStore(root)):
+        df = by_id(store.load())
+        assert df.index.is_unique
+        assert list(df.index) == [1, 2, 4, 5, 6, 7]
+        assert df.loc[1, "quantity"] == 11.0
+        assert df.loc[2, "notes"] == "audited"
+        assert list(df.loc[[4, 5], "facility"]) == ["Plant B", "Plant B"]
+        assert df.loc[6, "facility"] == "Plant C"
+
+
+def test_merge_deletes_only_records_the_copy_could_see(tmp_path):
+    root = str(tmp_path / "store")
+    session_store = EmissionsStore(root)
+    other = EmissionsStore(root)
+
+    session_store.append(records(1.0, 2.0))
+    base = session_store.load()
+    other.append(records(3.0))
+
+    result = session_store.merge(base[base["record_id"] != 1], base)
+    assert result.deleted == 1
+    assert list(by_id(other.load()).index) == [2, 3]
+
+
+def test_interleaved_appends_get_unique_ids(tmp_path):
+    root = str(tmp_path / "store")
+    stores = [EmissionsStore(root), EmissionsStore(root)]
+    for n in range(20):
+        stores[n % 2].append(records(float(n)))
+    stores[0].delete([5])
+    stores[1].update(stores[1].load().head(1).assign(quantity=99.0))
+
+    df = stores[0].load()
+    assert df["record_id"].is_unique
+    assert len(df) == 19
+    assert stores[0].version == stores[1].refresh() == 22
+    assert by_id(stores[1].load()).loc[1, "quantity"] == 99.0
+
+
+def test_deletes_and_updates_survive_compaction_and_purge(tmp_path):
+    root = str(tmp_path / "store")
+    store = EmissionsStore(root, compact_threshold=3, segment_rows=5, purge_threshold=10_000)
+    store.append(records(*[float(n) for n in range(10)]))  # written as a segment
+    store.append(records(100.0))                           # logged
+    assert store.delete([2, 3, 11]) == 3
+    # The third log record folds the log; its deletes become tombstones
+    assert store.update(store.load().head(1).assign(quantity=-1.0)) == 1
+    version = store.version
+    first_segment = store._manifest["segments"][0]["file"]
+    assert store._manifest["tombstones"] == {first_segment: [1, 2, 3]}
+
+    expected = by_id(store.load())
+    assert list(expected.index) == [1, 4, 5, 6, 7, 8, 9, 10]
+    assert expected.loc[1, "quantity"] == -1.0
+
+    assert store.purge_tombstones() == 3
+    assert store._manifest["tombstones"] == {}
+    assert store.version == version
+    for reopened in (store, EmissionsStore(root)):
+        pd.testing.assert_frame_equal(by_id(reopened.load()), expected)
+
+
+def test_large_update_batches_are_written_as_a_segment(tmp_path):
+    store = EmissionsStore(str(tmp_path / "store"), segment_rows=4)
+    store.append(records(1.0, 2.0, 3.0, 4.0, 5.0))
+    store.append(records(6.0))
+    changed = store.load().assign(notes="checked")
+    assert store.update(changed) == 6
+    assert store._wal_records == 0
+
+    df = by_id(EmissionsStore(store.root).load())
+    assert list(df.index) == [1, 2, 3, 4, 5, 6]
+    assert (df["notes"] == "checked").all()
+
+
+def test_dataset_cache_applies_deletes_and_updates_without_reloading(tmp_path, monkeypatch):
+    store = EmissionsStore(str(tmp_path / "store"))
+    store.append(records(10.0, 20.0, 30.0, facility="Plant A"))
+    store.append(records(40.0, facility="Plant B"))
+    cache = DatasetCache(store)
+    cache.get()
+    aggregates = cache.aggregates()
+
+    def no_reload():
+        raise AssertionError("dataset reloaded")
+    monkeypatch.setattr(store, "snapshot", no_reload)
+
+    store.delete([1])
+    store.update(by_id(store.load()).loc[[4]].reset_index().assign(emissions_kgCO2e=1.0))
+    df = by_id(cache.get())
+    assert list(df.index) == [2, 3, 4]
+    assert df.loc[4, "emissions_kgCO2e"] == 1.0
+    assert cache.aggregates() is aggregates
+    assert aggregates.total_emissions == pytest.approx((20.0 + 30.0) * 2.68 + 1.0)
+    facilities = aggregates.totals("facility").set_index("facility")["emissions_kgCO2e"]
+    assert facilities.to_dict() == pytest.approx({"Plant A": 50.0 * 2.68, "Plant B": 1.0})
+    cache.close()
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from factor_store import FactorStore, _intern, load_factor_versions, read_factor_file
+
+GRID_FACTORS = """category,activity,factor,unit,source,region,valid_from,valid_to
+Electricity,India Grid,0.90,kWh,CEA v17,India,2021-04-01,2022-04-01
+Electricity,India Grid,0.80,kWh,CEA v19,India,2023-04-01,
+Electricity,India Grid,0.75,kWh,Global v2,,2023-01-01,
+Transport,Rail,0.03,km,Rail 2022,,2022-01-01,2023-01-01
+Transport,Rail,0.02,km,Rail 2024,,2024-01-01,
+"""
+
+CORRECTION = """category,activity,factor,unit,source,region,valid_from,valid_to
+Electricity,India Grid,0.79,kWh,CEA v19 rev,India,2023-04-01,
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    (tmp_path / "a_grid.csv").write_text(GRID_FACTORS)
+    return FactorStore(load_factor_versions(str(tmp_path)))
+
+
+@pytest.mark.parametrize("date, region, factor, source", [
+    ("2021-03-31", "India", 0.82, "built-in"),   # before any version: built-in baseline
+    ("2021-04-01", "India", 0.90, "CEA v17"),    # valid_from is inclusive
+    ("2022-03-31", "India", 0.90, "CEA v17"),
+    ("2022-04-01", "India", 0.82, "built-in"),   # valid_to is exclusive; gap falls back
+    ("2023-02-01", "India", 0.75, "Global v2"),  # regional gap, dated global version
+    ("2023-04-01", "India", 0.80, "CEA v19"),
+    ("2030-01-01", "India", 0.80, "CEA v19"),    # open-ended
+    ("2023-06-01", "Japan", 0.75, "Global v2"),  # no regional versions
+    ("2022-06-01", None, 0.82, "built-in"),
+])
+def test_regional_as_of_lookup(store, date, region, factor, source):
+    merged = store.merge_factors(pd.DataFrame({
+        "category": ["Electricity"], "activity": ["India Grid"], "unit": ["kWh"],
+        "date": [pd.Timestamp(date)], "country": [region]
+    }))
+    assert merged["factor"].iloc[0] == factor
+    assert merged["factor_source"].iloc[0] == source
+
+
+def test_expired_versions_leave_a_gap(store):
+    result = store.lookup(
+        ["Transport"] * 4,
+        ["Rail"] * 4,
+        pd.to_datetime(["2021-12-31", "2022-06-01", "2023-06-01", "2024-01-01"])
+    )
+    # Rail has no built-in factor, so there is nothing before 2022 or in 2023
+    assert list(result.unresolved) == [True, False, True, False]
+    assert result.factors[[1, 3]] == pytest.approx([0.03, 0.02])
+    assert list(result.versions[[0, 2]]) == [-1, -1]
+
+
+def test_lookup_matches_a_row_by_row_reference(store):
+    rng = np.random.default_rng(7)
+    dates = pd.Timestamp("2020-06-01") + pd.to_timedelta(rng.integers(0, 2000, 500), unit="D")
+    regions = rng.choice(["India", "Japan", None], 500)
+    result = store.lookup(["Electricity"] * 500, ["India Grid"] * 500, dates, regions)
+
+    versions = store.versions[(store.versions["category"] == "Electricity") & (store.versions["activity"] == "India Grid")]
+
+    def reference(date, region):
+        for wanted in ([region, ""] if region else [""]):
+            candidates = versions[
+                (versions["region"] == wanted)
+                & ~(versions["valid_from"] > date)
+                & ~(versions["valid_to"] <= date)
+            ]
+            if len(candidates):
+                return candidates.sort_values("valid_from", na_position="first")["factor"].iloc[-1]
+        return np.nan
+
+    expected = [reference(date, region) for date, region in zip(dates, regions)]
+    np.testing.assert_array_equal(result.factors, expected)
+
+
+def test_later_files_replace_versions_with_the_same_start(tmp_path):
+    (tmp_path / "a_grid.csv").write_text(GRID_FACTORS)
+    (tmp_path / "b_correction.csv").write_text(CORRECTION)
+    corrected = FactorStore(load_factor_versions(str(tmp_path)))
+    result = corrected.lookup(["Electricity"], ["India Grid"], [pd.Timestamp("2024-01-01")], ["India"])
+    assert result.factors[0] == 0.79
+    # The replaced value is still a known factor, so recalculation restates it
+    assert corrected.is_known_factor(["Electricity"], ["India Grid"], [0.80])[0]
+
+
+def test_invalid_factor_files_are_rejected(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("category,activity,factor,unit,valid_from\nElectricity,India Grid,0.7,kWh,someday\n")
+    with pytest.raises(ValueError, match="valid_from"):
+        read_factor_file(str(path))
+    path.write_text("category,activity,factor\nElectricity,India Grid,0.7\n")
+    with pytest.raises(ValueError, match="unit"):
+        read_factor_file(str(path))
+    # Unreadable files are skipped when loading a directory
+    assert len(load_factor_versions(str(tmp_path))) == len(load_factor_versions(str(tmp_path / "missing")))
+
+
+def test_intern_maps_each_distinct_value_once():
+    labels = pd.Index(["Diesel", "Petrol"], dtype=object)
+    values = pd.Series(["Petrol", None, "Coal", "Diesel", "Petrol"])
+    expected = [1, -2, -1, 0, 1]
+    assert list(_intern(values, labels)) == expected
+    assert list(_intern(values.astype("category"), labels)) == expected
+    assert list(_intern(np.array([], dtype=object), labels)) == []
+
+
+def test_whole_columns_resolve_like_single_rows(store):
+    rows = pd.DataFrame({
+        "category": ["Electricity", "Stationary Combustion", "Electricity", None, "Stationary Combustion"] * 200,
+        "activity": ["India Grid", "Diesel", "Unknown Grid", "Diesel", "Natural Gas"] * 200,
+        "date": pd.to_datetime(["2023-05-01", "2023-05-01", None, "2023-05-01", "2022-01-01"] * 200),
+        "country": ["India", "India", "India", "India", None] * 200,
+        "unit": ["MWh", "liter", "kWh", "liter", "kWh"] * 200
+    })
+    typed = rows.astype({"category": "category", "activity": "category", "country": "category"})
+    merged = store.merge_factors(typed)
+
+    for n in range(5):
+        single = store.lookup(rows["category"][n:n + 1], rows["activity"][n:n + 1], rows["date"][n:n + 1], rows["country"][n:n + 1], rows["unit"][n:n + 1])
+        np.testing.assert_array_equal(merged["factor"].to_numpy()[n::5], np.repeat(single.factors, 200))
+    assert list(merged["factor_source"][:5].fillna("-")) == ["CEA v19", "built-in", "-", "-", "built-in"]
+    assert merged["factor"][0] == 0.80 and merged["factor_unit"][0] == "kWh"
@@ -0,0 +1,88 @@
+import plotly.graph_objects as go
+import pytest
+
+import figure_cache
+from figure_cache import FigureCache, cached_figure, figure_key
+
+
+def bar(values):
+    return go.Figure(go.Bar(x=list(range(len(values))), y=values))
+
+
+class Builder:
+    def __init__(self):
+        self.calls = 0
+
+    def build(self, values):
+        self.calls += 1
+        return bar(values) if values else None
+
+
+def test_figures_are_reused_until_the_version_changes():
+    cache = FigureCache()
+    builder = Builder()
+    filters = {"start": "2024-01-01", "scope": ["Scope 1"]}
+
+    first = cache.get_or_build(3, filters, "scope_pie", "light", lambda: builder.build([1, 2]))
+    # Filter dicts are keyed independent of their order
+    again = cache.get_or_build(3, dict(reversed(filters.items())), "scope_pie", "light", lambda: builder.build([9]))
+    assert builder.calls == 1
+    assert list(again.data[0].y) == [1, 2]
+
+    # Callers may restyle what they get without touching the cached copy
+    again.update_layout(title="changed")
+    assert cache.get(figure_key(3, filters, "scope_pie", "light")).layout.title.text is None
+    assert first is not again
+
+    cache.get_or_build(4, filters, "scope_pie", "light", lambda: builder.build([5]))
+    cache.get_or_build(3, filters, "scope_pie", "dark", lambda: builder.build([6]))
+    assert builder.calls == 3
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_nothing_is_cached_without_a_version_or_a_figure():
+    cache = FigureCache()
+    builder = Builder()
+    cache.get_or_build(None, None, "trend", "light", lambda: builder.build([1]))
+    cache.get_or_build(1, None, "trend", "light", lambda: builder.build([]))
+    assert len(cache) == 0 and builder.calls == 2
+
+
+def test_least_recently_used_figures_are_evicted():
+    size = len(bar([1, 2, 3]).to_json())
+    cache = FigureCache(max_entries=3, max_bytes=10 * size)
+    for version in range(3):
+        cache.put(figure_key(version, None, "trend", "light"), bar([1, 2, 3]))
+    cache.get(figure_key(0, None, "trend", "light"))
+    cache.put(figure_key(3, None, "trend", "light"), bar([1, 2, 3]))
+    assert cache.get(figure_key(1, None, "trend", "light")) is None
+    assert cache.get(figure_key(0, None, "trend", "light")) is not None
+
+    small = FigureCache(max_entries=10, max_bytes=2 * size + size // 2)
+    for version in range(3):
+        small.put(figure_key(version, None, "trend", "light"), bar([1, 2, 3]))
+    assert len(small) == 2 and small.nbytes <= small.max_bytes
+
+    # A figure larger than the whole budget is not stored
+    tiny = FigureCache(max_bytes=size // 2)
+    tiny.put(figure_key(9, None, "trend", "light"), bar([1, 2, 3]))
+    assert len(tiny) == 0
+
+
+def test_decorated_chart_methods_use_the_shared_cache(monkeypatch):
+    monkeypatch.setattr(figure_cache, "_cache", FigureCache())
+
+    class Charts:
+        calls = 0
+
+        @cached_figure("emissions_bar")
+        def emissions_bar(self, data):
+            Charts.calls += 1
+            return bar(data)
+
+    charts = Charts()
+    charts.emissions_bar([1, 2], version=7)
+    charts.emissions_bar([3, 4], version=7)
+    charts.emissions_bar([3, 4])
+    assert Charts.calls == 2
+    assert list(charts.emissions_bar([0], version=7).data[0].y) == [1, 2]
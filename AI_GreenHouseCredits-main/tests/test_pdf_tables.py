@@ -0,0 +1,47 @@
+import pandas as pd
+from fpdf import FPDF
+
+import pdf_tables
+from pdf_tables import fit_widths, render_detail_table, render_monthly_table
+
+
+def ledger(rows, scopes=("Scope 1",)):
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-15"] * rows),
+        "scope": [scopes[n % len(scopes)] for n in range(rows)],
+        "category": ["Fuel"] * rows,
+        "activity": ["Diesel"] * rows,
+        "quantity": [float(n) for n in range(rows)],
+        "unit": ["liter"] * rows,
+        "emission_factor": [2.68] * rows,
+        "emissions_kgCO2e": [n * 2.68 for n in range(rows)]
+    })
+
+
+def document():
+    pdf = FPDF()
+    pdf.add_page()
+    return pdf
+
+
+def test_detail_table_draws_every_row_by_default(monkeypatch):
+    monkeypatch.setattr(pdf_tables, "PDF_FORMAT_CHUNK_ROWS", 7)
+    drawn = []
+    render_detail_table(document(), ledger(100), progress=lambda done, total: drawn.append((done, total)))
+    assert drawn[-1] == (100, 100)
+
+    drawn.clear()
+    render_detail_table(document(), ledger(100), max_rows=30, progress=lambda done, total: drawn.append((done, total)))
+    assert drawn[-1] == (30, 30)
+
+
+def test_wide_tables_fit_the_printable_width(monkeypatch):
+    pdf = document()
+    assert sum(fit_widths(pdf, [25, 25, 30, 30, 20, 15, 25, 30])) <= pdf.epw + 1e-6
+    assert fit_widths(pdf, [30, 40]) == [30, 40]
+
+    used = []
+    monkeypatch.setattr(pdf_tables, "render_table", lambda pdf, headers, widths, columns: used.append(widths))
+    render_monthly_table(pdf, ledger(12, scopes=[f"Scope {n}" for n in range(6)]))
+    assert len(used[0]) == 8
+    assert sum(used[0]) <= pdf.epw + 1e-6
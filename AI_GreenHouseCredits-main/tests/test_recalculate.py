@@ -0,0 +1,115 @@
+import argparse
+
+import pandas as pd
+import pytest
+
+import recalculate
+from emissions_store import EmissionsStore, StoreConflictError
+from factor_store import FactorStore, load_factor_versions
+from recalculate import parse_pair, recalculate_emissions
+
+FACTOR_FILE = """category,activity,factor,unit,source,region,valid_from,valid_to
+Electricity,India Grid,0.7,kWh,CEA v19,India,2024-01-01,
+"""
+
+
+def records():
+    return pd.DataFrame({
+        "date": ["2023-06-01", "2024-06-01", "2024-06-01", "2024-06-01"],
+        "scope": ["Scope 2", "Scope 2", "Scope 2", "Scope 1"],
+        "category": ["Electricity", "Electricity", "Electricity", "Stationary Combustion"],
+        "activity": ["India Grid", "India Grid", "India Grid", "Diesel"],
+        "country": ["India", "India", "India", "India"],
+        "quantity": [100.0, 200.0, 300.0, 10.0],
+        "unit": ["kWh", "kWh", "kWh", "liter"],
+        "emission_factor": [0.82, 0.82, 0.9, 2.68787],
+        "emissions_kgCO2e": [82.0, 164.0, 270.0, 26.8787]
+    })
+
+
+@pytest.fixture
+def factor_store(tmp_path):
+    directory = tmp_path / "factors"
+    directory.mkdir()
+    (directory / "cea.csv").write_text(FACTOR_FILE)
+    return FactorStore(load_factor_versions(str(directory)))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EmissionsStore(str(tmp_path / "store"))
+    store.append(records())
+    return store
+
+
+def quantities_by_factor(store):
+    df = store.load()
+    return dict(zip(df["quantity"], df["emission_factor"]))
+
+
+def test_dry_run_reports_the_diff_without_writing(store, factor_store):
+    version = store.version
+    result = recalculate_emissions(store, factor_store, dry_run=True)
+
+    assert (result.rows_checked, result.rows_changed, result.rows_custom) == (4, 1, 1)
+    assert result.version == version == store.version
+    assert result.changes.to_dict("records") == [{
+        "category": "Electricity", "activity": "India Grid", "old_factor": 0.82, "new_factor": 0.7, "rows": 1,
+        "emissions_before_kgCO2e": 164.0, "emissions_after_kgCO2e": pytest.approx(140.0),
+        "change_kgCO2e": pytest.approx(-24.0)
+    }]
+    assert quantities_by_factor(store)[200.0] == 0.82
+
+
+def test_restates_only_the_requested_pairs(store, factor_store):
+    result = recalculate_emissions(store, factor_store, keys=[("Stationary Combustion", "Diesel")])
+    assert (result.rows_checked, result.rows_changed) == (1, 0)
+
+    result = recalculate_emissions(store, factor_store, start_date=pd.Timestamp("2024-01-01"), keys=[("Electricity", "India Grid")])
+    assert (result.rows_checked, result.rows_changed) == (2, 1)
+    assert result.version == store.version
+    # Records from before the new version and custom factors are unchanged
+    assert quantities_by_factor(store) == {100.0: 0.82, 200.0: 0.7, 300.0: 0.9, 10.0: 2.68787}
+
+
+def test_plans_again_after_a_concurrent_write(store, factor_store, monkeypatch):
+    other = EmissionsStore(store.root)
+    plan = recalculate.plan_recalculation
+    plans = []
+
+    def plan_then_write(index, *args):
+        plans.append(index.row_count)
+        changed, result = plan(index, *args)
+        if len(plans) == 1:
+            # Another process appends between the plan and the update
+            other.append(records().iloc[[1]])
+        return changed, result
+
+    monkeypatch.setattr(recalculate, "plan_recalculation", plan_then_write)
+    result = recalculate_emissions(store, factor_store)
+    assert plans == [4, 5]
+    assert result.rows_changed == 2
+    df = other.load()
+    assert list(df.loc[df["quantity"] == 200.0, "emission_factor"]) == [0.7, 0.7]
+
+
+def test_gives_up_when_every_attempt_conflicts(store, factor_store, monkeypatch):
+    other = EmissionsStore(store.root)
+    plan = recalculate.plan_recalculation
+
+    def plan_then_write(index, *args):
+        changed, result = plan(index, *args)
+        other.append(records().iloc[[3]])
+        return changed, result
+
+    monkeypatch.setattr(recalculate, "plan_recalculation", plan_then_write)
+    with pytest.raises(StoreConflictError):
+        recalculate_emissions(store, factor_store, attempts=2)
+    assert quantities_by_factor(store)[200.0] == 0.82
+
+
+def test_pairs_are_parsed_from_the_command_line():
+    assert parse_pair("Electricity:India Grid") == ("Electricity", "India Grid")
+    assert parse_pair(" Transport : Flight: long haul") == ("Transport", "Flight: long haul")
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_pair("Electricity")
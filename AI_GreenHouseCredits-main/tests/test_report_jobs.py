@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import report_jobs
+from report_jobs import ReportJobQueue, artifact_key
+
+OWNER_SCRIPT = "import sys, time, report_jobs; print(report_jobs.process_owner(), flush=True); time.sleep(float(sys.argv[1]))"
+
+
+def wait(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.status(job_id)
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def other_process(seconds):
+    """Start a process that prints its owner id, and return (process, owner)."""
+    process = subprocess.Popen(
+        [sys.executable, "-c", OWNER_SCRIPT, str(seconds)],
+        stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    return process, process.stdout.readline().strip()
+
+
+def insert_job(queue, job_id, owner, cache_key="k"):
+    now = time.time()
+    with queue._conn:
+        queue._conn.execute(
+            "INSERT INTO jobs VALUES (?, 'pdf', ?, 'running', 0.5, NULL, NULL, ?, ?, ?)",
+            (job_id, cache_key, now, now, owner)
+        )
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = ReportJobQueue(str(tmp_path), max_workers=2, max_artifacts=1)
+    yield queue
+    queue._pool.shutdown(wait=True)
+
+
+def test_identical_requests_are_generated_once_and_then_served_from_cache(queue):
+    release = threading.Event()
+    calls = []
+
+    def render(progress):
+        calls.append(1)
+        release.wait(5)
+        return b"%PDF report"
+
+    key = artifact_key("tenant", 3, "2024-01-01", None)
+    first = queue.submit("pdf", key, render)
+    assert queue.submit("pdf", key, render) == first
+    release.set()
+    assert wait(queue, first)["status"] == "done"
+
+    again = queue.submit("pdf", key, render)
+    assert again != first
+    assert queue.status(again)["message"] == "Served from cache"
+    assert queue.result(again) == b"%PDF report"
+    assert len(calls) == 1
+
+
+def test_failures_are_reported_and_not_cached(queue):
+    def render(progress):
+        raise RuntimeError("boom")
+
+    job_id = queue.submit("pdf", "broken", render)
+    status = wait(queue, job_id)
+    assert status["status"] == "failed" and "boom" in status["message"]
+    assert queue.result(job_id) is None
+    assert queue.submit("pdf", "broken", lambda progress: b"ok") != job_id
+
+
+def test_only_jobs_of_exited_processes_are_failed(tmp_path, queue):
+    live, live_owner = other_process(30)
+    dead, dead_owner = other_process(0)
+    dead.wait()
+    try:
+        insert_job(queue, "live-job", live_owner, "live")
+        insert_job(queue, "dead-job", dead_owner, "dead")
+        insert_job(queue, "legacy-job", None, "legacy")
+
+        ReportJobQueue(str(tmp_path))._pool.shutdown()
+        assert queue.status("live-job")["status"] == "running"
+        assert queue.status("dead-job")["status"] == "failed"
+        assert queue.status("legacy-job")["status"] == "failed"
+
+        # A request for the live process's report joins it
+        assert queue.submit("pdf", "live", lambda progress: b"") == "live-job"
+    finally:
+        live.kill()
+        live.wait()
+    # Once its owner exits, a stuck job no longer blocks new requests
+    job_id = queue.submit("pdf", "live", lambda progress: b"regenerated")
+    assert job_id != "live-job"
+    assert queue.status("live-job")["status"] == "failed"
+    assert wait(queue, job_id)["status"] == "done"
+
+
+def test_recent_reports_are_not_evicted_before_download(queue, monkeypatch):
+    first = queue.submit("pdf", "first", lambda progress: b"one")
+    wait(queue, first)
+    second = queue.submit("pdf", "second", lambda progress: b"two")
+    wait(queue, second)
+    assert queue.result(first) == b"one"
+    assert queue.result(second) == b"two"
+
+    monkeypatch.setattr(report_jobs, "REPORT_ARTIFACT_PIN_SECONDS", -1)
+    os.utime(os.path.join(queue.artifacts_dir, "first.pdf"), (1, 1))
+    queue._evict_artifacts()
+    assert queue.result(first) is None
+    assert queue.result(second) == b"two"
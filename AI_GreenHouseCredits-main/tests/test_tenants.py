@@ -0,0 +1,84 @@
+import gc
+import os
+
+import pandas as pd
+import pytest
+
+import dataset_cache
+import emissions_store
+from emissions_store import get_store
+from tenants import TenantRegistry, validate_tenant_id
+
+
+def records(quantity):
+    return pd.DataFrame({
+        "date": ["2024-03-01"],
+        "scope": ["Scope 1"],
+        "category": ["Fuel"],
+        "activity": ["Diesel"],
+        "quantity": [quantity],
+        "unit": ["liter"],
+        "emission_factor": [2.68],
+        "emissions_kgCO2e": [quantity * 2.68]
+    })
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return TenantRegistry(root=str(tmp_path / "tenants"), max_open=2)
+
+
+def test_tenant_ids_are_checked():
+    assert validate_tenant_id("acme_2-x") == "acme_2-x"
+    for tenant_id in ("", "../acme", "-acme", "a" * 65, None):
+        with pytest.raises(ValueError):
+            validate_tenant_id(tenant_id)
+
+
+def test_unknown_tenants_are_only_opened_when_created(registry):
+    with pytest.raises(ValueError):
+        registry.get("acme")
+    registry.get("acme", create=True)
+    assert registry.exists("acme")
+    assert registry.list_tenants() == [registry.default_tenant, "acme"]
+
+
+def test_tenants_are_isolated_and_share_the_process_store(registry, tmp_path):
+    acme = registry.get("acme", create=True)
+    globex = registry.get("globex", create=True)
+    acme.store.append(records(1.0))
+    globex.store.append(records(2.0))
+    globex.store.append(records(3.0))
+
+    assert acme.store is get_store(str(tmp_path / "tenants" / "acme" / "store"), legacy_json=None)
+    assert len(acme.dataset.get()) == 1
+    assert sorted(globex.dataset.get()["quantity"]) == [2.0, 3.0]
+
+
+def test_least_recently_used_tenant_is_released(registry):
+    acme = registry.get("acme", create=True)
+    globex = registry.get("globex", create=True)
+    registry.get("acme")
+    registry.get("initech", create=True)
+    assert registry.open_tenants() == ["acme", "initech"]
+    assert id(acme.store) in dataset_cache._caches
+
+    # A released tenant reopens with the same store and a fresh dataset cache
+    store = globex.store
+    assert id(store) not in dataset_cache._caches
+    store.append(records(4.0))
+    assert registry.get("globex") is globex
+    assert globex.store is store
+    assert list(globex.dataset.get()["quantity"]) == [4.0]
+    assert registry.open_tenants() == ["initech", "globex"]
+
+
+def test_released_stores_are_freed_once_unused(registry, tmp_path):
+    registry.get("acme", create=True).store.append(records(5.0))
+    for name in ("b", "c"):
+        registry.get(name, create=True)
+    gc.collect()
+    assert os.path.abspath(str(tmp_path / "tenants" / "acme" / "store")) not in emissions_store._stores
+
+    acme = registry.get("acme")
+    assert list(acme.dataset.get()["quantity"]) == [5.0]
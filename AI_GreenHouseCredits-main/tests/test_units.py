@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import csv_ingest
+from csv_ingest import prepare_chunk
+from factor_store import FactorStore, builtin_versions
+from units import get_unit_registry
+
+
+@pytest.fixture
+def builtin_store(monkeypatch):
+    store = FactorStore(builtin_versions())
+    monkeypatch.setattr(csv_ingest, "get_factor_store", lambda: store)
+    return store
+
+
+def test_registry_converts_within_a_dimension_only():
+    registry = get_unit_registry()
+    ratios = registry.ratios(["MWh", "megawatt hour", "gallon", "tonnes", "kWh", "widgets", "widgets", None],
+                             ["kWh", "kWh", "liter", "kg", "liter", "widgets", "kWh", "kWh"])
+    assert ratios[:4] == pytest.approx([1000.0, 1000.0, 3.785411784, 1000.0])
+    assert np.isnan(ratios[4])
+    assert ratios[5] == 1.0
+    assert np.isnan(ratios[6:]).all()
+
+
+def test_lookup_converts_row_units_to_the_factor_unit(builtin_store):
+    result = builtin_store.lookup(
+        ["Electricity", "Stationary Combustion", "Stationary Combustion", "Electricity"],
+        ["India Grid", "Diesel", "Diesel", "India Grid"],
+        ["2024-01-01"] * 4,
+        units=["MWh", "gallon", "kg", None]
+    )
+    assert list(result.units[:2]) == ["kWh", "liter"]
+    assert result.conversions[:2] == pytest.approx([1000.0, 3.785411784])
+    # A mass cannot be expressed in liters; a missing unit is the factor's unit
+    assert list(result.unresolved) == [False, False, True, False]
+    assert result.conversions[3] == 1.0
+
+
+def test_ingest_restates_quantities_in_the_factor_unit(builtin_store):
+    chunk = pd.DataFrame({
+        "date": ["2024-01-01", "2024-01-02"],
+        "scope": ["Scope 2", "Scope 1"],
+        "category": ["Electricity", "Stationary Combustion"],
+        "activity": ["India Grid", "Diesel"],
+        "quantity": [2.5, 10.0],
+        "unit": ["MWh", "kg"]
+    })
+    typed, invalid_dates = prepare_chunk(chunk, has_dates=True, has_reporting_period=False)
+
+    assert invalid_dates == 0
+    assert typed["quantity"].tolist()[0] == pytest.approx(2500.0)
+    assert typed["unit"].astype(object).tolist() == ["kWh", "kg"]
+    assert typed["emissions_kgCO2e"].tolist()[0] == pytest.approx(2500.0 * 0.82)
+    # Incompatible units are left as entered, without a factor
+    assert typed["quantity"].tolist()[1] == 10.0
+    assert np.isnan(typed["emission_factor"].tolist()[1])
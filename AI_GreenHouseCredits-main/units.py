@@ -0,0 +1,183 @@
+"""
+Unit registry for YourCarbonFootprint application.
+Knows the units activity data is reported in, their physical dimension and
+their size relative to the base unit of that dimension, and converts whole
+quantity columns between units at once: every distinct unit label is resolved
+once, and conversion ratios come from a precomputed unit x unit matrix (NaN
+between different dimensions), so a row costs one array gather.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Canonical unit -> (dimension, size in the dimension's base unit, aliases)
+UNITS = {
+    # Energy (base kWh)
+    "kWh": ("energy", 1.0, ["kilowatt hour", "kilowatt-hour", "kw h"]),
+    "Wh": ("energy", 0.001, ["watt hour", "watt-hour"]),
+    "MWh": ("energy", 1000.0, ["megawatt hour", "megawatt-hour"]),
+    "GWh": ("energy", 1000000.0, ["gigawatt hour", "gigawatt-hour"]),
+    "MJ": ("energy", 1.0 / 3.6, ["megajoule"]),
+    "GJ": ("energy", 1000.0 / 3.6, ["gigajoule"]),
+    "therm": ("energy", 29.3071, ["therms"]),
+    "MMBtu": ("energy", 293.071, ["mmbtu"]),
+    # Volume (base liter)
+    "liter": ("volume", 1.0, ["l", "litre", "liters", "litres"]),
+    "ml": ("volume", 0.001, ["milliliter", "millilitre"]),
+    "cubic meter": ("volume", 1000.0, ["m3", "m^3", "m³", "cubic metre", "cubic meters", "cubic metres"]),
+    "gallon": ("volume", 3.785411784, ["gal", "gallons", "us gallon"]),
+    # Mass (base kg)
+    "kg": ("mass", 1.0, ["kilogram", "kilograms", "kgs"]),
+    "g": ("mass", 0.001, ["gram", "grams"]),
+    "tonne": ("mass", 1000.0, ["t", "tonnes", "metric ton", "metric tons"]),
+    "lb": ("mass", 0.45359237, ["lbs", "pound", "pounds"]),
+    # Distance (base km)
+    "km": ("distance", 1.0, ["kilometer", "kilometre", "kilometers", "kilometres"]),
+    "m": ("distance", 0.001, ["meter", "metre", "meters", "metres"]),
+    "mile": ("distance", 1.609344, ["miles", "mi"]),
+    # Passenger distance (base passenger-km)
+    "passenger-km": ("passenger distance", 1.0, ["pkm", "passenger km", "passenger kilometer"]),
+    "passenger-mile": ("passenger distance", 1.609344, ["passenger mile", "passenger miles"]),
+    # Freight (base tonne-km)
+    "tonne-km": ("freight", 1.0, ["tkm", "tonne km"]),
+    # Area (base square meter)
+    "square meter": ("area", 1.0, ["m2", "m^2", "m²", "sqm", "square metre", "square meters"]),
+    "square foot": ("area", 0.09290304, ["ft2", "sq ft", "square feet"]),
+    # Time (base hour)
+    "hour": ("time", 1.0, ["h", "hr", "hours", "hrs"]),
+    "day": ("time", 24.0, ["days"]),
+    # Counts and money: no conversion between different currencies
+    "piece": ("count", 1.0, ["pieces", "pcs", "unit", "units"]),
+    "USD": ("USD", 1.0, ["usd", "$"]),
+    "INR": ("INR", 1.0, ["inr", "₹"]),
+}
+
+
+def _normalise_label(label):
+    """Lower-cased label with collapsed whitespace, used to match aliases."""
+    return " ".join(str(label).split()).lower()
+
+
+class UnitRegistry:
+    def __init__(self, units=UNITS):
+        """
+        Compile a registry.
+
+        Args:
+            units (dict): Canonical unit -> (dimension, size in the base unit
+                of the dimension, list of aliases)
+        """
+        self.units = pd.Index(list(units), dtype=object)
+        self.dimensions = np.array([units[unit][0] for unit in self.units], dtype=object)
+        self.scales = np.array([units[unit][1] for unit in self.units], dtype="float64")
+        self._aliases = {}
+        for code, unit in enumerate(self.units):
+            for label in [unit] + list(units[unit][2]):
+                self._aliases.setdefault(_normalise_label(label), code)
+
+        # ratio[a, b] converts a quantity in unit a to unit b; the extra last
+        # row and column stand for unknown units
+        size = len(self.units)
+        same_dimension = self.dimensions[:, None] == self.dimensions[None, :]
+        self._ratios = np.full((size + 1, size + 1), np.nan)
+        self._ratios[:size, :size] = np.where(same_dimension, self.scales[:, None] / self.scales[None, :], np.nan)
+
+    def code(self, label):
+        """Code of a unit label (canonical name or alias), -1 if unknown."""
+        if label is None or (isinstance(label, float) and np.isnan(label)):
+            return -1
+        return self._aliases.get(_normalise_label(label), -1)
+
+    def codes(self, labels):
+        """
+        Codes of many unit labels, resolving each distinct label once.
+
+        Args:
+            labels: Array-like or Series of unit labels
+
+        Returns:
+            numpy.ndarray: int64 codes, -1 for unknown or missing units
+        """
+        if isinstance(labels, pd.Series) and isinstance(labels.dtype, pd.CategoricalDtype):
+            categorical = labels.array
+        else:
+            categorical = pd.Categorical(np.asarray(labels, dtype=object))
+        mapping = np.array([self.code(label) for label in categorical.categories] + [-1], dtype="int64")
+        return mapping[np.asarray(categorical.codes)]
+
+    def canonical(self, label):
+        """Canonical name of a unit label, or None if unknown."""
+        code = self.code(label)
+        return self.units[code] if code >= 0 else None
+
+    def dimension(self, label):
+        """Dimension of a unit label, or None if unknown."""
+        code = self.code(label)
+        return self.dimensions[code] if code >= 0 else None
+
+    def is_compatible(self, from_unit, to_unit):
+        """True if quantities in from_unit can be expressed in to_unit."""
+        return not np.isnan(self.ratios([from_unit], [to_unit])[0])
+
+    def ratios_by_code(self, from_codes, to_codes):
+        """Conversion ratios between unit codes, NaN if incompatible or unknown."""
+        return self._ratios[from_codes, to_codes]
+
+    def ratios(self, from_units, to_units):
+        """
+        Conversion ratios for many rows.
+
+        Unknown units only convert to the identical label (ratio 1).
+
+        Args:
+            from_units: Array-like or Series of the units quantities are in
+            to_units: Array-like or Series of the target units
+
+        Returns:
+            numpy.ndarray: Multipliers, NaN where the units are incompatible
+        """
+        from_codes = self.codes(from_units)
+        to_codes = self.codes(to_units)
+        ratios = self.ratios_by_code(from_codes, to_codes)
+        unknown = np.flatnonzero((from_codes < 0) | (to_codes < 0))
+        if len(unknown):
+            from_labels = np.asarray(from_units, dtype=object)[unknown]
+            same = pd.notna(from_labels) & (from_labels == np.asarray(to_units, dtype=object)[unknown])
+            ratios[unknown[same]] = 1.0
+        return ratios
+
+    def convert(self, quantities, from_units, to_units):
+        """
+        Convert quantities between units.
+
+        Args:
+            quantities: Array-like or Series of quantities
+            from_units: Units the quantities are in
+            to_units: Units to convert to
+
+        Returns:
+            tuple: (converted quantities, incompatible mask); incompatible
+            rows are NaN
+        """
+        ratios = self.ratios(from_units, to_units)
+        return np.asarray(quantities, dtype="float64") * ratios, np.isnan(ratios)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_unit_registry():
+    """
+    Return the process-wide unit registry.
+
+    Returns:
+        UnitRegistry: Shared registry
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = UnitRegistry()
+        return _registry